@@ -0,0 +1,120 @@
+"""Script that compares elasticsearch-py default serializer with pandagg orjson based serializer, on a large
+aggregation response and on a bulk payload (no cluster required)
+
+    python -m examples.benchmarks.serializer
+"""
+
+import timeit
+
+import numpy as np
+import pandas as pd
+from elasticsearch.serializer import JSONSerializer
+
+from pandagg.serializer import OrjsonSerializer
+
+NUMBER = 5
+BUCKETS = 20000
+DOCUMENTS = 50000
+
+
+def aggregation_response():
+    """Serialized response of a two levels terms aggregation, with metrics under each bucket."""
+    rng = np.random.default_rng(0)
+    buckets = [
+        {
+            "key": "user-%d" % i,
+            "doc_count": int(rng.integers(1, 1000)),
+            "per_day": {
+                "buckets": [
+                    {
+                        "key_as_string": "2021-01-%02dT00:00:00.000Z" % (day + 1),
+                        "key": 1609459200000 + day * 86400000,
+                        "doc_count": int(rng.integers(1, 100)),
+                        "avg_size": {"value": float(rng.random())},
+                    }
+                    for day in range(5)
+                ]
+            },
+        }
+        for i in range(BUCKETS)
+    ]
+    response = {
+        "took": 12,
+        "timed_out": False,
+        "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+        "hits": {"total": {"value": 10000, "relation": "gte"}, "hits": []},
+        "aggregations": {
+            "per_user": {
+                "doc_count_error_upper_bound": 0,
+                "sum_other_doc_count": 0,
+                "buckets": buckets,
+            }
+        },
+    }
+    return JSONSerializer().dumps(response)
+
+
+def bulk_sources():
+    """Documents sources built from a dataframe, holding NumPy scalars and pandas timestamps."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "user": ["user-%d" % i for i in rng.integers(0, 1000, DOCUMENTS)],
+            "size": rng.integers(0, 10000, DOCUMENTS),
+            "score": rng.random(DOCUMENTS),
+            "date": pd.Timestamp("2021-01-01")
+            + pd.to_timedelta(rng.integers(0, 10 ** 6, DOCUMENTS), unit="s"),
+        }
+    )
+    sources = []
+    for row in df.itertuples(index=False):
+        sources.append(
+            {
+                "user": row.user,
+                "size": np.int64(row.size),
+                "score": np.float64(row.score),
+                "date": row.date.to_pydatetime(),
+            }
+        )
+    return sources
+
+
+def best_of(stmt):
+    return min(timeit.repeat(stmt, number=NUMBER, repeat=3)) / NUMBER
+
+
+if __name__ == "__main__":
+    default, orjson = JSONSerializer(), OrjsonSerializer()
+
+    print("Building payloads...")
+    response = aggregation_response()
+    sources = bulk_sources()
+    print(
+        "Aggregation response of %d buckets: %.1f MB"
+        % (BUCKETS, len(response) / 1024.0 / 1024)
+    )
+    print("Bulk payload of %d documents" % DOCUMENTS)
+
+    for name, default_stmt, orjson_stmt in (
+        (
+            "aggregation response loads",
+            lambda: default.loads(response),
+            lambda: orjson.loads(response),
+        ),
+        (
+            "bulk sources dumps",
+            lambda: [default.dumps(source) for source in sources],
+            lambda: [orjson.dumps(source) for source in sources],
+        ),
+    ):
+        default_time = best_of(default_stmt)
+        orjson_time = best_of(orjson_stmt)
+        print(
+            "%s: default %.1f ms, orjson %.1f ms (x%.1f)"
+            % (
+                name,
+                default_time * 1000,
+                orjson_time * 1000,
+                default_time / orjson_time,
+            )
+        )
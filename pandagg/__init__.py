@@ -5,6 +5,7 @@ from logging import NullHandler
 # ensures all required classes are registered in DSLMeta
 from .interactive import *
 from .search import *
+from .async_search import *
 from typing import List
 
 # Inspired by https://python-guide-pt-br.readthedocs.io/fr/latest/writing/logging.html#logging-in-a-library
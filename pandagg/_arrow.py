@@ -0,0 +1,358 @@
+"""
+Conversion of documents and aggregations responses to Apache Arrow, column types being derived from mappings.
+
+Values are converted column by column (one vectorized conversion per field), nested and object fields being
+assembled from their children columns.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from pandagg.node.mappings import Nested, Object
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    from pandagg.tree.mappings import Mappings
+    from pandagg.types import HitDict
+
+# mappings field types converted to arrow types of same name, other regular fields are converted to strings
+_ARROW_TYPES: Dict[str, str] = {
+    "long": "int64",
+    "integer": "int32",
+    "short": "int16",
+    "byte": "int8",
+    "double": "float64",
+    "float": "float32",
+    "half_float": "float32",
+    "scaled_float": "float64",
+    "boolean": "bool_",
+}
+_DICTIONARY_ENCODED_TYPES = ("keyword", "constant_keyword")
+_TIMESTAMP_UNITS: Dict[str, str] = {"date": "ms", "date_nanos": "ns"}
+_ZONE_OFFSET_PATTERN = r"([Zz]|[+-]\d\d:?\d\d)$"
+_ISO_DATE_PATTERN = (
+    r"^\d{4}-\d\d-\d\d([T ]\d\d(:\d\d(:\d\d(\.\d+)?)?)?)?([Zz]|[+-]\d\d(:?\d\d)?)?$"
+)
+_EPOCH_PATTERN = r"^-?\d+(\.\d+)?$"
+# elasticsearch default dates format
+_DEFAULT_DATE_FORMAT = "strict_date_optional_time||epoch_millis"
+# java date pattern letters supported in custom dates formats, with their strptime equivalent
+_DATE_PATTERN_LETTERS: Dict[str, str] = {
+    "yyyy": "%Y",
+    "uuuu": "%Y",
+    "yy": "%y",
+    "MM": "%m",
+    "dd": "%d",
+    "HH": "%H",
+    "mm": "%M",
+    "ss": "%S",
+}
+
+# aggregations whose bucket keys are epoch milliseconds
+_DATE_KEYED_AGGS = ("date_histogram", "auto_date_histogram")
+
+
+def import_pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            'Using arrow output format requires to install pyarrow. Please install "pyarrow" or '
+            "use another output format."
+        )
+    return pyarrow
+
+
+def _regular_field_type(pa: Any, field_type: str) -> pa.DataType:
+    if field_type in _DICTIONARY_ENCODED_TYPES:
+        return pa.dictionary(pa.int32(), pa.string())
+    if field_type in _TIMESTAMP_UNITS:
+        return pa.timestamp(_TIMESTAMP_UNITS[field_type], tz="UTC")
+    if field_type in _ARROW_TYPES:
+        return getattr(pa, _ARROW_TYPES[field_type])()
+    return pa.string()
+
+
+def _schema_fields(pa: Any, mappings: Mappings, nid: str) -> List[pa.Field]:
+    fields = []
+    for name, field in mappings.children(nid):
+        # subfields (multi-fields) are not present in documents source
+        if field._subfield:
+            continue
+        type_: pa.DataType
+        metadata: Optional[Dict[str, str]] = None
+        if isinstance(field, (Object, Nested)):
+            type_ = pa.struct(_schema_fields(pa, mappings, field.identifier))
+        else:
+            type_ = _regular_field_type(pa, field.KEY)
+            if field.KEY in _TIMESTAMP_UNITS and field._body.get("format"):
+                # used to parse dates of documents source
+                metadata = {"format": field._body["format"]}
+        if isinstance(field, Nested) or field._multiple:
+            type_ = pa.list_(pa.field("item", type_, metadata=metadata))
+        fields.append(pa.field(name, type_, metadata=metadata))
+    return fields
+
+
+def _date_format(field: pa.Field) -> Optional[str]:
+    """Return mappings date format stored in arrow field metadata, if any."""
+    if not field.metadata:
+        return None
+    format_ = field.metadata.get(b"format")
+    return None if format_ is None else format_.decode()
+
+
+def arrow_schema(mappings: Mappings) -> pa.Schema:
+    """
+    Return arrow schema of documents source complying with provided mappings: keyword fields become dictionary
+    encoded strings, numeric fields their arrow equivalent, dates UTC timestamps, objects structs, nested fields (and
+    fields declared as multiple) lists.
+    """
+    pa = import_pyarrow()
+    return pa.schema(_schema_fields(pa, mappings, mappings.root))
+
+
+def _strptime_format(pattern: str) -> Optional[str]:
+    """Convert java date pattern into strptime format, None if pattern isn't supported."""
+    parts = []
+    for match in re.finditer(r"'([^']*)'|(([A-Za-z])\3*)|([^A-Za-z']+)", pattern):
+        literal, letters, _, other = match.groups()
+        if letters is not None:
+            if letters not in _DATE_PATTERN_LETTERS:
+                return None
+            parts.append(_DATE_PATTERN_LETTERS[letters])
+        else:
+            parts.append((literal if literal is not None else other).replace("%", "%%"))
+    return "".join(parts)
+
+
+def _iso_timestamps(pa: Any, raw: pa.Array, type_: pa.DataType) -> pa.Array:
+    import pyarrow.compute as pc
+
+    no_value = pa.scalar(None, raw.type)
+    raw = pc.if_else(pc.match_substring_regex(raw, _ISO_DATE_PATTERN), raw, no_value)
+    # dates without zone offset are interpreted as UTC, as elasticsearch does
+    zoned = pc.match_substring_regex(raw, _ZONE_OFFSET_PATTERN)
+    if pc.all(zoned).as_py() is not False:
+        return raw.cast(type_)
+    naive = pc.if_else(zoned, no_value, raw).cast(pa.timestamp(type_.unit))
+    naive = pc.assume_timezone(naive, "UTC")
+    if not pc.any(zoned).as_py():
+        return naive
+    return pc.coalesce(pc.if_else(zoned, raw, no_value).cast(type_), naive)
+
+
+def _epoch_timestamps(
+    pa: Any, raw: pa.Array, type_: pa.DataType, unit: str
+) -> pa.Array:
+    import pyarrow.compute as pc
+
+    if pa.types.is_string(raw.type):
+        numeric = pc.match_substring_regex(raw, _EPOCH_PATTERN)
+        raw = pc.if_else(numeric, raw, pa.scalar(None, raw.type))
+    values = raw.cast(pa.float64())
+    if unit == "s":
+        values = pc.multiply(values, 1000)
+    return values.cast(pa.int64()).cast(pa.timestamp("ms", tz="UTC")).cast(type_)
+
+
+def _timestamp_array(
+    pa: Any, values: List[Any], type_: pa.DataType, date_format: Optional[str] = None
+) -> pa.Array:
+    """
+    Parse dates according to mappings date format (multiple formats being separated by "||"), supported formats
+    being epoch_millis, epoch_second, ISO 8601 based built-in formats (strict_date_optional_time, date_time, etc)
+    and custom patterns made of years, months, days, hours, minutes and seconds.
+    """
+    import pyarrow.compute as pc
+
+    try:
+        raw = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # mix of epoch numbers and strings
+        raw = pa.array(_string_values(values), pa.string())
+    if pa.types.is_null(raw.type):
+        return pa.nulls(len(values), type_)
+    formats = (date_format or _DEFAULT_DATE_FORMAT).split("||")
+    if pa.types.is_integer(raw.type) or pa.types.is_floating(raw.type):
+        epochs = [f for f in formats if f in ("epoch_millis", "epoch_second")]
+        # numbers are epoch milliseconds, unless epoch_second format comes first
+        unit = "s" if epochs[:1] == ["epoch_second"] else "ms"
+        return _epoch_timestamps(pa, raw, type_, unit)
+    candidates = []
+    for format_ in formats:
+        if format_ in ("epoch_millis", "epoch_second"):
+            unit = "ms" if format_ == "epoch_millis" else "s"
+            candidates.append(_epoch_timestamps(pa, raw, type_, unit))
+        elif format_.replace("strict_", "").startswith("date"):
+            candidates.append(_iso_timestamps(pa, raw, type_))
+        elif "_" not in format_:
+            strptime_format = _strptime_format(format_)
+            if strptime_format is not None:
+                parsed = pc.strptime(
+                    raw, format=strptime_format, unit=type_.unit, error_is_null=True
+                )
+                candidates.append(pc.assume_timezone(parsed, "UTC").cast(type_))
+    if not candidates:
+        raise pa.ArrowInvalid("Unsupported date format %s" % date_format)
+    parsed = pc.coalesce(*candidates) if len(candidates) > 1 else candidates[0]
+    if parsed.null_count > raw.null_count:
+        raise pa.ArrowInvalid(
+            "Cannot parse dates %s with format %s"
+            % (raw.filter(pc.and_(pc.is_null(parsed), pc.is_valid(raw)))[:3], formats)
+        )
+    return parsed
+
+
+def _string_values(values: List[Any]) -> List[Optional[str]]:
+    return [v if v is None or isinstance(v, str) else json.dumps(v) for v in values]
+
+
+def _array(
+    pa: Any,
+    values: List[Any],
+    type_: pa.DataType,
+    path: str,
+    date_format: Optional[str] = None,
+) -> pa.Array:
+    """
+    Convert values of a field (None for missing values) into an arrow array of provided type. Fields holding arrays
+    although they are not declared as multiple in mappings are converted to lists of provided type.
+    """
+    if not pa.types.is_list(type_) and any(isinstance(v, list) for v in values):
+        type_ = pa.list_(type_)
+    try:
+        if pa.types.is_list(type_):
+            offsets = [0]
+            flat_values: List[Any] = []
+            for value in values:
+                if value is None:
+                    pass
+                elif isinstance(value, list):
+                    flat_values.extend(value)
+                else:
+                    # single value for a multiple field
+                    flat_values.append(value)
+                offsets.append(len(flat_values))
+            return pa.ListArray.from_arrays(
+                pa.array(offsets, pa.int32()),
+                _array(
+                    pa,
+                    flat_values,
+                    type_.value_type,
+                    path,
+                    date_format or _date_format(type_.value_field),
+                ),
+                mask=pa.array([v is None for v in values]),
+            )
+        if pa.types.is_struct(type_):
+            children = [
+                _array(
+                    pa,
+                    [None if v is None else v.get(field.name) for v in values],
+                    field.type,
+                    "%s.%s" % (path, field.name) if path else field.name,
+                    _date_format(field),
+                )
+                for field in type_
+            ]
+            return pa.StructArray.from_arrays(
+                children,
+                # children holding arrays may have been converted to lists
+                fields=[
+                    field.with_type(child.type) for field, child in zip(type_, children)
+                ],
+                mask=pa.array([v is None for v in values]),
+            )
+        if pa.types.is_timestamp(type_):
+            return _timestamp_array(pa, values, type_, date_format)
+        if pa.types.is_string(type_) or (
+            pa.types.is_dictionary(type_) and pa.types.is_string(type_.value_type)
+        ):
+            return pa.array(_string_values(values), type_)
+        return pa.array(values, type_)
+    except (pa.ArrowException, AttributeError) as e:
+        raise ValueError(
+            "Cannot convert values of field <%s> to %s: %s" % (path, type_, e)
+        )
+
+
+def _metadata_columns(source_only: bool) -> List[str]:
+    if source_only:
+        return ["_id"]
+    return ["_id", "_index", "_score"]
+
+
+def source_schema(batch: pa.RecordBatch, source_only: bool = True) -> pa.Schema:
+    """Return schema of `_source` fields of a record batch built by `hits_record_batch`."""
+    pa = import_pyarrow()
+    metadata_columns = _metadata_columns(source_only)
+    return pa.schema([f for f in batch.schema if f.name not in metadata_columns])
+
+
+def hits_record_batch(
+    hits: List[HitDict], schema: Optional[pa.Schema], source_only: bool = True
+) -> pa.RecordBatch:
+    """
+    Convert hits into an arrow record batch, with an `_id` column, a column per `_source` field, and if not
+    `source_only`, `_index` and `_score` columns.
+
+    :param schema: schema of `_source` fields (fields absent from schema are ignored), if None it is inferred
+    """
+    pa = import_pyarrow()
+    sources = [hit.get("_source") or {} for hit in hits]
+    fields: List[Any] = [pa.field("_id", pa.string())]
+    arrays: List[Any] = [pa.array([hit.get("_id") for hit in hits], pa.string())]
+    if not source_only:
+        fields.append(pa.field("_index", pa.dictionary(pa.int32(), pa.string())))
+        arrays.append(pa.array([hit.get("_index") for hit in hits], fields[-1].type))
+        fields.append(pa.field("_score", pa.float64()))
+        arrays.append(pa.array([hit.get("_score") for hit in hits], pa.float64()))
+    if schema is None:
+        source_batch = pa.RecordBatch.from_pylist(sources)
+        fields.extend(source_batch.schema)
+        arrays.extend(source_batch.columns)
+    else:
+        for field in schema:
+            array = _array(
+                pa,
+                [source.get(field.name) for source in sources],
+                field.type,
+                field.name,
+                _date_format(field),
+            )
+            # fields holding arrays may have been converted to lists, dates formats are kept in metadata
+            fields.append(field.with_type(array.type))
+            arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def key_array(keys: List[Any], agg_type: str, field_type: Optional[str]) -> pa.Array:
+    """
+    Convert aggregation bucket keys into an arrow array: date histograms keys become UTC timestamps, keys of
+    aggregations on keyword fields dictionary encoded strings, other types are inferred.
+
+    :param agg_type: type of aggregation (or of composite source) generating keys
+    :param field_type: mappings type of aggregated field, if known
+    """
+    pa = import_pyarrow()
+    if agg_type in _DATE_KEYED_AGGS:
+        return _timestamp_array(pa, keys, pa.timestamp("ms", tz="UTC"))
+    if field_type in _DICTIONARY_ENCODED_TYPES:
+        return pa.array(_string_values(keys), pa.dictionary(pa.int32(), pa.string()))
+    return pa.array(keys)
+
+
+def columns_table(
+    index: List[Tuple[str, pa.Array]], columns: Dict[str, List[Any]]
+) -> pa.Table:
+    """Build table from index columns (already converted) and values columns, whose types are inferred."""
+    pa = import_pyarrow()
+    names = [name for name, _ in index]
+    arrays = [array for _, array in index]
+    for name, values in columns.items():
+        names.append(name)
+        arrays.append(pa.array(values))
+    return pa.Table.from_arrays(arrays, names=names)
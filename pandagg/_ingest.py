@@ -0,0 +1,299 @@
+"""
+Conversion of pandas DataFrames and Arrow tables into serialized bulk operations.
+
+Rows are serialized per batch, column by column (one vectorized JSON encoding per column), and assembled into bulk
+action and source lines by string concatenation, without building a dict per row:
+
+- missing values (None, NaN, NaT) are omitted from documents source
+- dotted column names ("location.lat") are assembled into objects
+- columns mapped as integers holding floats (because of missing values) are serialized as integers
+- datetime columns are serialized as ISO 8601 strings or epoch milliseconds
+- list columns are serialized as arrays, dict columns as objects
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Union, TYPE_CHECKING
+from typing_extensions import Literal
+
+from pandagg._arrow import import_pyarrow
+from pandagg.types import OpType, SerializedAction
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from pandagg.tree.mappings import Mappings
+
+DateFormat = Literal["iso", "epoch"]
+
+_INTEGER_TYPES = ("long", "integer", "short", "byte", "unsigned_long")
+
+# object being built from dotted columns: column name for leaves, nested object for objects
+ColumnsTree = Dict[str, Any]
+
+
+def _import_pandas() -> Any:
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError(
+            'Using dataframe ingestion requires to install pandas. Please install "pandas".'
+        )
+    return pandas
+
+
+def _columns_tree(columns: List[str]) -> ColumnsTree:
+    tree: ColumnsTree = {}
+    for column in columns:
+        node = tree
+        *parents, leaf = column.split(".")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+            if not isinstance(node, dict):
+                raise ValueError(
+                    "Column <%s> conflicts with column <%s>" % (column, node)
+                )
+        if leaf in node:
+            raise ValueError(
+                "Column <%s> conflicts with columns under same path" % column
+            )
+        node[leaf] = column
+    return tree
+
+
+def _cast_column(
+    series: pd.Series, path: str, mappings: Optional[Mappings]
+) -> pd.Series:
+    """Cast column according to type of field it is mapped to."""
+    if mappings is None:
+        return series
+    entry = mappings.fields_table.get(path)
+    if entry is None:
+        return series
+    if entry.type in _INTEGER_TYPES:
+        return _integral(series)
+    return series
+
+
+def _integral(series: pd.Series) -> pd.Series:
+    """Cast float column to (nullable) integers if all its values are integral, floats being usually caused by
+    missing values."""
+    if series.dtype.kind != "f":
+        return series
+    try:
+        return series.astype("Int64")
+    except (TypeError, ValueError):
+        # non integral values
+        return series
+
+
+def _epoch_millis(series: pd.Series) -> pd.Series:
+    pd = _import_pandas()
+    if series.dt.tz is not None:
+        series = series.dt.tz_convert(None)
+    return ((series - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).astype("Int64")
+
+
+def _column_fragments(
+    series: pd.Series, key: str, date_format: DateFormat
+) -> List[str]:
+    """
+    Encode column into '"key":value' JSON fragments, one per row, empty strings for missing values.
+    """
+    if date_format == "epoch" and series.dtype.kind == "M":
+        series = _epoch_millis(series)
+    lines = series.to_frame(name=key).to_json(
+        orient="records",
+        lines=True,
+        date_format="iso",
+        date_unit="ms",
+        force_ascii=False,
+    )
+    # JSON strings escape new lines: each line is a '{"key":value}' record
+    fragments = [line[1:-1] for line in lines.split("\n")[: len(series)]]
+    null = "%s:null" % json.dumps(key, ensure_ascii=False)
+    return ["" if f == null else f for f in fragments]
+
+
+def _object_fragments(
+    df: pd.DataFrame,
+    tree: ColumnsTree,
+    mappings: Optional[Mappings],
+    date_format: DateFormat,
+) -> List[str]:
+    """Return, per row, the comma separated fragments of the object described by `tree`."""
+    columns_fragments: List[List[str]] = []
+    for key, node in tree.items():
+        if isinstance(node, dict):
+            inner = _object_fragments(df, node, mappings, date_format)
+            prefix = "%s:{" % json.dumps(key, ensure_ascii=False)
+            columns_fragments.append(
+                ["%s%s}" % (prefix, f) if f else "" for f in inner]
+            )
+            continue
+        series = _cast_column(df[node], node, mappings)
+        columns_fragments.append(_column_fragments(series, key, date_format))
+    if len(columns_fragments) == 1:
+        return columns_fragments[0]
+    return [",".join(filter(None, row)) for row in zip(*columns_fragments)]
+
+
+def _action_lines(
+    ids: Optional[List[str]], index_name: str, op_type: OpType, size: int
+) -> List[str]:
+    prefix = '{"%s":{"_index":%s' % (op_type, json.dumps(index_name))
+    if ids is None:
+        return [prefix + "}}"] * size
+    return ["%s,%s}}" % (prefix, id_fragment) for id_fragment in ids]
+
+
+def dataframe_actions(
+    df: pd.DataFrame,
+    index_name: str,
+    mappings: Optional[Mappings] = None,
+    id_column: Optional[str] = None,
+    op_type: OpType = "index",
+    date_format: DateFormat = "iso",
+    batch_size: int = 10000,
+) -> Iterator[SerializedAction]:
+    """
+    Return an iterator over serialized bulk operations, one per row of dataframe, serialized by batches of
+    `batch_size` rows.
+
+    :param id_column: column used as documents `_id` (excluded from documents source), if None elasticsearch
+    generates ids (not possible for "update" and "delete" operations)
+    :param op_type: bulk operation, for "update" operations rows are partial documents
+    :param date_format: "iso" (ISO 8601 strings, in UTC for timezone aware columns) or "epoch" (epoch milliseconds)
+    """
+    if op_type not in ("index", "create", "update", "delete"):
+        raise ValueError(
+            "'op_type' must be one of 'index', 'create', 'update', 'delete', got %s"
+            % op_type
+        )
+    if id_column is None and op_type in ("update", "delete"):
+        raise ValueError("'id_column' is required for %s operations" % op_type)
+    if date_format not in ("iso", "epoch"):
+        raise ValueError(
+            "'date_format' must be one of 'iso', 'epoch', got %s" % date_format
+        )
+    if batch_size < 1:
+        raise ValueError("'batch_size' must be a positive integer, got %s" % batch_size)
+    if any(not isinstance(c, str) for c in df.columns):
+        df = df.rename(columns=str)
+    if id_column is not None:
+        if id_column not in df.columns:
+            raise ValueError("Unknown id column <%s>" % id_column)
+        if df[id_column].isna().any():
+            raise ValueError("Missing values in id column <%s>" % id_column)
+    tree = _columns_tree([c for c in df.columns if c != id_column])
+    return _dataframe_actions(
+        df, tree, index_name, mappings, id_column, op_type, date_format, batch_size
+    )
+
+
+def _dataframe_actions(
+    df: pd.DataFrame,
+    tree: ColumnsTree,
+    index_name: str,
+    mappings: Optional[Mappings],
+    id_column: Optional[str],
+    op_type: OpType,
+    date_format: DateFormat,
+    batch_size: int,
+) -> Iterator[SerializedAction]:
+    pattern = '{"doc":{%s}}' if op_type == "update" else "{%s}"
+    for start in range(0, len(df), batch_size):
+        stop = start + batch_size
+        batch = df.iloc[start:stop]
+        ids: Optional[List[str]] = None
+        if id_column is not None:
+            ids = _column_fragments(
+                _integral(batch[id_column]).astype(str), "_id", date_format
+            )
+        actions = _action_lines(ids, index_name, op_type, len(batch))
+        if op_type == "delete":
+            for action in actions:
+                yield action, None
+            continue
+        sources: List[str] = (
+            _object_fragments(batch, tree, mappings, date_format)
+            if tree
+            else [""] * len(batch)
+        )
+        for action, source in zip(actions, sources):
+            yield action, pattern % source
+
+
+def _flattened(pa: Any, table: pa.Table) -> pa.Table:
+    """Flatten struct columns, recursively, into dotted columns."""
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+    return table
+
+
+def _pandas_types_mapper(pd: Any, pa: Any) -> Dict[Any, Any]:
+    # integers with missing values are kept as (nullable) integers, rather than converted to floats
+    return {
+        pa.int8(): pd.Int8Dtype(),
+        pa.int16(): pd.Int16Dtype(),
+        pa.int32(): pd.Int32Dtype(),
+        pa.int64(): pd.Int64Dtype(),
+        pa.uint8(): pd.UInt8Dtype(),
+        pa.uint16(): pd.UInt16Dtype(),
+        pa.uint32(): pd.UInt32Dtype(),
+        pa.uint64(): pd.UInt64Dtype(),
+        pa.bool_(): pd.BooleanDtype(),
+    }
+
+
+def arrow_actions(
+    table: Union[pa.Table, pa.RecordBatch],
+    index_name: str,
+    mappings: Optional[Mappings] = None,
+    id_column: Optional[str] = None,
+    op_type: OpType = "index",
+    date_format: DateFormat = "iso",
+    batch_size: int = 10000,
+) -> Iterator[SerializedAction]:
+    """
+    Return an iterator over serialized bulk operations, one per row of arrow table (or record batch), converted by
+    batches of `batch_size` rows. Struct columns become objects. See `dataframe_actions` for parameters.
+    """
+    pd = _import_pandas()
+    pa = import_pyarrow()
+    if isinstance(table, pa.RecordBatch):
+        table = pa.Table.from_batches([table])
+    if batch_size < 1:
+        raise ValueError("'batch_size' must be a positive integer, got %s" % batch_size)
+    table = _flattened(pa, table)
+    # validate parameters on an empty frame
+    dataframe_actions(
+        table.slice(0, 0).to_pandas(),
+        index_name=index_name,
+        id_column=id_column,
+        op_type=op_type,
+        date_format=date_format,
+    )
+    if id_column is not None and table.column(id_column).null_count:
+        raise ValueError("Missing values in id column <%s>" % id_column)
+    return _arrow_actions(
+        pd,
+        pa,
+        table,
+        index_name=index_name,
+        mappings=mappings,
+        id_column=id_column,
+        op_type=op_type,
+        date_format=date_format,
+        batch_size=batch_size,
+    )
+
+
+def _arrow_actions(
+    pd: Any, pa: Any, table: pa.Table, batch_size: int, **kwargs: Any
+) -> Iterator[SerializedAction]:
+    types_mapper = _pandas_types_mapper(pd, pa).get
+    for batch in table.to_batches(max_chunksize=batch_size):
+        df = batch.to_pandas(types_mapper=types_mapper)
+        for action in dataframe_actions(df, batch_size=batch_size, **kwargs):
+            yield action
@@ -0,0 +1,280 @@
+"""
+Helpers to drain multiple Elasticsearch cursors concurrently, on a thread pool or on a process pool, and merge their
+results in a single stream, or to fetch pages of a single cursor ahead of their consumption.
+"""
+from __future__ import annotations
+
+import queue
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Dict, List, Iterator, Optional, Tuple, Union, TypeVar
+from typing_extensions import Literal
+
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import scan
+
+from pandagg.types import HitDict, SearchDict
+
+T = TypeVar("T")
+
+ExecutorType = Literal["thread", "process"]
+
+# (slice id, batch of hits, error), a None batch without error signals that the slice is exhausted
+SliceMessage = Tuple[int, Optional[List[HitDict]], Optional[BaseException]]
+
+# seconds between two checks of stop event (by workers) or of workers failures (by consumer) while waiting on queue
+_POLL_INTERVAL = 0.1
+
+
+def _connection_params(client: Elasticsearch) -> Dict[str, Any]:
+    """
+    Return picklable parameters allowing to instantiate, in another process, a client equivalent to provided one.
+    """
+    return {"hosts": client.transport.hosts, **client.transport.kwargs}
+
+
+def _put(out: Any, item: Any, stop: Any) -> bool:
+    """
+    Put item in queue, waiting for room in queue unless consumer asked to stop. Return whether item was put.
+    """
+    while True:
+        try:
+            out.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            if stop.is_set():
+                return False
+
+
+def _drain_scan_slice(
+    client: Union[Elasticsearch, Dict[str, Any]],
+    query: SearchDict,
+    index: Optional[List[str]],
+    slice_id: int,
+    batch_size: int,
+    out: Any,
+    stop: Any,
+) -> None:
+    """
+    Scroll over a single slice, and push hits per batch in `out` queue until slice is exhausted or `stop` event is set.
+
+    :param client: Elasticsearch client, or connection parameters when executed in a child process
+    """
+    if stop.is_set():
+        return
+    try:
+        if isinstance(client, dict):
+            client = Elasticsearch(**client)
+        hits = scan(client, query=query, index=index)
+        try:
+            batch: List[HitDict] = []
+            for hit in hits:
+                batch.append(hit)
+                if len(batch) < batch_size:
+                    continue
+                if not _put(out, (slice_id, batch, None), stop):
+                    return
+                batch = []
+            if batch and not _put(out, (slice_id, batch, None), stop):
+                return
+        finally:
+            # closing generator clears the scroll context, even on early exit
+            hits.close()
+    except Exception as e:
+        _put(out, (slice_id, None, e), stop)
+        return
+    _put(out, (slice_id, None, None), stop)
+
+
+def sliced_scan(
+    client: Elasticsearch,
+    query: SearchDict,
+    index: Optional[List[str]],
+    slices: int,
+    workers: Optional[int] = None,
+    executor: ExecutorType = "thread",
+    batch_size: int = 1000,
+) -> Iterator[HitDict]:
+    """
+    Open `slices` sliced scrolls, drain them concurrently and yield their hits as they arrive (no ordering guarantee
+    across slices).
+
+    :param client: Elasticsearch client
+    :param query: search body, without `slice` parameter
+    :param index: searched indices
+    :param slices: number of slices, ie of scroll contexts
+    :param workers: number of slices drained at the same time, defaults to `slices`
+    :param executor: "thread" or "process"; in the latter case, each process instantiates its own client based on
+    provided client hosts and connection parameters (which must be picklable)
+    :param batch_size: number of hits sent at once by a worker to the consumer
+    """
+    if slices < 1:
+        raise ValueError("'slices' must be a positive integer, got %s" % slices)
+    if executor not in ("thread", "process"):
+        raise ValueError(
+            "'executor' must be one of 'thread', 'process', got %s" % executor
+        )
+    workers = workers or slices
+    # bounded to apply back-pressure on workers if consumer is slower
+    max_batches = 2 * workers
+
+    pool: Executor
+    manager = None
+    client_: Union[Elasticsearch, Dict[str, Any]]
+    if executor == "process":
+        manager = multiprocessing.Manager()
+        out: Any = manager.Queue(maxsize=max_batches)
+        stop: Any = manager.Event()
+        pool = ProcessPoolExecutor(max_workers=workers)
+        client_ = _connection_params(client)
+    else:
+        out = queue.Queue(maxsize=max_batches)
+        stop = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=workers)
+        client_ = client
+
+    futures = [
+        pool.submit(
+            _drain_scan_slice,
+            client_,
+            dict(query, slice={"id": slice_id, "max": slices}),  # type: ignore
+            index,
+            slice_id,
+            batch_size,
+            out,
+            stop,
+        )
+        for slice_id in range(slices)
+    ]
+    try:
+        remaining = slices
+        while remaining:
+            try:
+                _, batch, error = out.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                # a worker can fail before being able to report (for instance if its arguments are not picklable)
+                for future in futures:
+                    if future.done() and not future.cancelled() and future.exception():
+                        raise future.exception()  # type: ignore
+                continue
+            if error is not None:
+                raise error
+            if batch is None:
+                remaining -= 1
+                continue
+            for hit in batch:
+                yield hit
+    finally:
+        stop.set()
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=True)
+        if manager is not None:
+            manager.shutdown()
+
+
+class _SharedIterator(Iterator[T]):
+    def __init__(self, iterator: Iterator[T]) -> None:
+        self._iterator = iterator
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> "_SharedIterator[T]":
+        return self
+
+    def __next__(self) -> T:
+        with self._lock:
+            return next(self._iterator)
+
+
+def shared(iterator: Iterator[T]) -> Iterator[T]:
+    """
+    Thread-safe view of an iterator, so that it can be consumed by several workers at the same time (each item being
+    consumed by a single worker).
+    """
+    return _SharedIterator(iterator)
+
+
+def _drain_iterator(iterator: Iterator[T], out: Any, stop: Any) -> None:
+    """
+    Push items of iterator in `out` queue until it is exhausted or `stop` event is set. Messages are
+    (finished, item, error) tuples.
+    """
+    try:
+        for item in iterator:
+            if not _put(out, (False, item, None), stop):
+                return
+    except Exception as e:
+        _put(out, (True, None, e), stop)
+        return
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+    _put(out, (True, None, None), stop)
+
+
+def merged(
+    iterators: List[Iterator[T]],
+    workers: Optional[int] = None,
+    ordered: bool = False,
+    buffer: int = 1,
+) -> Iterator[T]:
+    """
+    Consume provided iterators concurrently on a thread pool, and yield their items in a single stream.
+
+    Errors raised while producing items are re-raised on caller side. On early exit, workers stop once their current
+    item is produced, and iterators that were not started yet are not consumed.
+
+    :param iterators: iterators to consume
+    :param workers: number of iterators consumed at the same time, defaults to the number of iterators
+    :param ordered: if True, all items of an iterator are yielded before the ones of next iterator (following
+    iterators are still consumed in advance); otherwise items are yielded as they arrive
+    :param buffer: number of items each iterator can be consumed ahead of the caller
+    """
+    if buffer < 1:
+        raise ValueError("'buffer' must be a positive integer, got %s" % buffer)
+    if not iterators:
+        return
+    workers = workers or len(iterators)
+    stop = threading.Event()
+    outs: List[queue.Queue]
+    if ordered:
+        outs = [queue.Queue(maxsize=buffer) for _ in iterators]
+    else:
+        outs = [queue.Queue(maxsize=buffer * workers)] * len(iterators)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = [
+        pool.submit(_drain_iterator, iterator, out, stop)
+        for iterator, out in zip(iterators, outs)
+    ]
+    try:
+        remaining = len(iterators)
+        # in ordered mode, queues are drained one after the other; otherwise they all are the same queue
+        for out in outs if ordered else outs[:1]:
+            while remaining:
+                finished, item, error = out.get()
+                if error is not None:
+                    raise error
+                if finished:
+                    remaining -= 1
+                    if ordered:
+                        break
+                    continue
+                yield item
+    finally:
+        stop.set()
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+def prefetched(iterator: Iterator[T], depth: int) -> Iterator[T]:
+    """
+    Consume provided iterator on a background thread, at most `depth` items ahead of the caller, so that producing
+    next items (typically fetching next pages) overlaps with the processing of current ones.
+    """
+    if depth < 1:
+        raise ValueError("'depth' must be a positive integer, got %s" % depth)
+    return merged([iterator], workers=1, buffer=depth)
@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+import asyncio
+
+from typing import (
+    Optional,
+    Union,
+    Tuple,
+    List,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    TYPE_CHECKING,
+)
+
+from elasticsearch import TransportError
+
+from pandagg._arrow import import_pyarrow, hits_record_batch, source_schema
+from pandagg.cache import (
+    ResponseCache,
+    SingleFlight,
+    CacheMode,
+    async_cached_call,
+    fingerprint,
+)
+from pandagg.response import SearchResponse, Hit, Hits, Aggregations
+from pandagg.search import Search, MultiSearch, MultiSearchBatch
+from pandagg.tree.mappings import Mappings
+from pandagg.types import (
+    MappingsDict,
+    AggName,
+    SearchResponseDict,
+    DeleteByQueryResponse,
+    BucketDict,
+    AfterKey,
+    HitDict,
+    SearchDict,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from elasticsearch import AsyncElasticsearch
+    from pandagg.document import DocumentMeta
+
+
+__all__ = ["AsyncSearch", "AsyncMultiSearch"]
+
+
+class AsyncSearch(Search):
+    """
+    Search request executed through an ``elasticsearch.AsyncElasticsearch`` client.
+
+    Building methods (`query`, `filter`, `agg`, `groupby` etc) are the same as :class:`~pandagg.search.Search` ones,
+    only executing methods are awaitable (`execute`, `count`, `delete`, `scan_composite_agg_at_once`,
+    `scan_terms_partitions`) or asynchronous generators (`scan`, `scan_composite_agg`, `scan_composite_dataframes`,
+    `scan_dataframes`, `scan_arrow`, `iterate_pit`). Responses are parsed in the same
+    :class:`~pandagg.response.SearchResponse` instances.
+
+    >>> s = AsyncSearch(using=AsyncElasticsearch(), index="movies").filter("term", genres="Drama")
+    >>> response = await s.execute()
+
+    Requires `aiohttp` dependency (``pip install elasticsearch[async]``).
+    """
+
+    # register under a distinct type so that "search" type still resolves to synchronous Search
+    _type_name = "async_search"
+
+    def __init__(
+        self,
+        using: Optional[AsyncElasticsearch] = None,
+        index: Optional[Union[str, Tuple[str], List[str]]] = None,
+        mappings: Optional[Union[MappingsDict, Mappings]] = None,
+        nested_autocorrect: bool = False,
+        document_class: Optional[DocumentMeta] = None,
+        cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        auto_filter_path: bool = False,
+    ) -> None:
+        # note: no repr_auto_execute, search cannot be executed synchronously at __repr__
+        super(AsyncSearch, self).__init__(
+            using=using,  # type: ignore
+            index=index,
+            mappings=mappings,
+            nested_autocorrect=nested_autocorrect,
+            document_class=document_class,
+            cache=cache,
+            single_flight=single_flight,
+            auto_filter_path=auto_filter_path,
+        )
+
+    def _get_connection(self) -> AsyncElasticsearch:  # type: ignore
+        if self._using is None:
+            raise ValueError(
+                "An AsyncElasticsearch client must be provided in order to execute queries."
+            )
+        return self._using  # type: ignore
+
+    def __aiter__(self) -> AsyncIterator[Hit]:
+        """
+        Iterate over the hits of executed search. Return asynchronous iterable of ``pandagg.response.Hit``.
+        """
+        return self._aiter_hits()
+
+    async def _aiter_hits(self) -> AsyncIterator[Hit]:
+        r = await self.execute()
+        for hit in r:
+            yield hit
+
+    async def count(self, cache_mode: CacheMode = "use") -> int:  # type: ignore
+        """
+        Return the number of hits matching the query and filters. Note that
+        only the actual number is returned.
+        """
+        es = self._get_connection()
+
+        d = self._body(count=True)
+        r = await async_cached_call(
+            self._cache,
+            fingerprint("count", self._index, d, client=es),
+            lambda: es.count(index=self._index, body=d),
+            mode=cache_mode,
+        )
+        return r["count"]
+
+    async def execute(self, cache_mode: CacheMode = "use") -> SearchResponse:  # type: ignore
+        """
+        Execute the search and return an instance of ``Response`` wrapping all
+        the data.
+        """
+        es = self._get_connection()
+        body = self._body()
+        params: Dict[str, Any] = self._execute_params(body)
+        key = fingerprint(
+            "search", self._index, [body, params] if params else body, client=es
+        )
+
+        def fetch() -> Awaitable[SearchResponseDict]:
+            return async_cached_call(
+                self._cache,
+                key,
+                lambda: es.search(index=self._index, body=body, **params),
+                mode=cache_mode,
+            )
+
+        if self._single_flight is None:
+            raw_data = await fetch()
+        else:
+            # raw response is shared, each search parses it (according to its own document class etc)
+            raw_data = await self._single_flight.do_async(
+                "%s:%s:%s" % (id(es), cache_mode, key), fetch
+            )
+        return SearchResponse(data=raw_data, _search=self)  # type: ignore
+
+    async def scan_composite_agg(self, size: int) -> AsyncIterator[BucketDict]:  # type: ignore
+        """
+        Iterate over the whole aggregation composed buckets, yields buckets.
+
+        Pages are fetched one after the other by a single composite cursor: `prefetch`, `partitions`, `workers` and
+        `ordered` parameters of :func:`~pandagg.search.Search.scan_composite_agg` are only supported by synchronous
+        searches.
+        """
+        async for page in self._composite_agg_pages(size=size):
+            for bucket in page:
+                yield bucket
+
+    async def _composite_agg_pages(self, size: int) -> AsyncIterator[List[BucketDict]]:  # type: ignore
+        """Iterate over the whole aggregation composed buckets, yields pages of buckets."""
+        s: AsyncSearch = self._clone().size(0)  # type: ignore
+        a_name, _ = s._aggs.get_composition_supporting_agg()
+        after_key: Optional[AfterKey] = None
+        while True:
+            s._aggs = s._aggs.as_composite(size=size, after=after_key)
+            r: SearchResponse = await s.execute()
+            # absent if filtered by "filter_path" (no buckets)
+            agg_clause_response = r.aggregations.data.get(a_name, {})
+            buckets: List[BucketDict] = agg_clause_response.get("buckets", [])  # type: ignore
+            yield buckets
+            if len(buckets) < size or "after_key" not in agg_clause_response:
+                return
+            after_key = agg_clause_response["after_key"]  # type: ignore
+
+    async def scan_composite_dataframes(  # type: ignore
+        self,
+        size: int,
+        normalize_children: bool = True,
+        with_single_bucket_groups: bool = False,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """
+        Asynchronous equivalent of :func:`~pandagg.search.Search.scan_composite_dataframes`: iterate over the whole
+        aggregation composed buckets, and yield a dataframe per page of (at most) `size` buckets. Requires pandas
+        dependency.
+        """
+        to_dataframe = self._composite_page_parser(
+            size,
+            normalize_children=normalize_children,
+            with_single_bucket_groups=with_single_bucket_groups,
+        )
+        async for page in self._composite_agg_pages(size=size):
+            if page:
+                yield to_dataframe(page)
+
+    def _scan_composite_pages(self, *args: Any, **kwargs: Any) -> Any:
+        raise NotImplementedError(
+            "Prefetched and partitioned composite aggregation scans are only supported by synchronous searches."
+        )
+
+    def _composite_partitions(self, partitions: int) -> Any:
+        raise NotImplementedError(
+            "Partitioned composite aggregation scans are only supported by synchronous searches."
+        )
+
+    async def scan_composite_agg_at_once(self, size: int) -> Aggregations:  # type: ignore
+        """Iterate over the whole aggregation composed buckets (converting Aggs into composite agg if possible), and
+        return all buckets at once in a Aggregations instance.
+        """
+        all_buckets = [b async for b in self.scan_composite_agg(size=size)]
+        s: Search = self._clone().size(0)
+        s._aggs = s._aggs.as_composite(size=size)
+        agg_name: AggName
+        agg_name, _ = s._aggs.get_composition_supporting_agg()  # type: ignore
+        # artificially merge all buckets as if they were returned in a single query
+        return Aggregations(_search=s, data={agg_name: {"buckets": all_buckets}})
+
+    async def scan_terms_partitions(  # type: ignore
+        self, agg_name: AggName, num_partitions: int, concurrency: Optional[int] = None
+    ) -> Aggregations:
+        """
+        Asynchronous equivalent of :func:`~pandagg.search.Search.scan_terms_partitions`: execute the search once
+        per partition of the `agg_name` terms aggregation, at most `concurrency` partitions being awaited at the
+        same time, and merge all responses in a single Aggregations instance. Buckets order only holds within each
+        partition.
+        """
+        nid, searches = self._terms_partitions_searches(agg_name, num_partitions)
+        semaphore = asyncio.Semaphore(concurrency or num_partitions)
+
+        async def execute_partition(s: AsyncSearch) -> Dict[str, Any]:
+            async with semaphore:
+                r = await s.execute()
+            return r.aggregations.data  # type: ignore
+
+        responses = await asyncio.gather(*map(execute_partition, searches))  # type: ignore
+        return self._merged_terms_partitions(nid, list(responses))
+
+    async def scan(self) -> AsyncIterator[Hit]:  # type: ignore
+        """
+        Turn the search into a scan search and return an asynchronous generator that will
+        iterate over all the documents matching the query.
+
+        Relies on ``async_scan`` helper from ``elasticsearch-py`` -
+        https://elasticsearch-py.readthedocs.io/en/master/async.html#scan
+        """
+        async for hit in self._scan_hits():
+            yield Hit(hit, _document_class=self._document_class)
+
+    async def _scan_hits(self) -> AsyncIterator[HitDict]:  # type: ignore
+        """Raw hits of `scan`."""
+        try:
+            from elasticsearch.helpers import async_scan
+        except ImportError:
+            raise ImportError(
+                'Using asynchronous scan requires to install aiohttp. Please install "elasticsearch[async]".'
+            )
+        es = self._get_connection()
+        async for hit in async_scan(es, query=self.to_dict(), index=self._index):
+            yield hit  # type: ignore
+
+    async def scan_dataframes(  # type: ignore
+        self,
+        chunk_size: int = 1000,
+        expand_source: bool = True,
+        source_only: bool = True,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """
+        Asynchronous equivalent of :func:`~pandagg.search.Search.scan_dataframes`: iterate over all the documents
+        matching the query, and yield them as dataframes of (at most) `chunk_size` documents. Requires pandas
+        dependency. Sliced scrolls are only supported by synchronous searches.
+        """
+        if chunk_size < 1:
+            raise ValueError(
+                "'chunk_size' must be a positive integer, got %s" % chunk_size
+            )
+        async for hits in self._scan_chunks(chunk_size):
+            yield Hits(data={"hits": hits}, _document_class=None).to_dataframe(
+                expand_source=expand_source, source_only=source_only
+            )
+
+    async def scan_arrow(  # type: ignore
+        self,
+        batch_size: int = 1000,
+        source_only: bool = True,
+        schema: Optional[pa.Schema] = None,
+    ) -> AsyncIterator[pa.RecordBatch]:
+        """
+        Asynchronous equivalent of :func:`~pandagg.search.Search.scan_arrow`: iterate over all the documents matching
+        the query, and yield them as arrow record batches of `batch_size` documents. Requires pyarrow dependency.
+        Sliced scrolls are only supported by synchronous searches.
+        """
+        if batch_size < 1:
+            raise ValueError(
+                "'batch_size' must be a positive integer, got %s" % batch_size
+            )
+        import_pyarrow()
+        if schema is None and self._mappings is not None:
+            schema = self._mappings.to_arrow_schema()
+        async for hits in self._scan_chunks(batch_size):
+            batch = hits_record_batch(hits, schema=schema, source_only=source_only)
+            # following batches are converted to schema inferred from first one, or to mappings schema extended
+            # with fields converted to lists
+            schema = source_schema(batch, source_only=source_only)
+            yield batch
+
+    async def _scan_chunks(self, chunk_size: int) -> AsyncIterator[List[HitDict]]:  # type: ignore
+        """Raw hits of `scan`, grouped in lists of (at most) `chunk_size` hits."""
+        hits: List[HitDict] = []
+        async for hit in self._scan_hits():
+            hits.append(hit)
+            if len(hits) == chunk_size:
+                yield hits
+                hits = []
+        if hits:
+            yield hits
+
+    async def iterate_pit(  # type: ignore
+        self,
+        page_size: int = 1000,
+        keep_alive: str = "1m",
+        search_after: Optional[List[Any]] = None,
+    ) -> AsyncIterator[Hit]:
+        """
+        Asynchronous equivalent of :func:`~pandagg.search.Search.iterate_pit`: iterate over all the documents
+        matching the query, paginating with `search_after` over a point in time that is always closed at the end of
+        iteration.
+        """
+        es = self._get_connection()
+        body = self._pit_body(page_size=page_size)
+        pit = await es.open_point_in_time(
+            index=self._index or "_all", keep_alive=keep_alive
+        )
+        pit_id: str = pit["id"]
+        try:
+            while True:
+                page_body: SearchDict = dict(  # type: ignore
+                    body, pit={"id": pit_id, "keep_alive": keep_alive}
+                )
+                if search_after is not None:
+                    page_body["search_after"] = search_after  # type: ignore
+                raw_data = await es.search(body=page_body)
+                # point in time id can change between requests
+                pit_id = raw_data.get("pit_id", pit_id)
+                hits: List[HitDict] = raw_data["hits"]["hits"]
+                for hit in hits:
+                    yield Hit(hit, _document_class=self._document_class)
+                if len(hits) < page_size:
+                    return
+                search_after = hits[-1]["sort"]
+                # hits total is only computed for first page
+                body["track_total_hits"] = False
+        finally:
+            await es.close_point_in_time(body={"id": pit_id})
+
+    async def delete(self) -> DeleteByQueryResponse:  # type: ignore
+        """
+        delete() executes the query by delegating to delete_by_query()
+        """
+        es = self._get_connection()
+        return await es.delete_by_query(index=self._index, body=self.to_dict())  # type: ignore
+
+
+class AsyncMultiSearch(MultiSearch):
+    """
+    Combine multiple :class:`~pandagg.async_search.AsyncSearch` objects into a single
+    request, executed through an ``elasticsearch.AsyncElasticsearch`` client.
+    """
+
+    def __init__(
+        self,
+        using: Optional[AsyncElasticsearch],
+        index: Optional[Union[str, Tuple[str], List[str]]] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ) -> None:
+        super(AsyncMultiSearch, self).__init__(
+            using=using, index=index, single_flight=single_flight  # type: ignore
+        )
+
+    def _get_connection(self) -> AsyncElasticsearch:  # type: ignore
+        if self._using is None:
+            raise ValueError(
+                "An AsyncElasticsearch client must be provided in order to execute queries."
+            )
+        return self._using  # type: ignore
+
+    async def execute(self) -> List[SearchResponseDict]:  # type: ignore
+        """
+        Execute the multi search request and return a list of search results.
+        """
+        es = self._get_connection()
+        body = self.to_dict()
+        if self._single_flight is None:
+            return await es.msearch(index=self._index, body=body, **self._params)  # type: ignore
+        key = fingerprint("msearch", self._index, [body, self._params], client=es)
+        return await self._single_flight.do_async(
+            "%s:%s" % (id(es), key),
+            lambda: es.msearch(index=self._index, body=body, **self._params),
+        )
+
+    async def execute_batched(  # type: ignore
+        self,
+        batch_size: int = 100,
+        batch_bytes: int = 10 * 1024 * 1024,
+        concurrency: int = 1,
+    ) -> List[SearchResponse]:
+        """
+        Asynchronous equivalent of :func:`~pandagg.search.MultiSearch.execute_batched`: execute searches in batched
+        multi search requests, at most `concurrency` of them being awaited at the same time, and return a
+        :class:`~pandagg.response.SearchResponse` per search.
+        """
+        es = self._get_connection()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def execute_batch(batch: MultiSearchBatch) -> List[SearchResponse]:
+            searches, body = batch
+            async with semaphore:
+                try:
+                    raw_data = await es.msearch(
+                        index=self._index, body=body, **self._params
+                    )
+                except TransportError as e:
+                    return self._batch_responses(searches, error=e)
+            return self._batch_responses(searches, raw_data=raw_data)
+
+        batches = self._batches(batch_size=batch_size, batch_bytes=batch_bytes)
+        batches_responses = await asyncio.gather(*map(execute_batch, batches))
+        return [r for responses in batches_responses for r in responses]
@@ -0,0 +1,446 @@
+"""
+Adaptive bulk execution: batches size (in number of operations and in bytes) and number of concurrent bulk requests
+are adjusted after each request, based on its observed latency, its `took` and its rejections, toward a target
+latency.
+
+>>> from pandagg.bulk import AdaptiveBulkController
+>>> controller = AdaptiveBulkController(target_latency=2.0, max_concurrency=8)
+>>> index.docs.bulk(actions).perform(adaptive=controller, max_retries=5)
+>>> controller.metrics
+BulkMetrics(requests=412, operations=2000000, bytes=1843120455, rejected=37, ...)
+"""
+from __future__ import annotations
+
+import collections
+import dataclasses
+import threading
+import time
+from typing import Any, Deque, Iterator, List, Optional, Tuple, Union
+from typing_extensions import Literal
+
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.exceptions import TransportError
+
+from pandagg._parallel import merged, shared
+from pandagg.types import Action, ActionResult, SerializedAction
+from pandagg.utils import expand_action
+
+__all__ = ["AdaptiveBulkController", "BulkDecision", "BulkMetrics"]
+
+# "backoff": rejections, "shrink": slower than target, "grow": faster than target, "hold": within tolerance
+BulkDecisionType = Literal["backoff", "shrink", "grow", "hold"]
+
+# serialized action line, serialized source line (None for deletions), size in bytes of both
+SizedAction = Tuple[str, Optional[str], int]
+
+
+@dataclasses.dataclass(frozen=True)
+class BulkDecision:
+    """
+    Adjustment made by the controller after a bulk request.
+
+    :param decision: "backoff" (rejected operations), "shrink" (slower than target), "grow" (faster than target), or
+    "hold" (within tolerance of target latency)
+    :param operations: number of operations sent in request
+    :param bytes: size of request body
+    :param latency: request round-trip, in seconds
+    :param took: time spent by cluster to process request, in milliseconds, None if request failed
+    :param rejected: number of operations rejected with a 429 status (or all of them if request was rejected)
+    :param chunk_size: maximum number of operations per request after decision
+    :param chunk_bytes: maximum size in bytes of a request after decision
+    :param concurrency: number of concurrent requests after decision
+    """
+
+    decision: BulkDecisionType
+    operations: int
+    bytes: int
+    latency: float
+    took: Optional[int]
+    rejected: int
+    chunk_size: int
+    chunk_bytes: int
+    concurrency: int
+
+
+@dataclasses.dataclass
+class BulkMetrics:
+    requests: int = 0
+    operations: int = 0
+    bytes: int = 0
+    rejected: int = 0
+    latency: float = 0.0
+    # last decisions, most recent last
+    decisions: Deque[BulkDecision] = dataclasses.field(
+        default_factory=lambda: collections.deque(maxlen=1000), repr=False
+    )
+
+    @property
+    def rejection_rate(self) -> Optional[float]:
+        if not self.operations:
+            return None
+        return self.rejected / self.operations
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        if not self.requests:
+            return None
+        return self.latency / self.requests
+
+
+class AdaptiveBulkController:
+    """
+    Adjust bulk requests size and concurrency toward a target latency, in an additive increase / multiplicative
+    decrease manner. After each request:
+
+    - if some operations were rejected (429 status), batches size is halved and concurrency decreased by one
+    - if request is slower than target, batches size is reduced to the size that would have met the target (at most
+      halved), and if the cluster itself took longer than target (`took`), concurrency is decreased by one
+    - if request is faster than target, batches size is increased to the size that would have met the target (at
+      most doubled), and once it reaches its maximum, concurrency is increased by one
+    - if request latency is within tolerance of target, batches size is kept, and concurrency is increased by one
+
+    Since concurrent requests observe the same cluster state, rejections and concurrency decreases are applied at
+    most once per target latency period, and concurrency increases at most once per period per concurrent request,
+    provided no request was rejected meanwhile.
+
+    Batches size in number of operations and in bytes are scaled by the same factor, within their bounds. Decisions
+    and cumulative statistics are exposed in `metrics`. A controller can be reused across `perform` calls, starting
+    from its last state.
+
+    :param target_latency: targeted bulk request latency, in seconds
+    :param tolerance: relative deviation from target latency under which batches size is not changed
+    :param chunk_size: initial maximum number of operations per request
+    :param min_chunk_size: lower bound of number of operations per request
+    :param max_chunk_size: upper bound of number of operations per request
+    :param chunk_bytes: initial maximum size in bytes of a request
+    :param min_chunk_bytes: lower bound of request maximum size in bytes
+    :param max_chunk_bytes: upper bound of request maximum size in bytes
+    :param concurrency: initial number of concurrent requests
+    :param max_concurrency: upper bound of number of concurrent requests (number of threads performing requests)
+    """
+
+    def __init__(
+        self,
+        target_latency: float = 1.0,
+        tolerance: float = 0.2,
+        chunk_size: int = 500,
+        min_chunk_size: int = 10,
+        max_chunk_size: int = 10000,
+        chunk_bytes: int = 10 * 1024 * 1024,
+        min_chunk_bytes: int = 1024 * 1024,
+        max_chunk_bytes: int = 100 * 1024 * 1024,
+        concurrency: int = 1,
+        max_concurrency: int = 4,
+    ) -> None:
+        if target_latency <= 0:
+            raise ValueError(
+                "'target_latency' must be a positive number, got %s" % target_latency
+            )
+        if not 0 < min_chunk_size <= chunk_size <= max_chunk_size:
+            raise ValueError(
+                "Chunk size bounds must satisfy 0 < min_chunk_size <= chunk_size <= max_chunk_size, got %s, %s, %s"
+                % (min_chunk_size, chunk_size, max_chunk_size)
+            )
+        if not 0 < min_chunk_bytes <= chunk_bytes <= max_chunk_bytes:
+            raise ValueError(
+                "Chunk bytes bounds must satisfy 0 < min_chunk_bytes <= chunk_bytes <= max_chunk_bytes, got %s, %s, %s"
+                % (min_chunk_bytes, chunk_bytes, max_chunk_bytes)
+            )
+        if not 0 < concurrency <= max_concurrency:
+            raise ValueError(
+                "Concurrency bounds must satisfy 0 < concurrency <= max_concurrency, got %s, %s"
+                % (concurrency, max_concurrency)
+            )
+        self.target_latency: float = target_latency
+        self.tolerance: float = tolerance
+        self.min_chunk_size: int = min_chunk_size
+        self.max_chunk_size: int = max_chunk_size
+        self.min_chunk_bytes: int = min_chunk_bytes
+        self.max_chunk_bytes: int = max_chunk_bytes
+        self.max_concurrency: int = max_concurrency
+        self.chunk_size: int = chunk_size
+        self.chunk_bytes: int = chunk_bytes
+        self.concurrency: int = concurrency
+        self.metrics: BulkMetrics = BulkMetrics()
+        self._active: int = 0
+        self._last_change: float = float("-inf")
+        self._last_rejection: float = float("-inf")
+        self._condition: threading.Condition = threading.Condition()
+
+    def reset_metrics(self) -> None:
+        with self._condition:
+            self.metrics = BulkMetrics()
+
+    def acquire(self) -> None:
+        """Wait until less than `concurrency` requests are in progress, and register a new one."""
+        with self._condition:
+            while self._active >= self.concurrency:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def take(self, actions: Iterator[SizedAction]) -> List[SizedAction]:
+        """
+        Pull next batch of serialized actions, bounded by current batch size in number of operations and in bytes
+        (a single action larger than the bytes bound makes a batch on its own).
+        """
+        chunk_size, chunk_bytes = self.chunk_size, self.chunk_bytes
+        chunk: List[SizedAction] = []
+        size = 0
+        for action in actions:
+            chunk.append(action)
+            size += action[2]
+            if len(chunk) >= chunk_size or size >= chunk_bytes:
+                break
+        return chunk
+
+    def observe(
+        self,
+        operations: int,
+        bytes_: int,
+        latency: float,
+        took: Optional[int],
+        rejected: int,
+    ) -> BulkDecision:
+        """Record a performed bulk request, adjust batches size and concurrency, and return the decision made."""
+        with self._condition:
+            target = self.target_latency
+            chunk_size, chunk_bytes = self.chunk_size, self.chunk_bytes
+            # concurrent requests observe the same cluster state: decrease at most once per target latency period,
+            # increase at most once per period per concurrent request, and not shortly after a rejection
+            now = time.monotonic()
+            can_decrease = now - self._last_change >= target
+            can_increase = (
+                now - max(self._last_change, self._last_rejection)
+                >= target * self.concurrency
+            )
+            concurrency_step = 0
+            decision: BulkDecisionType
+            if rejected:
+                decision = "backoff"
+                self._last_rejection = now
+                if can_decrease:
+                    chunk_size //= 2
+                    chunk_bytes //= 2
+                    concurrency_step = -1
+            elif latency > target * (1 + self.tolerance):
+                decision = "shrink"
+                # size this request would have needed to meet target latency, at most halving batches
+                ratio = target / latency
+                chunk_size = min(
+                    chunk_size, max(int(operations * ratio), chunk_size // 2)
+                )
+                chunk_bytes = min(
+                    chunk_bytes, max(int(bytes_ * ratio), chunk_bytes // 2)
+                )
+                if took is not None and took / 1000.0 > target:
+                    concurrency_step = -1
+            elif latency < target * (1 - self.tolerance):
+                decision = "grow"
+                # smaller requests (retries, end of stream) don't make batches grow, at most doubling batches
+                ratio = target / latency if latency > 0 else 2.0
+                chunk_size = max(
+                    chunk_size, min(int(operations * ratio), chunk_size * 2)
+                )
+                chunk_bytes = max(
+                    chunk_bytes, min(int(bytes_ * ratio), chunk_bytes * 2)
+                )
+                if (
+                    chunk_size >= self.max_chunk_size
+                    or chunk_bytes >= self.max_chunk_bytes
+                ):
+                    concurrency_step = 1
+            else:
+                decision = "hold"
+                # batches size converged, probe for more throughput
+                concurrency_step = 1
+            concurrency = self.concurrency
+            if (concurrency_step < 0 and can_decrease) or (
+                concurrency_step > 0 and can_increase
+            ):
+                concurrency = min(
+                    max(concurrency + concurrency_step, 1), self.max_concurrency
+                )
+                self._last_change = now
+            self.concurrency = concurrency
+            self.chunk_size = min(
+                max(chunk_size, self.min_chunk_size), self.max_chunk_size
+            )
+            self.chunk_bytes = min(
+                max(chunk_bytes, self.min_chunk_bytes), self.max_chunk_bytes
+            )
+            # more requests may be allowed
+            self._condition.notify_all()
+
+            result = BulkDecision(
+                decision=decision,
+                operations=operations,
+                bytes=bytes_,
+                latency=latency,
+                took=took,
+                rejected=rejected,
+                chunk_size=self.chunk_size,
+                chunk_bytes=self.chunk_bytes,
+                concurrency=self.concurrency,
+            )
+            metrics = self.metrics
+            metrics.requests += 1
+            metrics.operations += operations
+            metrics.bytes += bytes_
+            metrics.rejected += rejected
+            metrics.latency += latency
+            metrics.decisions.append(result)
+        return result
+
+
+def _serialized_actions(
+    client: Elasticsearch, actions: Iterator[Union[Action, SerializedAction]]
+) -> Iterator[SizedAction]:
+    serializer = client.transport.serializer
+    for action in actions:
+        action_line, data = expand_action(action)
+        action_str: str = serializer.dumps(action_line)
+        size = len(action_str.encode("utf-8")) + 1
+        data_str: Optional[str] = None
+        if data is not None:
+            data_str = serializer.dumps(data)
+            size += len(data_str.encode("utf-8")) + 1
+        yield action_str, data_str, size
+
+
+def _perform_chunk(
+    client: Elasticsearch,
+    chunk: List[SizedAction],
+    controller: AdaptiveBulkController,
+    max_retries: int,
+    backoff: float,
+    max_backoff: float,
+    raise_on_error: bool,
+    **kwargs: Any
+) -> List[ActionResult]:
+    """
+    Send chunk in a bulk request, retrying operations rejected with a 429 status, and return results in chunk order.
+    A concurrency slot of controller must be acquired for first request, it is released once request is performed.
+    """
+    results: List[Optional[ActionResult]] = [None] * len(chunk)
+    # positions in chunk of operations to send
+    pending = list(range(len(chunk)))
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(min(max_backoff, backoff * 2 ** (attempt - 1)))
+            controller.acquire()
+        lines: List[str] = []
+        size = 0
+        for position in pending:
+            action_str, data_str, action_size = chunk[position]
+            lines.append(action_str)
+            if data_str is not None:
+                lines.append(data_str)
+            size += action_size
+        last_attempt = attempt == max_retries
+        start = time.perf_counter()
+        try:
+            response = client.bulk(body="\n".join(lines) + "\n", **kwargs)
+        except TransportError as e:
+            latency = time.perf_counter() - start
+            if e.status_code != 429:
+                raise
+            controller.observe(len(pending), size, latency, None, len(pending))
+            if last_attempt:
+                raise
+            continue
+        finally:
+            controller.release()
+        latency = time.perf_counter() - start
+
+        rejected: List[int] = []
+        # on last attempt, rejected operations are not retried but still reported to controller
+        throttled = 0
+        for position, item in zip(pending, response["items"]):
+            op_type, info = item.popitem()
+            status = info.get("status", 500)
+            if status == 429:
+                throttled += 1
+                if not last_attempt:
+                    rejected.append(position)
+                    continue
+            results[position] = (200 <= status < 300, {op_type: info})
+        controller.observe(len(pending), size, latency, response.get("took"), throttled)
+        if not rejected:
+            break
+        pending = rejected
+
+    if raise_on_error:
+        errors = [item for ok, item in results if not ok]  # type: ignore
+        if errors:
+            raise helpers.BulkIndexError(
+                "%i document(s) failed to index." % len(errors), errors
+            )
+    return results  # type: ignore
+
+
+def _adaptive_lane(
+    client: Elasticsearch,
+    actions: Iterator[SizedAction],
+    controller: AdaptiveBulkController,
+    **kwargs: Any
+) -> Iterator[ActionResult]:
+    while True:
+        # batch is built once a request can be sent, so that its size reflects latest decision
+        controller.acquire()
+        try:
+            chunk = controller.take(actions)
+        except BaseException:
+            controller.release()
+            raise
+        if not chunk:
+            controller.release()
+            return
+        for result in _perform_chunk(client, chunk, controller, **kwargs):
+            yield result
+
+
+def adaptive_bulk(
+    client: Elasticsearch,
+    actions: Iterator[Union[Action, SerializedAction]],
+    controller: AdaptiveBulkController,
+    max_retries: int = 0,
+    backoff: float = 2,
+    max_backoff: float = 600,
+    raise_on_error: bool = True,
+    **kwargs: Any
+) -> Iterator[ActionResult]:
+    """
+    Perform actions in bulk requests whose size and concurrency are driven by `controller`, and yield the result of
+    each action as ``(ok, item)`` tuples, as they arrive.
+
+    :param max_retries: number of times operations rejected with a 429 status are retried
+    :param backoff: seconds to wait before first retry, doubling on each following retry of the same batch
+    :param max_backoff: maximum number of seconds to wait between retries
+    :param raise_on_error: raise ``elasticsearch.helpers.BulkIndexError`` once a batch is performed if some of its
+    operations failed, otherwise failures are yielded as well
+
+    Other keyword arguments are passed to ``Elasticsearch.bulk`` (for instance `refresh` or `pipeline`).
+    """
+    serialized = shared(_serialized_actions(client, actions))
+    return merged(
+        [
+            _adaptive_lane(
+                client,
+                serialized,
+                controller,
+                max_retries=max_retries,
+                backoff=backoff,
+                max_backoff=max_backoff,
+                raise_on_error=raise_on_error,
+                **kwargs
+            )
+            for _ in range(controller.max_concurrency)
+        ],
+        workers=controller.max_concurrency,
+        buffer=controller.min_chunk_size,
+    )
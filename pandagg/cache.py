@@ -0,0 +1,384 @@
+"""
+Response caches, used by :class:`~pandagg.search.Search` to serve identical requests without network round-trip, and
+coalescing of identical concurrent requests.
+
+>>> from pandagg.cache import MemoryCache
+>>> cache = MemoryCache(max_size=1000, ttl=60)
+>>> s = Search(using=client, index="movies", cache=cache).filter("term", genres="Drama")
+>>> s.execute()  # hits elasticsearch
+>>> s.execute()  # served from cache
+>>> cache.stats
+CacheStats(hits=1, misses=1)
+"""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from typing_extensions import Literal
+
+from pandagg.tree._tree import copy_serialized
+
+__all__ = [
+    "CacheStats",
+    "ResponseCache",
+    "MemoryCache",
+    "SqliteCache",
+    "SingleFlight",
+    "fingerprint",
+]
+
+# "use": serve from cache if present, "bypass": ignore cache, "refresh": query elasticsearch and update cache
+CacheMode = Literal["use", "bypass", "refresh"]
+
+
+def fingerprint(
+    kind: str, index: Optional[List[str]], body: Any, client: Any = None
+) -> str:
+    """
+    Return a canonical key of a request: identical requests (regardless of keys order in body) sent to the same
+    cluster share the same key.
+
+    :param kind: request type ("search", "count" etc)
+    :param index: requested indices
+    :param body: request body
+    :param client: elasticsearch client performing the request, identified by the hosts it connects to (so that
+    keys are stable across client instances and processes), or by the instance itself if hosts are unknown
+    """
+    canonical = json.dumps(
+        [kind, index, body, _client_identity(client)],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _client_identity(client: Any) -> Any:
+    if client is None:
+        return None
+    hosts = getattr(getattr(client, "transport", None), "hosts", None)
+    if isinstance(hosts, list):
+        return hosts
+    return "%s:%s" % (type(client).__name__, id(client))
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        if not lookups:
+            return None
+        return self.hits / lookups
+
+
+class ResponseCache:
+    """
+    Base class of response caches. Subclasses implement `_get`, `_set`, `clear` and `__len__`, statistics are
+    maintained by `get`.
+
+    :param ttl: number of seconds after which an entry expires, None for no expiration
+    """
+
+    # whether `get` and `set` perform blocking I/O, run in an executor by asynchronous searches
+    blocking: bool = False
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        self.ttl: Optional[float] = ttl
+        self.stats: CacheStats = CacheStats()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return cached value (None if absent or expired), and record hit or miss in `stats`."""
+        value = self._get(key)
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._set(key, value)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = CacheStats()
+
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError()
+
+    def _set(self, key: str, value: Any) -> None:
+        raise NotImplementedError()
+
+    def clear(self) -> None:
+        raise NotImplementedError()
+
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+
+class MemoryCache(ResponseCache):
+    """
+    In-memory cache, evicting least recently used entries above `max_size` entries. Values are copied when stored
+    and when served, so that responses don't share them.
+
+    :param max_size: maximum number of entries
+    :param ttl: number of seconds after which an entry expires, None for no expiration
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None) -> None:
+        if max_size < 1:
+            raise ValueError("'max_size' must be a positive integer, got %s" % max_size)
+        super(MemoryCache, self).__init__(ttl=ttl)
+        self.max_size: int = max_size
+        # key -> (expiration time, value), ordered from least to most recently used
+        self._entries: OrderedDict[str, Tuple[Optional[float], Any]] = OrderedDict()
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy_serialized(value)
+
+    def _set(self, key: str, value: Any) -> None:
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        value = copy_serialized(value)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteCache(ResponseCache):
+    """
+    On-disk cache stored in a sqlite database, that can be shared across processes and persisted across restarts.
+    Values are stored serialized in json.
+
+    :param path: path of sqlite database file (":memory:" for a non-persistent database)
+    :param ttl: number of seconds after which an entry expires, None for no expiration
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: Optional[float] = None) -> None:
+        super(SqliteCache, self).__init__(ttl=ttl)
+        self.path: str = path
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+        )
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            expires_at, value = row
+            if expires_at is not None and expires_at <= time.time():
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+        return json.loads(value)
+
+    def _set(self, key: str, value: Any) -> None:
+        expires_at = None if self.ttl is None else time.time() + self.ttl
+        serialized = json.dumps(value)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, serialized),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return row[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class _LeaderCancelled(Exception):
+    """Raised to callers waiting for an in-flight call whose caller was cancelled."""
+
+
+class _Call:
+    """In-flight call, shared by all callers of the same key."""
+
+    def __init__(self) -> None:
+        self.done: threading.Event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls: while a call is in flight for a key, other callers of the same key wait for
+    its completion and get the same result (or error), instead of issuing their own call.
+
+    >>> group = SingleFlight()
+    >>> s = Search(using=client, index="movies", single_flight=group)
+
+    Searches (and multi searches) sharing the same group, client, indices and body then share one network call when
+    executed at the same time (each search wrapping the shared raw response in its own response).
+    """
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[str, asyncio.Future] = {}
+        # number of calls that were served by another in-flight call
+        self.coalesced: int = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Return `fn()` result, sharing it with concurrent callers of the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Asynchronous equivalent of `do`, for callers running in the same event loop. If the caller performing the
+        call is cancelled, one of the waiting callers performs it instead.
+        """
+        loop = asyncio.get_running_loop()
+        key = "%s:%s" % (id(loop), key)
+        while True:
+            with self._lock:
+                future = self._async_calls.get(key)
+                leader = future is None
+                if future is None:
+                    future = self._async_calls[key] = loop.create_future()
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+            try:
+                # shielded so that a cancelled waiter doesn't cancel the call for other waiters
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # mark exception as retrieved, even if there is no waiter
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._async_calls[key]
+
+
+def cached_call(
+    cache: Optional[ResponseCache],
+    key: str,
+    fetch: Callable[[], Any],
+    mode: CacheMode = "use",
+) -> Any:
+    """
+    Return `fetch()` result, served from/stored in `cache` according to `mode`.
+    """
+    if cache is None or mode == "bypass":
+        return fetch()
+    if mode == "use":
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    elif mode != "refresh":
+        raise ValueError(
+            "'cache_mode' must be one of 'use', 'bypass', 'refresh', got %s" % mode
+        )
+    value = fetch()
+    cache.set(key, value)
+    return value
+
+
+async def async_cached_call(
+    cache: Optional[ResponseCache],
+    key: str,
+    fetch: Callable[[], Awaitable[Any]],
+    mode: CacheMode = "use",
+) -> Any:
+    """
+    Asynchronous equivalent of `cached_call`, `fetch` returning an awaitable. Blocking caches are accessed in the
+    event loop default executor.
+    """
+    if cache is None or mode == "bypass":
+        return await fetch()
+    loop = asyncio.get_running_loop()
+    if mode == "use":
+        if cache.blocking:
+            cached = await loop.run_in_executor(None, cache.get, key)
+        else:
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+    elif mode != "refresh":
+        raise ValueError(
+            "'cache_mode' must be one of 'use', 'bypass', 'refresh', got %s" % mode
+        )
+    value = await fetch()
+    if cache.blocking:
+        await loop.run_in_executor(None, cache.set, key, value)
+    else:
+        cache.set(key, value)
+    return value
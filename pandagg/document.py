@@ -1,16 +1,26 @@
-from typing import Tuple, Dict, Any
+import keyword
+from typing import Tuple, Dict, Any, List, Callable
 
 from pandagg import Mappings
 from pandagg.node.mappings import Field, ComplexField
 
 
 class DocumentMeta(type):
-    def __new__(cls, name: str, bases: Tuple, attrs: Dict) -> "DocumentMeta":
+    def __new__(
+        cls, name: str, bases: Tuple, attrs: Dict, slots: bool = False
+    ) -> "DocumentMeta":
+        """
+        :param slots: if True, documents instances store their fields in `__slots__` instead of a `__dict__` (all
+        bases must be slotted as well, which is the case of `DocumentSource` and `InnerDocSource`)
+        """
         regular_attrs: Dict = {}
         field_attrs: Dict = {}
         for k, v in attrs.items():
             if isinstance(v, Field):
                 field_attrs[k] = v
+                if slots:
+                    # default values are set at instantiation
+                    continue
                 # field are instantiated with null value, instead of Field instance
                 if v._multiple:
                     regular_attrs[k] = []
@@ -22,22 +32,180 @@ class DocumentMeta(type):
 
         regular_attrs["_field_attrs_"] = field_attrs
         regular_attrs["_mappings_"] = Mappings(properties=field_attrs)
+        regular_attrs["_source_includes_"] = _source_includes(field_attrs)
 
-        def __init__(self: "DocumentSource", **kwargs: Any) -> None:
-            for k, v in kwargs.items():
-                if k not in field_attrs.keys():
-                    raise TypeError(
-                        "%r is an invalid keyword argument for %s" % (k, type(self))
-                    )
-                setattr(self, k, v)
-            self._post_init_()
+        if slots:
+            regular_attrs["__slots__"] = tuple(field_attrs)
+            regular_attrs["__init__"] = _compile_slots_init(field_attrs)
+        else:
 
-        regular_attrs["__init__"] = __init__
+            def __init__(self: "DocumentSource", **kwargs: Any) -> None:
+                for k, v in kwargs.items():
+                    if k not in field_attrs.keys():
+                        raise TypeError(
+                            "%r is an invalid keyword argument for %s" % (k, type(self))
+                        )
+                    setattr(self, k, v)
+                self._post_init_()
+
+            regular_attrs["__init__"] = __init__
+
+        # (de)serialization methods specialized for declared fields, unless explicitly overridden
+        if field_attrs:
+            if "_from_dict_" not in attrs:
+                regular_attrs["_from_dict_"] = classmethod(
+                    _compile_from_dict(field_attrs)
+                )
+            if "_to_dict_" not in attrs:
+                regular_attrs["_to_dict_"] = _compile_to_dict(field_attrs)
         return super(DocumentMeta, cls).__new__(cls, name, bases, regular_attrs)
 
 
+def _source_includes(field_attrs: Dict[str, Field]) -> List[str]:
+    """
+    Return paths of source fields read when deserializing a document: declared fields, inner documents fields being
+    listed individually.
+    """
+    includes: List[str] = []
+    for k, field in field_attrs.items():
+        document = getattr(field, "_document", None)
+        if isinstance(field, ComplexField) and document is not None:
+            includes.extend("%s.%s" % (k, path) for path in document._source_includes_)
+        else:
+            includes.append(k)
+    return includes
+
+
+def _attr(obj: str, k: str) -> str:
+    """Source code accessing `k` attribute of `obj`."""
+    if k.isidentifier() and not keyword.iskeyword(k):
+        return "%s.%s" % (obj, k)
+    return "getattr(%s, %r)" % (obj, k)
+
+
+def _set_attr(obj: str, k: str, value: str) -> str:
+    """Source code setting `k` attribute of `obj`."""
+    if k.isidentifier() and not keyword.iskeyword(k):
+        return "%s.%s = %s" % (obj, k, value)
+    return "setattr(%s, %r, %s)" % (obj, k, value)
+
+
+def _compile(source: str, name: str, namespace: Dict[str, Any]) -> Callable:
+    exec(compile(source, "<document %s>" % name, "exec"), namespace)
+    return namespace[name]
+
+
+def _compile_slots_init(field_attrs: Dict[str, Field]) -> Callable:
+    lines = ["def __init__(self, **kwargs):"]
+    for k, field in field_attrs.items():
+        lines.append("    " + _set_attr("self", k, "[]" if field._multiple else "None"))
+    lines += [
+        "    for k, v in kwargs.items():",
+        "        if k not in field_attrs:",
+        '            raise TypeError("%r is an invalid keyword argument for %s" % (k, type(self)))',
+        "        setattr(self, k, v)",
+        "    self._post_init_()",
+    ]
+    return _compile("\n".join(lines), "__init__", {"field_attrs": field_attrs})
+
+
+def _compile_from_dict(field_attrs: Dict[str, Field]) -> Callable:
+    """
+    Generate `_from_dict_` specialized for declared fields: equivalent to `DocumentSource._from_dict_`, without
+    iterating over fields, nor type checks of fields.
+    """
+    namespace: Dict[str, Any] = {}
+    lines = [
+        'def _from_dict_(cls, source, strict=True, path=""):',
+        "    doc = cls()",
+        "    get = source.get",
+    ]
+    for i, (k, field) in enumerate(field_attrs.items()):
+        child_path = "(path + %r if path else %r)" % ("." + k, k)
+        unexpected_list = (
+            'raise TypeError("Unexpected list for field %%s, got %%s" %% (%s, v))'
+            % child_path
+        )
+        expected_list = (
+            'raise TypeError("Expected list for field %%s, got %%s" %% (%s, v))'
+            % child_path
+        )
+        lines.append("    v = get(%r)" % k)
+        document = getattr(field, "_document", None)
+        if isinstance(field, ComplexField):
+            # absent inner document (or filtered out, if none of its declared fields are present)
+            lines += [
+                "    if v is None:",
+                "        " + _set_attr("doc", k, "[]" if field._multiple else "None"),
+            ]
+            if document is not None:
+                from_dict = "_from_dict_%d" % i
+                namespace[from_dict] = document._from_dict_
+                lines.append("    elif isinstance(v, list):")
+                if field._multiple is False:
+                    lines += ["        if strict:", " " * 12 + unexpected_list]
+                lines += [
+                    "        child_path = %s" % child_path,
+                    "        "
+                    + _set_attr(
+                        "doc",
+                        k,
+                        "[%s(a, strict=strict, path=child_path) for a in v if a is not None]"
+                        % from_dict,
+                    ),
+                    "    else:",
+                ]
+                if field._multiple:
+                    lines += ["        if strict:", " " * 12 + expected_list]
+                lines.append(
+                    "        "
+                    + _set_attr(
+                        "doc",
+                        k,
+                        "%s(v, strict=strict, path=%s)" % (from_dict, child_path),
+                    )
+                )
+                continue
+            lines.append("    else:")
+        else:
+            lines.append("    if True:")
+        # regular field, or object without declared document: raw value
+        lines.append("        if isinstance(v, list):")
+        if field._multiple is False:
+            lines += ["            if strict:", " " * 16 + unexpected_list]
+        lines.append("            v = [a for a in v if a is not None]")
+        if field._multiple:
+            lines += ["        elif strict:", " " * 12 + expected_list]
+        lines.append("        " + _set_attr("doc", k, "v"))
+    lines.append("    return doc")
+    return _compile("\n".join(lines), "_from_dict_", namespace)
+
+
+def _compile_to_dict(field_attrs: Dict[str, Field]) -> Callable:
+    """
+    Generate `_to_dict_` specialized for declared fields, equivalent to `DocumentSource._to_dict_`.
+    """
+    lines = ["def _to_dict_(self, with_empty_keys=False):", "    d = {}"]
+    for k in field_attrs:
+        lines += [
+            "    v = %s" % _attr("self", k),
+            "    if with_empty_keys or v not in (None, []):",
+            "        if isinstance(v, list):",
+            "            d[%r] = [va._to_dict_(with_empty_keys) if isinstance(va, DocumentSource) else va for va in v]"
+            % k,
+            "        elif isinstance(v, DocumentSource):",
+            "            d[%r] = v._to_dict_(with_empty_keys=with_empty_keys)" % k,
+            "        else:",
+            "            d[%r] = v" % k,
+        ]
+    lines.append("    return d")
+    return _compile("\n".join(lines), "_to_dict_", {"DocumentSource": DocumentSource})
+
+
 class DocumentSource(metaclass=DocumentMeta):
 
+    __slots__ = ()
+
     # __init__ is overidden by metaclass, this is only so that pycharm doesn't highlights fake errors when instantiating
     # documents
     def __init__(self, **kwargs: Any) -> None:
@@ -86,6 +254,10 @@ class DocumentSource(metaclass=DocumentMeta):
         for k, field in cls._field_attrs_.items():  # type: ignore
             v = source.get(k)
             child_path = k if not path else "%s.%s" % (path, k)
+            if v is None and isinstance(field, ComplexField):
+                # absent inner document (or filtered out, if none of its declared fields are present)
+                setattr(doc, k, [] if field._multiple else None)
+                continue
 
             if isinstance(v, list):
                 if field._multiple is False and strict:
@@ -121,4 +293,4 @@ class DocumentSource(metaclass=DocumentMeta):
 
 
 class InnerDocSource(DocumentSource):
-    pass
+    __slots__ = ()
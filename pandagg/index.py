@@ -11,8 +11,24 @@ from elasticsearch import Elasticsearch, helpers
 from pandagg import Mappings, Search
 from pandagg.document import DocumentSource, DocumentMeta
 from pandagg.tree.mappings import MappingsDictOrNode
-from pandagg.types import SettingsDict, IndexAliases, DocSource, Action, OpType
-from pandagg.utils import _cast_pre_save_source, get_action_modifier, is_subset
+from pandagg._parallel import merged, shared
+from pandagg.bulk import AdaptiveBulkController, adaptive_bulk
+from pandagg.types import (
+    SettingsDict,
+    IndexAliases,
+    DocSource,
+    Action,
+    ActionResult,
+    OpType,
+    SerializedAction,
+)
+from pandagg.utils import (
+    _cast_pre_save_source,
+    expand_action,
+    get_action_modifier,
+    is_subset,
+)
+from pandagg._ingest import DateFormat, arrow_actions, dataframe_actions
 
 
 class Template(TypedDict, total=False):
@@ -24,7 +40,7 @@ class Template(TypedDict, total=False):
 @dataclasses.dataclass
 class DocumentBulkWriter:
     _index: "DeclarativeIndex"
-    _operations: Iterator[Action] = dataclasses.field(
+    _operations: Iterator[Union[Action, SerializedAction]] = dataclasses.field(
         init=False, default_factory=lambda: iter([])
     )
 
@@ -32,7 +48,9 @@ class DocumentBulkWriter:
     def _client(self) -> Elasticsearch:
         return self._index._get_connection()
 
-    def _chain_actions(self, actions: Iterable[Action]) -> None:
+    def _chain_actions(
+        self, actions: Iterable[Union[Action, SerializedAction]]
+    ) -> None:
         self._operations = chain(self._operations, iter(actions))
 
     def has_pending_operation(self) -> bool:
@@ -135,12 +153,186 @@ class DocumentBulkWriter:
         )
         return self
 
-    def perform(self, **kwargs: Any) -> Tuple[int, Union[int, List[Any]]]:
-        # return success, failed
-        # perform stacked operations
-        res = helpers.bulk(client=self._client, actions=self._operations, **kwargs)
+    def from_dataframe(
+        self,
+        df: Any,
+        id_column: Optional[str] = None,
+        op_type: OpType = "index",
+        date_format: DateFormat = "iso",
+        batch_size: int = 10000,
+    ) -> "DocumentBulkWriter":
+        """
+        Stack one operation per row of pandas dataframe. Rows are serialized by batches, column by column, according
+        to index mappings: missing values (None, NaN, NaT) are omitted, dotted columns ("location.lat") form objects,
+        list columns form arrays, and integer fields holding floats (because of missing values) are written as
+        integers.
+
+        >>> index.docs.from_dataframe(df, id_column="restaurant_id").perform(parallel=4)
+
+        :param id_column: column holding documents ids (not part of documents source, no missing values allowed),
+        required for "update" and "delete" operations
+        :param op_type: operation applied to every row, "update" operations use rows as partial documents
+        :param date_format: datetime columns written as "iso" 8601 strings, or "epoch" milliseconds
+        :param batch_size: number of rows serialized at once
+        """
+        self._chain_actions(
+            dataframe_actions(
+                df,
+                index_name=self._index.name,
+                mappings=self._index._mappings,
+                id_column=id_column,
+                op_type=op_type,
+                date_format=date_format,
+                batch_size=batch_size,
+            )
+        )
+        return self
+
+    def from_arrow(
+        self,
+        table: Any,
+        id_column: Optional[str] = None,
+        op_type: OpType = "index",
+        date_format: DateFormat = "iso",
+        batch_size: int = 10000,
+    ) -> "DocumentBulkWriter":
+        """
+        Stack one operation per row of pyarrow table (or record batch), struct columns forming objects. See
+        :func:`~pandagg.index.DocumentBulkWriter.from_dataframe` for parameters.
+        """
+        self._chain_actions(
+            arrow_actions(
+                table,
+                index_name=self._index.name,
+                mappings=self._index._mappings,
+                id_column=id_column,
+                op_type=op_type,
+                date_format=date_format,
+                batch_size=batch_size,
+            )
+        )
+        return self
+
+    def perform(
+        self,
+        parallel: int = 1,
+        chunk_size: int = 500,
+        chunk_bytes: int = 100 * 1024 * 1024,
+        max_retries: int = 0,
+        backoff: float = 2,
+        adaptive: Optional[AdaptiveBulkController] = None,
+        stats_only: bool = False,
+        **kwargs: Any
+    ) -> Tuple[int, Union[int, List[Any]]]:
+        """
+        Perform stacked operations, and return number of successful operations, and errors (or their number if
+        `stats_only`), like ``elasticsearch.helpers.bulk``.
+
+        See :func:`~pandagg.index.DocumentBulkWriter.streaming_perform` for parameters, other keyword arguments are
+        passed to ``elasticsearch.helpers.streaming_bulk``.
+        """
+        success, failed = 0, 0
+        errors: List[Any] = []
+        for ok, item in self.streaming_perform(
+            parallel=parallel,
+            chunk_size=chunk_size,
+            chunk_bytes=chunk_bytes,
+            max_retries=max_retries,
+            backoff=backoff,
+            adaptive=adaptive,
+            **kwargs
+        ):
+            if ok:
+                success += 1
+                continue
+            failed += 1
+            if not stats_only:
+                errors.append(item)
+        return success, failed if stats_only else errors
+
+    def streaming_perform(
+        self,
+        parallel: int = 1,
+        chunk_size: int = 500,
+        chunk_bytes: int = 100 * 1024 * 1024,
+        max_retries: int = 0,
+        backoff: float = 2,
+        adaptive: Optional[AdaptiveBulkController] = None,
+        **kwargs: Any
+    ) -> Iterator[ActionResult]:
+        """
+        Perform stacked operations, and return an iterator over the result of each operation, as ``(ok, item)``
+        tuples where `item` is the bulk response item of the operation. Operations are consumed (removed from
+        stacked operations) by this call, and sent lazily as results are consumed.
+
+        >>> for ok, item in index.docs.bulk(actions).streaming_perform(parallel=8, max_retries=5):
+        >>>     if not ok:
+        >>>         print(item)
+
+        :param parallel: number of bulk requests sent at the same time, each one by a distinct thread pulling next
+        operations from the same stream; results are then yielded as they arrive, regardless of operations order
+        :param chunk_size: maximum number of operations per bulk request
+        :param chunk_bytes: maximum size in bytes of a bulk request
+        :param max_retries: number of times operations rejected with a 429 (too many requests) status are retried
+        :param backoff: seconds to wait before first retry, doubling on each following retry of the same chunk
+        (capped to `max_backoff` keyword argument, 600 seconds by default)
+        :param adaptive: controller adjusting requests size and concurrency after each request, see
+        :class:`~pandagg.bulk.AdaptiveBulkController`; if provided, `parallel`, `chunk_size` and `chunk_bytes` must
+        be left to their defaults (they are driven by the controller), and other keyword arguments are passed to
+        ``Elasticsearch.bulk`` (except `max_backoff` and `raise_on_error`), ``elasticsearch.helpers.streaming_bulk``
+        specific ones being rejected
+
+        Other keyword arguments are passed to ``elasticsearch.helpers.streaming_bulk``, by default an operation error
+        raises ``elasticsearch.helpers.BulkIndexError`` once its chunk is performed, `raise_on_error=False` yields it
+        instead.
+        """
+        if parallel < 1:
+            raise ValueError("'parallel' must be a positive integer, got %s" % parallel)
+        if adaptive is not None:
+            if (parallel, chunk_size, chunk_bytes) != (1, 500, 100 * 1024 * 1024):
+                raise ValueError(
+                    "'parallel', 'chunk_size' and 'chunk_bytes' are driven by 'adaptive' controller, got %s, %s, %s"
+                    % (parallel, chunk_size, chunk_bytes)
+                )
+            unsupported = sorted(set(kwargs).intersection(_STREAMING_BULK_ONLY_KWARGS))
+            if unsupported:
+                raise ValueError(
+                    "Unsupported parameters with 'adaptive' controller: %s"
+                    % ", ".join(unsupported)
+                )
+        client = self._client
+        operations = self._operations
         self._operations = iter([])
-        return res
+        if adaptive is not None:
+            return adaptive_bulk(
+                client,
+                operations,
+                adaptive,
+                max_retries=max_retries,
+                backoff=backoff,
+                **kwargs
+            )
+        bulk_kwargs: Dict[str, Any] = {
+            "chunk_size": chunk_size,
+            "max_chunk_bytes": chunk_bytes,
+            "max_retries": max_retries,
+            "initial_backoff": backoff,
+            "yield_ok": True,
+            "expand_action_callback": expand_action,
+            **kwargs,
+        }
+        if parallel == 1:
+            return helpers.streaming_bulk(client, operations, **bulk_kwargs)
+        # each lane chunks and sends operations it pulls from the shared stream, and retries its own rejections
+        actions = shared(operations)
+        return merged(
+            [
+                helpers.streaming_bulk(client, actions, **bulk_kwargs)
+                for _ in range(parallel)
+            ],
+            workers=parallel,
+            buffer=chunk_size,
+        )
 
     def rollback(self) -> None:
         # remove all stacked operations
@@ -149,6 +341,24 @@ class DocumentBulkWriter:
     def validate(self, document: DocumentSource) -> None:
         self._index._mappings.validate_document(document)
 
+    def validate_many(self, documents: Iterable[DocumentSource]) -> Dict[int, str]:
+        """
+        Validate documents against index mappings, and return error messages of invalid documents by their position
+        (empty dict if all documents are valid).
+        """
+        return self._index._mappings.validate_many(documents)
+
+
+# ``elasticsearch.helpers.streaming_bulk`` parameters without equivalent in adaptive bulk
+_STREAMING_BULK_ONLY_KWARGS = (
+    "max_chunk_bytes",
+    "expand_action_callback",
+    "raise_on_exception",
+    "initial_backoff",
+    "yield_ok",
+    "ignore_status",
+)
+
 
 def _deepcopy_mutable_attrs(attrs: Dict[str, Any], attrs_names: List[str]) -> None:
     for attr_name in attrs_names:
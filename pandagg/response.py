@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-import copy
 import dataclasses
+import re
 from typing_extensions import Literal, TypedDict
 from typing import (
     Iterator,
@@ -13,14 +13,29 @@ from typing import (
     Union,
     overload,
     Any,
+    Callable,
+    Iterable,
+    TypeVar,
 )
 
 from elasticsearch import Elasticsearch
-from lighttree.node import NodeId
 
+from pandagg._arrow import (
+    import_pyarrow,
+    hits_record_batch,
+    key_array,
+    columns_table,
+)
 from pandagg.query import Query
 from pandagg.aggs import Aggs, Composite
-from pandagg.node.aggs.abstract import UniqueBucketAgg, MetricAgg, Root, AggClause
+from pandagg.node.aggs.abstract import (
+    UniqueBucketAgg,
+    MultipleBucketAgg,
+    MetricAgg,
+    Pipeline,
+    Root,
+    AggClause,
+)
 from pandagg.node.aggs.bucket import Nested, ReverseNested
 from pandagg.types import (
     HitDict,
@@ -34,12 +49,13 @@ from pandagg.types import (
     ProfileDict,
     BucketDict,
     BucketKey,
-    CompositeBucketKey,
     BucketKeyAtom,
 )
 
 if TYPE_CHECKING:
     import pandas as pd
+    import pyarrow as pa
+    from pandagg.tree.mappings import Mappings
     from pandagg.search import Search
     from pandagg import DocumentMeta
     from pandagg.document import DocumentSource
@@ -52,6 +68,8 @@ RowValues = Dict[str, Any]
 # dictionary containing both grouping keys and values
 Row = Dict[str, Any]
 
+P = TypeVar("P")
+
 
 class NormalizedBucketDict(TypedDict, total=False):
     level: AggName
@@ -65,12 +83,18 @@ class NormalizedBucketDict(TypedDict, total=False):
 class Hit:
     data: HitDict
     _document_class: Optional[DocumentMeta]
+    # deserialized document, memoized so that it is built once per hit
+    _document: Optional[DocumentSource] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def _source(self) -> Optional[Union[DocSource, DocumentSource]]:
         source = self.data.get("_source")
         if self._document_class is not None:
-            return self._document_class._from_dict_(source)  # type: ignore
+            if self._document is None:
+                self._document = self._document_class._from_dict_(source)  # type: ignore
+            return self._document
         return source
 
     @property
@@ -85,6 +109,10 @@ class Hit:
     def _index(self) -> Optional[str]:
         return self.data.get("_index")
 
+    @property
+    def _sort(self) -> Optional[List[Any]]:
+        return self.data.get("sort")
+
     def __repr__(self) -> str:
         if self._score is None:
             return "<Hit %s>" % self._id
@@ -95,6 +123,10 @@ class Hit:
 class Hits:
     data: Optional[HitsDict]
     _document_class: Optional[DocumentMeta]
+    _mappings: Optional[Mappings] = None
+    _hits: Optional[List[Hit]] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def total(self) -> Optional[TotalDict]:
@@ -102,14 +134,16 @@ class Hits:
 
     @property
     def hits(self) -> List[Hit]:
-        return (
-            [
-                Hit(hit, _document_class=self._document_class)
-                for hit in self.data.get("hits", [])
-            ]
-            if self.data
-            else []
-        )
+        if self._hits is None:
+            self._hits = (
+                [
+                    Hit(hit, _document_class=self._document_class)
+                    for hit in self.data.get("hits", [])
+                ]
+                if self.data
+                else []
+            )
+        return self._hits
 
     @property
     def max_score(self) -> Optional[float]:
@@ -124,6 +158,11 @@ class Hits:
     def _total_repr(self) -> str:
         if self.total is None:
             return 'Unknown total (probably filtered by "filter_path")'
+        if isinstance(self.total, int):
+            # "rest_total_hits_as_int" parameter
+            return str(self.total)
+        if "relation" not in self.total:
+            return str(self.total.get("value"))
         if self.total.get("relation") == "eq":
             return str(self.total["value"])
         if self.total.get("relation") == "gte":
@@ -165,6 +204,29 @@ class Hits:
             flattened_hits.append(hit_source)
         return pd.DataFrame(flattened_hits).set_index("_id")
 
+    def to_arrow(
+        self, source_only: bool = True, schema: Optional[pa.Schema] = None
+    ) -> pa.Table:
+        """
+        Return hits as arrow table, with an `_id` column and a column per `_source` field.
+        Requires pyarrow dependency.
+
+        Column types are derived from search mappings if provided (see
+        :func:`~pandagg.tree.mappings.Mappings.to_arrow_schema`, fields absent from mappings are ignored), or else
+        inferred from values. Dates are parsed according to their mappings `format`, and fields holding arrays are
+        converted to lists even if they are not declared as `multiple`.
+
+        :param source_only: if False, `_index` and `_score` columns are included
+        :param schema: schema of `_source` fields, overriding the one derived from mappings
+        """
+        pa = import_pyarrow()
+        if schema is None and self._mappings is not None:
+            schema = self._mappings.to_arrow_schema()
+        hits: List[HitDict] = self.data.get("hits", []) if self.data else []
+        return pa.Table.from_batches(
+            [hits_record_batch(hits, schema=schema, source_only=source_only)]
+        )
+
     def __repr__(self) -> str:
         if not isinstance(self.total, dict):
             total_repr = str(self.total)
@@ -182,6 +244,9 @@ class SearchResponse:
 
     data: SearchResponseDict
     _search: Search
+    _hits: Optional[Hits] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def took(self) -> Optional[int]:
@@ -197,9 +262,13 @@ class SearchResponse:
 
     @property
     def hits(self) -> Hits:
-        return Hits(
-            data=self.data.get("hits"), _document_class=self._search._document_class
-        )
+        if self._hits is None:
+            self._hits = Hits(
+                data=self.data.get("hits"),
+                _document_class=self._search._document_class,
+                _mappings=self._search._mappings,
+            )
+        return self._hits
 
     @property
     def aggregations(self) -> Aggregations:
@@ -209,6 +278,15 @@ class SearchResponse:
     def profile(self) -> Optional[ProfileDict]:
         return self.data.get("profile")
 
+    @property
+    def error(self) -> Optional[Dict[str, Any]]:
+        """Error of a failed search, in a multi search response."""
+        return self.data.get("error")  # type: ignore
+
+    @property
+    def status(self) -> Optional[int]:
+        return self.data.get("status")  # type: ignore
+
     def __iter__(self) -> Iterator[Hit]:
         return iter(self.hits)
 
@@ -235,6 +313,424 @@ class SearchResponse:
         )
 
 
+def _parsing_plan(
+    search: Search, options: Tuple[Any, ...], compile_: Callable[[], P]
+) -> P:
+    """
+    Return parsing plan compiled for search aggregations and provided options, compiling it on first use. Plans are
+    stored on the search, so that they are reused for all its responses (or pages), as long as aggregations
+    structure is unchanged.
+    """
+    structure: Tuple[str, ...] = tuple(search._aggs._nodes_map)
+    if search._parsing_plans[0] != structure:
+        search._parsing_plans = (structure, {})
+    plans = search._parsing_plans[1]
+    plan = plans.get(options)
+    if plan is None:
+        plan = plans[options] = compile_()
+    return plan
+
+
+def _value_attr(agg_node: AggClause) -> Optional[str]:
+    """
+    Return attribute holding bucket value of an aggregation clause, if its value is extracted the standard way.
+    """
+    if (
+        type(agg_node).extract_bucket_value.__func__  # type: ignore
+        is AggClause.extract_bucket_value.__func__  # type: ignore
+    ):
+        return agg_node.VALUE_ATTRS[0]
+    return None
+
+
+def _bucket_value_getter(agg_node: AggClause) -> Callable[[Any], Any]:
+    """Return function extracting bucket value of an aggregation clause."""
+    value_attr = _value_attr(agg_node)
+    if value_attr is not None:
+        return lambda bucket: bucket.get(value_attr)
+    return agg_node.extract_bucket_value
+
+
+def _buckets_getter(
+    agg_node: AggClause,
+) -> Callable[[Any], Iterable[Tuple[BucketKey, BucketDict]]]:
+    """Return function extracting (key, bucket) tuples of an aggregation clause response."""
+    # note: buckets can be absent from responses filtered by "filter_path", if there are none
+    if isinstance(agg_node, Composite):
+        return lambda r: [(bucket["key"], bucket) for bucket in r.get("buckets", ())]
+    if _extracts_default_buckets(agg_node):
+        if agg_node.keyed_:  # type: ignore
+            return lambda r: r.get("buckets", {}).items()
+        key_path = agg_node.key_path  # type: ignore
+        return lambda r: [(bucket[key_path], bucket) for bucket in r.get("buckets", ())]
+    return agg_node.extract_buckets
+
+
+def _extracts_default_buckets(agg_node: AggClause) -> bool:
+    """Return whether buckets of a multiple buckets aggregation clause are extracted the standard way."""
+    return (
+        isinstance(agg_node, MultipleBucketAgg)
+        and type(agg_node).extract_buckets is MultipleBucketAgg.extract_buckets
+        and type(agg_node)._extract_bucket_key is MultipleBucketAgg._extract_bucket_key
+    )
+
+
+# fields of search response read by SearchResponse and Hits
+_RESPONSE_FILTER_PATHS: Tuple[str, ...] = (
+    "took",
+    "timed_out",
+    "terminated_early",
+    "_shards.total",
+    "_shards.successful",
+    "_shards.failures",
+    "_scroll_id",
+    "pit_id",
+    "hits.total",
+    "suggest",
+    "profile",
+)
+# fields of each hit read by Hit (excluding "_type" etc, and versioning fields unless requested, see below)
+_HIT_FILTER_PATHS: Tuple[str, ...] = (
+    "_id",
+    "_index",
+    "_score",
+    "_source",
+    "sort",
+    "highlight",
+    "fields",
+    "inner_hits",
+    "matched_queries",
+    "_explanation",
+)
+# hits versioning fields, returned if requested by search body (or query string) parameter
+_HIT_VERSION_FILTER_PATHS: Dict[str, Tuple[str, ...]] = {
+    "version": ("_version",),
+    "seq_no_primary_term": ("_seq_no", "_primary_term"),
+}
+# characters that cannot be part of a filter path field name
+_FILTER_PATH_SPECIAL_CHARS = re.compile(r"[.,*]")
+
+
+def _aggs_filter_paths(aggs: Aggs) -> List[str]:
+    """
+    Return filter paths of the aggregations response fields read when parsing it: bucket keys, buckets values, and
+    composite after keys. Metric and pipeline clauses responses are kept whole.
+    """
+    paths: List[str] = []
+
+    def add_children(nid: str, prefix: str) -> bool:
+        name: AggName
+        for name, agg_node in aggs.children(nid):  # type: ignore
+            if _FILTER_PATH_SPECIAL_CHARS.search(name):
+                return False
+            path = "%s.%s" % (prefix, name)
+            value_attr = _value_attr(agg_node)
+            if isinstance(agg_node, Composite):
+                buckets_path = "%s.buckets" % path
+                paths.append("%s.after_key" % path)
+                paths.append("%s.key" % buckets_path)
+            elif _extracts_default_buckets(agg_node) and value_attr is not None:
+                buckets_path = "%s.buckets%s" % (path, ".*" if agg_node.keyed_ else "")  # type: ignore
+                if not agg_node.keyed_:  # type: ignore
+                    paths.append("%s.%s" % (buckets_path, agg_node.key_path))  # type: ignore
+            elif (
+                isinstance(agg_node, UniqueBucketAgg)
+                and not isinstance(agg_node, Pipeline)
+                and value_attr is not None
+            ):
+                buckets_path = path
+            else:
+                # metrics, pipelines and clauses parsed in a custom way
+                paths.append(path)
+                continue
+            paths.append("%s.%s" % (buckets_path, value_attr))
+            if not add_children(agg_node.identifier, buckets_path):
+                return False
+        return True
+
+    if not add_children(aggs.root, "aggregations"):  # type: ignore
+        return ["aggregations"]
+    return paths
+
+
+def _response_filter_path(search: Search, body: Dict[str, Any]) -> str:
+    """
+    Return minimal "filter_path" of the search request whose body is provided: response fields that are read by
+    :class:`~pandagg.response.SearchResponse` (hits, and aggregations parsing as tabular, dataframe or normalized),
+    restricted to the search output if specified, when response holds both hits and aggregations.
+    """
+    with_hits = body.get("size") != 0
+    with_aggs = "aggs" in body
+    output = search._filter_path_output
+    if with_hits and with_aggs and output is not None:
+        with_hits, with_aggs = output == "hits", output != "hits"
+    paths: List[str] = list(_RESPONSE_FILTER_PATHS)
+    if with_hits:
+        paths.append("hits.max_score")
+        paths.extend("hits.hits.%s" % field for field in _HIT_FILTER_PATHS)
+        for param, fields in _HIT_VERSION_FILTER_PATHS.items():
+            if body.get(param):
+                paths.extend("hits.hits.%s" % field for field in fields)
+    if with_aggs:
+        paths.extend(
+            _parsing_plan(
+                search, ("filter_path",), lambda: _aggs_filter_paths(search._aggs)
+            )
+        )
+    return ",".join(paths)
+
+
+class _GroupByPlan:
+    """
+    Parsing of succession of grouping aggregation clauses, from root aggregation until grouping clause.
+    """
+
+    # grouping keys provided by a level: none, bucket key, or composite bucket key sources
+    _NO_KEY = 0
+    _KEY = 1
+    _COMPOSITE_KEY = 2
+
+    def __init__(
+        self, aggs: Aggs, until: AggName, with_single_bucket_groups: bool
+    ) -> None:
+        self.index_names: List[AggName] = []
+        # (aggregation type, aggregated field) generating each index level keys
+        self.index_sources: List[Tuple[str, Optional[str]]] = []
+        self._levels: List[Tuple[AggName, Callable, int, List[AggName]]] = []
+        # remove root (not an aggregation clause), ignore type warning about key None (since only root
+        # can have a None key)
+        name: AggName
+        for name, agg_node in aggs.ancestors(  # type: ignore
+            aggs.id_from_key(until), include_current=True, from_root=True
+        )[1:]:
+            source_names: List[AggName] = []
+            if isinstance(agg_node, UniqueBucketAgg) and not with_single_bucket_groups:
+                key_mode = self._NO_KEY
+            elif isinstance(agg_node, Composite):
+                # a composite aggregation can generate multiple grouping columns
+                key_mode = self._COMPOSITE_KEY
+                source_names = agg_node.source_names
+                for source in agg_node.sources:
+                    for source_agg in source.values():
+                        for source_type, source_body in source_agg.items():
+                            self.index_sources.append(
+                                (source_type, source_body.get("field"))
+                            )
+            else:
+                key_mode = self._KEY
+                source_names = [name]
+                self.index_sources.append(
+                    (agg_node.KEY, getattr(agg_node, "field", None))
+                )
+            self.index_names.extend(source_names)
+            self._levels.append(
+                (name, _buckets_getter(agg_node), key_mode, source_names)
+            )
+
+    def rows(
+        self, response: AggregationsResponseDict
+    ) -> List[Tuple[GroupingKeysTuple, BucketDict]]:
+        """
+        Return (grouping keys, bucket) tuples of each bucket generated by grouping clause.
+        """
+        rows: List[Tuple[GroupingKeysTuple, Any]] = [((), response)]
+        for name, buckets, key_mode, source_names in self._levels:
+            level_rows: List[Tuple[GroupingKeysTuple, Any]] = []
+            append = level_rows.append
+            for keys, raw in rows:
+                if name not in raw:
+                    continue
+                if key_mode == self._NO_KEY:
+                    for _, bucket in buckets(raw[name]):
+                        append((keys, bucket))
+                elif key_mode == self._KEY:
+                    for key, bucket in buckets(raw[name]):
+                        append((keys + (key,), bucket))
+                else:
+                    for key, bucket in buckets(raw[name]):
+                        append((keys + tuple(key[n] for n in source_names), bucket))
+            rows = level_rows
+        return rows
+
+    def columns(
+        self, response: AggregationsResponseDict
+    ) -> Tuple[List[List[BucketKeyAtom]], List[BucketDict]]:
+        """
+        Columnar equivalent of `rows`: return one list of keys per index name, and buckets generated by grouping
+        clause, all aligned.
+        """
+        raws: List[Any] = [response]
+        index: List[List[BucketKeyAtom]] = []
+        for name, buckets, key_mode, source_names in self._levels:
+            level_raws: List[Any] = []
+            # position of parent bucket in previous level, for each bucket of this level
+            parents: List[int] = []
+            keys: List[List[BucketKeyAtom]] = [[] for _ in source_names]
+            for i, raw in enumerate(raws):
+                if name not in raw:
+                    continue
+                for key, bucket in buckets(raw[name]):
+                    level_raws.append(bucket)
+                    parents.append(i)
+                    if key_mode == self._KEY:
+                        keys[0].append(key)
+                    elif key_mode == self._COMPOSITE_KEY:
+                        for source_keys, source_name in zip(keys, source_names):
+                            source_keys.append(key[source_name])
+            index = [[column[i] for i in parents] for column in index] + keys
+            raws = level_raws
+        return index, raws
+
+
+class _NormalizePlan:
+    """
+    Parsing of an aggregation clause response (and of its children ones) as normalized entities.
+    """
+
+    def __init__(self, aggs: Aggs, nid: str) -> None:
+        name: AggName
+        name, agg_node = aggs.get(nid)  # type: ignore
+        self.name: AggName = name
+        self._buckets = _buckets_getter(agg_node)
+        self._value = _bucket_value_getter(agg_node)
+        self._children: List[_NormalizePlan] = [
+            _NormalizePlan(aggs, child_id) for child_id in aggs.children_ids(nid)
+        ]
+
+    def normalize(
+        self, agg_response: AggregationsResponseDict
+    ) -> Iterator[NormalizedBucketDict]:
+        name = self.name
+        if name not in agg_response:
+            return
+        for key, raw_bucket in self._buckets(agg_response[name]):
+            result: NormalizedBucketDict = {
+                "level": name,
+                "key": key,
+                "value": self._value(raw_bucket),
+            }
+            normalized_children: List[NormalizedBucketDict] = [
+                normalized_child
+                for child in self._children
+                for normalized_child in child.normalize(raw_bucket)
+            ]
+            if normalized_children:
+                result["children"] = normalized_children
+            yield result
+
+
+class _ColumnsPlan:
+    """
+    Extraction of columns values of a grouping bucket: grouping clause value, and one or multiple columns per child.
+    """
+
+    # child columns: single value (stored in a known attribute or not), one column per bucket, normalized buckets,
+    # or raw response
+    _VALUE_ATTR = 0
+    _VALUE = 1
+    _EXPAND = 2
+    _NORMALIZE = 3
+    _RAW = 4
+
+    def __init__(
+        self,
+        aggs: Aggs,
+        total_agg: AggClause,
+        normalize: bool,
+        expand_columns: bool,
+        expand_sep: str,
+    ) -> None:
+        self._total: Optional[Tuple[str, Callable]] = None
+        if not isinstance(total_agg, Root):
+            self._total = (total_agg.VALUE_ATTRS[0], _bucket_value_getter(total_agg))
+        self._expand_sep: str = expand_sep
+        self._children: List[Tuple[AggName, int, Any]] = []
+        child_key: AggName
+        for child_key, child in aggs.children(total_agg.identifier):  # type: ignore
+            if isinstance(child, (UniqueBucketAgg, MetricAgg)):
+                value_attr = _value_attr(child)
+                if value_attr is not None:
+                    self._children.append((child_key, self._VALUE_ATTR, value_attr))
+                else:
+                    self._children.append(
+                        (child_key, self._VALUE, child.extract_bucket_value)
+                    )
+            elif expand_columns:
+                self._children.append(
+                    (
+                        child_key,
+                        self._EXPAND,
+                        (_buckets_getter(child), _bucket_value_getter(child)),
+                    )
+                )
+            elif normalize:
+                self._children.append(
+                    (
+                        child_key,
+                        self._NORMALIZE,
+                        _NormalizePlan(aggs, child.identifier),
+                    )
+                )
+            else:
+                self._children.append((child_key, self._RAW, None))
+
+    def columns(self, raw_buckets: List[BucketDict]) -> Dict[str, List[Any]]:
+        """
+        Columnar equivalent of `serialize`: return a list of values per column, aligned with provided buckets.
+        Expanded columns that are absent from some buckets are filled with None.
+        """
+        columns: Dict[str, List[Any]] = {}
+        if self._total is not None:
+            total_attr, total_value = self._total
+            columns[total_attr] = [total_value(b) for b in raw_buckets]
+        for child_key, mode, extractor in self._children:
+            if mode == self._VALUE_ATTR:
+                columns[child_key] = [b[child_key].get(extractor) for b in raw_buckets]  # type: ignore
+            elif mode == self._VALUE:
+                columns[child_key] = [extractor(b[child_key]) for b in raw_buckets]
+            elif mode == self._EXPAND:
+                buckets, value = extractor
+                for i, raw_bucket in enumerate(raw_buckets):
+                    # absent if filtered by "filter_path" (no buckets)
+                    if child_key not in raw_bucket:
+                        continue
+                    for key, bucket in buckets(raw_bucket[child_key]):
+                        column_name = "%s%s%s" % (child_key, self._expand_sep, key)
+                        column = columns.get(column_name)
+                        if column is None:
+                            column = columns[column_name] = [None] * len(raw_buckets)
+                        column[i] = value(bucket)
+            elif mode == self._NORMALIZE:
+                columns[child_key] = [
+                    next(extractor.normalize(b), None) for b in raw_buckets
+                ]
+            else:
+                columns[child_key] = [b.get(child_key) for b in raw_buckets]
+        return columns
+
+    def serialize(self, row_raw_data: BucketDict) -> RowValues:
+        result: RowValues = {}
+        if self._total is not None:
+            total_attr, total_value = self._total
+            result[total_attr] = total_value(row_raw_data)
+        for child_key, mode, extractor in self._children:
+            if mode == self._VALUE_ATTR:
+                result[child_key] = row_raw_data[child_key].get(extractor)  # type: ignore
+            elif mode == self._VALUE:
+                result[child_key] = extractor(row_raw_data[child_key])
+            elif mode == self._EXPAND:
+                buckets, value = extractor
+                for key, bucket in buckets(row_raw_data.get(child_key, {})):
+                    result["%s%s%s" % (child_key, self._expand_sep, key)] = value(
+                        bucket
+                    )
+            elif mode == self._NORMALIZE:
+                result[child_key] = next(extractor.normalize(row_raw_data), None)
+            else:
+                result[child_key] = row_raw_data.get(child_key)
+        return result
+
+
 @dataclasses.dataclass
 class Aggregations:
     data: AggregationsResponseDict
@@ -304,108 +800,31 @@ class Aggregations:
             r__: GroupingKeysDict = {}
             return index_names_, [(r__, response)]
 
-        # initialization: cache ancestors once for faster computation
-        until_id: NodeId = self._aggs.id_from_key(until)
-        # remove root (not an aggregation clause), ignore type warning about key None (since only root
-        # can have a None key)
-        ancestors: List[Tuple[AggName, AggClause]] = [
-            (k, n)  # type: ignore
-            for k, n in self._aggs.ancestors(
-                until_id, include_current=True, from_root=True
-            )[1:]
+        plan = self._group_by_plan(
+            until=until, with_single_bucket_groups=with_single_bucket_groups
+        )
+        index_names: List[AggName] = plan.index_names[:]
+        rows: List[Tuple[GroupingKeysTuple, BucketDict]] = plan.rows(response)
+        if row_as_tuple:
+            return index_names, rows
+        values: List[Tuple[GroupingKeysDict, BucketDict]] = [
+            (dict(zip(index_names, grouping_keys)), raw_bucket)
+            for grouping_keys, raw_bucket in rows
         ]
-
-        if not ancestors:
-            index_names__: List[AggName] = []
-            if row_as_tuple:
-                r___: List[Tuple[GroupingKeysTuple, BucketDict]] = [(tuple(), response)]
-                return index_names__, r___
-            r____: GroupingKeysDict = {}
-            return index_names__, [(r____, response)]
-
-        # from root aggregation to deepest aggregation clause
-        index_names: List[AggName] = []
-
-        for name, a in ancestors:
-            if isinstance(a, UniqueBucketAgg) and not with_single_bucket_groups:
-                continue
-            if isinstance(a, Composite):
-                # a composite aggregation can generate multiple grouping columns
-                index_names.extend(a.source_names)
-            else:
-                index_names.append(name)
-
-        first_agg_name: AggName
-        first_agg_name, _ = ancestors[0]
-
-        index_values: List[Tuple[GroupingKeysDict, BucketDict]] = list(
-            self._parse_group_by(
-                response=response,
+        return index_names, values
+
+    def _group_by_plan(
+        self, until: AggName, with_single_bucket_groups: bool
+    ) -> _GroupByPlan:
+        return _parsing_plan(
+            self._search,
+            ("group_by", until, with_single_bucket_groups),
+            lambda: _GroupByPlan(
+                self._aggs,
                 until=until,
-                agg_clauses_per_name={k: a for k, a in ancestors},
-                agg_name=first_agg_name,
-                row={},
                 with_single_bucket_groups=with_single_bucket_groups,
-            )
+            ),
         )
-        if not row_as_tuple:
-            return index_names, index_values
-        values_: List[Tuple[GroupingKeysTuple, BucketDict]] = [
-            (tuple(grouping_row[index_name] for index_name in index_names), raw_bucket)
-            for grouping_row, raw_bucket in index_values
-        ]
-        return index_names, values_
-
-    def _parse_group_by(
-        self,
-        response: AggregationsResponseDict,
-        until: AggName,
-        row: GroupingKeysDict,
-        agg_name: AggName,
-        agg_clauses_per_name: Dict[AggName, AggClause],
-        with_single_bucket_groups: bool,
-    ) -> Iterator[Tuple[GroupingKeysDict, BucketDict]]:
-        """
-        Recursive parsing of succession of grouping aggregation clauses.
-
-        Yields each row for which last bucket aggregation generated buckets.
-        """
-        if agg_name not in response:
-            return None
-
-        agg_node = agg_clauses_per_name[agg_name]
-
-        key: BucketKey
-        raw_bucket: BucketDict
-
-        for key, raw_bucket in agg_node.extract_buckets(response[agg_name]):
-            sub_row: GroupingKeysDict = copy.copy(row)
-            if not isinstance(agg_node, UniqueBucketAgg) or with_single_bucket_groups:
-                if isinstance(agg_node, Composite):
-                    key_: CompositeBucketKey = key  # type: ignore
-                    for source_name in agg_node.source_names:
-                        sub_row[source_name] = key_[source_name]
-                else:
-                    key__: BucketKeyAtom = key  # type: ignore
-                    sub_row[agg_name] = key__
-            if agg_name == until:
-                # end real yield
-                yield sub_row, raw_bucket
-            elif agg_name in agg_clauses_per_name.keys():
-                # yield children
-                child_name: AggName
-                for child_name, _ in self._aggs.children(  # type: ignore
-                    agg_node.identifier
-                ):
-                    for nrow, nraw_bucket in self._parse_group_by(
-                        row=sub_row,
-                        response=raw_bucket,
-                        agg_name=child_name,
-                        until=until,
-                        agg_clauses_per_name=agg_clauses_per_name,
-                        with_single_bucket_groups=with_single_bucket_groups,
-                    ):
-                        yield nrow, nraw_bucket
 
     def _normalize_buckets(
         self, agg_response: AggregationsResponseDict, agg_name: AggName
@@ -422,32 +841,12 @@ class Aggregations:
                 ]
             }
         """
-        id_: NodeId = self._aggs.id_from_key(agg_name)
-        _, agg_node = self._aggs.get(id_)
-
-        agg_children = self._aggs.children(id_)
-
-        key: BucketKey
-        raw_bucket: BucketDict
-        for key, raw_bucket in agg_node.extract_buckets(agg_response[agg_name]):
-            result: NormalizedBucketDict = {
-                "level": agg_name,
-                "key": key,
-                "value": agg_node.extract_bucket_value(raw_bucket),
-            }
-            child_key: AggName
-            normalized_children: List[NormalizedBucketDict] = [
-                normalized_child
-                for child_key, child in agg_children
-                for normalized_child in self._normalize_buckets(
-                    # ignore warning about child_key not being necessarily a AggName (str), it is
-                    agg_name=child_key,  # type: ignore
-                    agg_response=raw_bucket,
-                )
-            ]
-            if normalized_children:
-                result["children"] = normalized_children
-            yield result
+        plan: _NormalizePlan = _parsing_plan(
+            self._search,
+            ("normalize", agg_name),
+            lambda: _NormalizePlan(self._aggs, self._aggs.id_from_key(agg_name)),
+        )
+        return plan.normalize(agg_response)
 
     def _grouping_agg(
         self, name: Optional[AggName] = None
@@ -539,6 +938,12 @@ class Aggregations:
         :return: index_names, values
         """
         grouping_agg_name, grouping_agg = self._grouping_agg(grouped_by)
+        serialize_columns = self._columns_plan(
+            normalize=normalize,
+            total_agg=grouping_agg,
+            expand_columns=expand_columns,
+            expand_sep=expand_sep,
+        ).serialize
 
         index_names: List[AggName]
 
@@ -551,13 +956,7 @@ class Aggregations:
                 row_as_tuple=True,
             )
             rows: Dict[GroupingKeysTuple, Row] = {
-                row_index: self._serialize_columns(
-                    row_raw_data=row_raw_data,
-                    normalize=normalize,
-                    total_agg=grouping_agg,
-                    expand_columns=expand_columns,
-                    expand_sep=expand_sep,
-                )
+                row_index: serialize_columns(row_raw_data)
                 for row_index, row_raw_data in index_values
             }
             return index_names, rows
@@ -570,62 +969,49 @@ class Aggregations:
             row_as_tuple=False,
         )
         rows_ = [
-            dict(
-                row_index,
-                **self._serialize_columns(
-                    row_raw_data=row_raw_data,
-                    normalize=normalize,
-                    total_agg=grouping_agg,
-                    expand_columns=expand_columns,
-                    expand_sep=expand_sep,
-                ),
-            )
+            dict(row_index, **serialize_columns(row_raw_data))
             for row_index, row_raw_data in index_values_
         ]
         return index_names, rows_
 
-    def _serialize_columns(
+    def _columns_plan(
         self,
-        row_raw_data: BucketDict,
         normalize: bool,
         expand_columns: bool,
         expand_sep: str,
         total_agg: AggClause,
-    ) -> RowValues:
-        # extract value (usually 'doc_count') of grouping agg node
-        result: RowValues = {}
-        if not isinstance(total_agg, Root):
-            result[total_agg.VALUE_ATTRS[0]] = total_agg.extract_bucket_value(
-                row_raw_data
-            )
-
-        # extract values of children, one columns per child
-        child_key: AggName
-        child: AggClause
-        for child_key, child in self._aggs.children(  # type: ignore
-            total_agg.identifier
-        ):
-            if isinstance(child, (UniqueBucketAgg, MetricAgg)):
-                result[child_key] = child.extract_bucket_value(row_raw_data[child_key])
-            elif expand_columns:
-                for key, bucket in child.extract_buckets(row_raw_data[child_key]):
-                    result[
-                        "%s%s%s" % (child_key, expand_sep, key)
-                    ] = child.extract_bucket_value(bucket)
-            elif normalize:
-                result[child_key] = next(
-                    self._normalize_buckets(row_raw_data, child_key), None
-                )
-            else:
-                result[child_key] = row_raw_data[child_key]
-        return result
+    ) -> _ColumnsPlan:
+        return _parsing_plan(
+            self._search,
+            ("columns", total_agg.identifier, normalize, expand_columns, expand_sep),
+            lambda: _ColumnsPlan(
+                self._aggs,
+                total_agg=total_agg,
+                normalize=normalize,
+                expand_columns=expand_columns,
+                expand_sep=expand_sep,
+            ),
+        )
 
     def to_dataframe(
         self,
         grouped_by: Optional[str] = None,
         normalize_children: bool = True,
         with_single_bucket_groups: bool = False,
+        sort: bool = True,
     ) -> pd.DataFrame:
+        """
+        Build a dataframe with one row per bucket of grouping aggregation (see
+        :func:`~pandagg.response.Aggregations.to_tabular`), grouping keys being used as index.
+
+        Columns are built directly from response buckets, without intermediary row representation.
+
+        :param grouped_by: name of the aggregation node used as last grouping level
+        :param normalize_children: if True, normalize columns buckets
+        :param with_single_bucket_groups: if True, single bucket aggregations (filter, nested etc) are included as
+        grouping levels
+        :param sort: if True, sort dataframe by index; otherwise rows follow response order
+        """
         try:
             import pandas as pd
         except ImportError:
@@ -633,30 +1019,82 @@ class Aggregations:
                 'Using dataframe output format requires to install pandas. Please install "pandas" or '
                 "use another output format."
             )
-        index_names: List[AggName]
-        rows: Dict[GroupingKeysTuple, RowValues]
+        grouping_agg_name, grouping_agg = self._grouping_agg(grouped_by)
 
-        index_names, rows = self.to_tabular(
-            index_orient=True,
-            grouped_by=grouped_by,
-            normalize=normalize_children,
-            with_single_bucket_groups=with_single_bucket_groups,
-        )
+        index_names: List[AggName] = []
+        index: List[List[BucketKeyAtom]] = []
+        raw_buckets: List[BucketDict] = [self.data]  # type: ignore
+        if grouping_agg_name:
+            plan = self._group_by_plan(
+                until=grouping_agg_name,
+                with_single_bucket_groups=with_single_bucket_groups,
+            )
+            index_names = plan.index_names
+            index, raw_buckets = plan.columns(self.data)
 
-        if not rows:
+        if not raw_buckets:
             return pd.DataFrame()
 
-        index: Tuple[GroupingKeysTuple, ...]
-        values: Tuple[RowValues, ...]
-        index, values = zip(*rows.items())
+        columns = self._columns_plan(
+            normalize=normalize_children,
+            total_agg=grouping_agg,
+            expand_columns=True,
+            expand_sep="|",
+        ).columns(raw_buckets)
 
         # empty index
-        if len(index[0]) == 0:
-            return pd.DataFrame(index=(None,) * len(values), data=list(values))
+        if not index_names:
+            return pd.DataFrame(index=(None,) * len(raw_buckets), data=columns)
         # single or multi-index
-        return pd.DataFrame(
-            index=pd.MultiIndex.from_tuples(index, names=index_names), data=list(values)
-        ).sort_index()
+        df = pd.DataFrame(
+            index=pd.MultiIndex.from_arrays(index, names=index_names), data=columns
+        )
+        if sort:
+            return df.sort_index()
+        return df
+
+    def to_arrow(
+        self,
+        grouped_by: Optional[str] = None,
+        normalize_children: bool = True,
+        with_single_bucket_groups: bool = False,
+    ) -> pa.Table:
+        """
+        Return an arrow table with one row per bucket of grouping aggregation (see
+        :func:`~pandagg.response.Aggregations.to_dataframe`), grouping keys being the first columns.
+        Requires pyarrow dependency.
+
+        Keys of date histograms are converted to UTC timestamps, and keys of aggregations on keyword fields (if
+        mappings are provided) to dictionary encoded strings. Other columns types are inferred from values.
+        """
+        import_pyarrow()
+        grouping_agg_name, grouping_agg = self._grouping_agg(grouped_by)
+
+        index: List[Tuple[str, Any]] = []
+        raw_buckets: List[BucketDict] = [self.data]  # type: ignore
+        if grouping_agg_name:
+            plan = self._group_by_plan(
+                until=grouping_agg_name,
+                with_single_bucket_groups=with_single_bucket_groups,
+            )
+            index_keys, raw_buckets = plan.columns(self.data)
+            mappings = self._search._mappings
+            for name, keys, (agg_type, field) in zip(
+                plan.index_names, index_keys, plan.index_sources
+            ):
+                field_type: Optional[str] = None
+                if mappings is not None and field is not None:
+                    field_entry = mappings.fields_table.get(field)
+                    field_type = field_entry.type if field_entry else None
+                index.append((name, key_array(keys, agg_type, field_type)))
+
+        columns = self._columns_plan(
+            normalize=normalize_children,
+            total_agg=grouping_agg,
+            expand_columns=True,
+            expand_sep="|",
+        ).columns(raw_buckets)
+        return columns_table(index, columns)
 
     def to_normalized(self) -> NormalizedBucketDict:
         children: List[NormalizedBucketDict] = []
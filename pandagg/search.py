@@ -4,6 +4,9 @@ from __future__ import annotations
 
 import copy
 import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
     Optional,
     Union,
@@ -13,15 +16,34 @@ from typing import (
     TypeVar,
     Dict,
     Iterator,
+    Callable,
     TYPE_CHECKING,
 )
 
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, TransportError
 from elasticsearch.helpers import scan
-
+from lighttree.node import NodeId
+
+from pandagg.cache import (
+    ResponseCache,
+    SingleFlight,
+    CacheMode,
+    cached_call,
+    fingerprint,
+)
+from pandagg._arrow import import_pyarrow, hits_record_batch, source_schema
+from pandagg._parallel import sliced_scan, prefetched, merged, ExecutorType
 from pandagg.node.aggs.abstract import TypeOrAgg
+from pandagg.node.aggs.bucket import Terms
+from pandagg.node.aggs.composite import Composite
 from pandagg.query import Bool
-from pandagg.response import SearchResponse, Hit, Aggregations
+from pandagg.response import (
+    SearchResponse,
+    Hit,
+    Hits,
+    Aggregations,
+    _response_filter_path,
+)
 from pandagg.tree.mappings import _mappings, Mappings
 from pandagg.tree.query import (
     Query,
@@ -31,6 +53,7 @@ from pandagg.tree.query import (
     SingleOrMultipleQueryClause,
 )
 from pandagg.tree.aggs import Aggs, AggsDictOrNode
+from pandagg.tree._tree import copy_serialized
 from pandagg.types import (
     MappingsDict,
     QueryName,
@@ -41,11 +64,14 @@ from pandagg.types import (
     SearchDict,
     BucketDict,
     AfterKey,
+    HitDict,
+    ResponseOutput,
 )
 from pandagg.utils import DSLMixin
 
 if TYPE_CHECKING:
     import pandas as pd
+    import pyarrow as pa
     from pandagg.document import DocumentMeta
 
 # because Search.bool method shadows bool typing
@@ -53,6 +79,9 @@ bool_ = bool
 
 T = TypeVar("T", bound="Request")
 
+# searches of a multi search request, and request body
+MultiSearchBatch = Tuple[List["Search"], List[Union[Dict, SearchDict]]]
+
 
 class Request:
     def __init__(
@@ -157,7 +186,10 @@ class Search(DSLMixin, Request):
         mappings: Optional[Union[MappingsDict, Mappings]] = None,
         nested_autocorrect: bool = False,
         repr_auto_execute: bool = False,
-        document_class: DocumentMeta = None,
+        document_class: Optional[DocumentMeta] = None,
+        cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        auto_filter_path: bool = False,
     ) -> None:
         """
         Search request to elasticsearch.
@@ -167,6 +199,11 @@ class Search(DSLMixin, Request):
         :arg mappings: mappings used for query validation
         :arg nested_autocorrect: in case of missing nested clause, will insert it automatically
         :arg repr_auto_execute: execute query and display results as dataframe, requires client to be provided
+        :arg cache: cache of `execute` and `count` responses, see :mod:`pandagg.cache`
+        :arg single_flight: group in which identical concurrent `execute` calls share a single request, see
+            :class:`~pandagg.cache.SingleFlight`
+        :arg auto_filter_path: restrict `execute` response to fields read by response parsing, see
+            :func:`~pandagg.search.Search.auto_filter_path`
 
         All the parameters supplied (or omitted) at creation type can be later
         overridden by methods (`using`, `index` and `mappings` respectively).
@@ -191,6 +228,12 @@ class Search(DSLMixin, Request):
         )
         self._repr_auto_execute: bool = repr_auto_execute
         self._document_class: Optional[DocumentMeta] = document_class
+        self._cache: Optional[ResponseCache] = cache
+        self._single_flight: Optional[SingleFlight] = single_flight
+        self._auto_filter_path: bool = auto_filter_path
+        self._filter_path_output: Optional[ResponseOutput] = None
+        # response parsing plans compiled for current aggregations: (aggregations structure, plans per options)
+        self._parsing_plans: Tuple[Tuple[str, ...], Dict[Any, Any]] = ((), {})
         super(Search, self).__init__(using=using, index=index)
 
     def query(
@@ -500,7 +543,9 @@ class Search(DSLMixin, Request):
         of all the underlying objects. Used internally by most state modifying
         APIs.
         """
-        s = Search(using=self._using, index=self._index, mappings=self._mappings)
+        s = self.__class__(
+            using=self._using, index=self._index, mappings=self._mappings
+        )
         s._params = self._params.copy()
         s._sort = self._sort[:]
         s._source = copy.copy(self._source) if self._source is not None else None
@@ -508,12 +553,17 @@ class Search(DSLMixin, Request):
         s._highlight_opts = self._highlight_opts.copy()
         s._suggest = self._suggest.copy()
         s._script_fields = self._script_fields.copy()
-        s._aggs = self._aggs.clone()
-        s._query = self._query.clone()
-        s._post_filter = self._post_filter.clone()
-        s._mappings = None if self._mappings is None else self._mappings.clone()
+        # trees are never modified in place (building methods return modified copies), hence can be shared
+        s._aggs = self._aggs
+        s._query = self._query
+        s._post_filter = self._post_filter
+        s._mappings = self._mappings
         s._repr_auto_execute = self._repr_auto_execute
         s._document_class = self._document_class
+        s._cache = self._cache
+        s._single_flight = self._single_flight
+        s._auto_filter_path = self._auto_filter_path
+        s._filter_path_output = self._filter_path_output
         return s
 
     def update_from_dict(self, d: Dict) -> "Search":
@@ -734,22 +784,32 @@ class Search(DSLMixin, Request):
 
         All additional keyword arguments will be included into the dictionary.
         """
+        d: SearchDict = copy_serialized(self._body(count=count))
+        # TODO: check if those kwargs are really useful
+        d.update(kwargs)  # type: ignore
+        return d
+
+    def _body(self, count: bool_ = False) -> SearchDict:
+        """
+        Request body, embedding cached serializations of query and aggregations, hence only to be read (see
+        :func:`~pandagg.search.Search.to_dict` for a modifiable copy).
+        """
         d: SearchDict = {}
 
         if self._query:
-            dq = self._query.to_dict()
+            dq = self._query._cached_to_dict()
             if dq:
                 d["query"] = dq
 
         # count request doesn't care for sorting and other things
         if not count:
             if self._post_filter:
-                pfd = self._post_filter.to_dict()
+                pfd = self._post_filter._cached_to_dict()
                 if pfd:
                     d["post_filter"] = pfd
 
             if self._aggs:
-                d["aggs"] = self._aggs.to_dict()
+                d["aggs"] = self._aggs._cached_to_dict()
 
             if self._sort:
                 d["sort"] = self._sort
@@ -759,6 +819,9 @@ class Search(DSLMixin, Request):
 
             if self._source not in (None, {}):
                 d["_source"] = self._source
+            elif self._document_class is not None:
+                # only fetch fields that are read when deserializing hits sources
+                d["_source"] = {"includes": self._document_class._source_includes_}  # type: ignore
 
             if self._highlight:
                 highlights: Dict[str, Any] = {"fields": self._highlight}
@@ -770,54 +833,309 @@ class Search(DSLMixin, Request):
 
             if self._script_fields:
                 d["script_fields"] = self._script_fields
-
-        # TODO: check if those kwargs are really useful
-        d.update(kwargs)  # type: ignore
         return d
 
-    def count(self) -> int:
+    def cache(self, cache: Optional[ResponseCache]) -> "Search":
+        """
+        Use provided cache (None to disable caching) for `execute` and `count` responses. Identical requests
+        (same index and body) are then served from cache, without network round-trip.
+
+        Example::
+
+            s = Search(using=client).cache(MemoryCache(max_size=100, ttl=60))
+        """
+        s = self._clone()
+        s._cache = cache
+        return s
+
+    def single_flight(self, group: Optional[SingleFlight]) -> "Search":
+        """
+        Coalesce identical concurrent `execute` calls (same client, index and body) within provided group (None to
+        disable coalescing): a single request is sent, and all callers get the same response.
+
+        Example::
+
+            group = SingleFlight()
+            s = Search(using=client).single_flight(group)
+        """
+        s = self._clone()
+        s._single_flight = group
+        return s
+
+    def auto_filter_path(
+        self, enabled: bool_ = True, output: Optional[ResponseOutput] = None
+    ) -> "Search":
+        """
+        Restrict `execute` response (using "filter_path" parameter
+        https://www.elastic.co/guide/en/elasticsearch/reference/current/common-options.html#common-options-response-filtering)
+        to the fields read by :class:`~pandagg.response.SearchResponse`: aggregations bucket keys and values derived
+        from the aggregations tree (dropping "doc_count_error_upper_bound", "sum_other_doc_count", unused
+        "key_as_string" etc), hits metadata read by :class:`~pandagg.response.Hit` (no hits at all if size is 0),
+        and shards totals.
+
+        Parsed results (hits, `to_tabular`, `to_dataframe`, `to_normalized`) are unchanged, but raw aggregations
+        responses are restricted as well: metric clauses responses are kept whole, but bucket aggregations without
+        children only keep their keys and doc counts.
+
+        :param output: the way response is read, restricting responses holding both hits and aggregations: "hits"
+            (:class:`~pandagg.response.Hits`) drops aggregations, "tabular", "dataframe" or "normalized"
+            (aggregations read with `to_tabular`, `to_dataframe` or `to_normalized`, which read the same fields)
+            drop hits (but not their total); None keeps fields read by all of them. Requests without hits
+            (size 0, as performed by composite aggregation scans) or without aggregations are not affected
+
+        Example::
+
+            s = Search(using=client).auto_filter_path(output="dataframe").groupby("per_user", "terms", field="user")
+        """
+        if output not in (None, "hits", "tabular", "dataframe", "normalized"):
+            raise ValueError(
+                "'output' must be one of 'hits', 'tabular', 'dataframe', 'normalized', got %s"
+                % output
+            )
+        s = self._clone()
+        s._auto_filter_path = enabled
+        s._filter_path_output = output
+        return s
+
+    def count(self, cache_mode: CacheMode = "use") -> int:
         """
         Return the number of hits matching the query and filters. Note that
         only the actual number is returned.
+
+        :param cache_mode: if a cache is configured, "use" serves response from cache if present, "bypass" ignores
+        the cache, "refresh" queries elasticsearch and updates the cache
         """
         es = self._get_connection()
 
-        d = self.to_dict(count=True)
-        return es.count(index=self._index, body=d)["count"]
+        d = self._body(count=True)
+        r = cached_call(
+            self._cache,
+            fingerprint("count", self._index, d, client=es),
+            lambda: es.count(index=self._index, body=d),
+            mode=cache_mode,
+        )
+        return r["count"]
 
-    def execute(self) -> SearchResponse:
+    def execute(self, cache_mode: CacheMode = "use") -> SearchResponse:
         """
         Execute the search and return an instance of ``Response`` wrapping all
         the data.
+
+        :param cache_mode: if a cache is configured, "use" serves response from cache if present, "bypass" ignores
+        the cache, "refresh" queries elasticsearch and updates the cache
         """
         es = self._get_connection()
-        raw_data = es.search(index=self._index, body=self.to_dict())
+        body = self._body()
+        params: Dict[str, Any] = self._execute_params(body)
+        key = fingerprint(
+            "search", self._index, [body, params] if params else body, client=es
+        )
+
+        def fetch() -> SearchResponseDict:
+            return cached_call(
+                self._cache,
+                key,
+                lambda: es.search(index=self._index, body=body, **params),
+                mode=cache_mode,
+            )
+
+        if self._single_flight is None:
+            raw_data = fetch()
+        else:
+            # raw response is shared, each search parses it (according to its own document class etc)
+            raw_data = self._single_flight.do(
+                "%s:%s:%s" % (id(es), cache_mode, key), fetch
+            )
         return SearchResponse(data=raw_data, _search=self)  # type: ignore
 
-    def scan_composite_agg(self, size: int) -> Iterator[BucketDict]:
-        """Iterate over the whole aggregation composed buckets, yields buckets."""
+    def _execute_params(self, body: SearchDict) -> Dict[str, Any]:
+        """Query string parameters of `execute` search request."""
+        if not self._auto_filter_path:
+            return {}
+        return {"filter_path": _response_filter_path(self, body)}  # type: ignore
+
+    def scan_composite_agg(
+        self,
+        size: int,
+        prefetch: int = 0,
+        partitions: Optional[int] = None,
+        workers: Optional[int] = None,
+        ordered: bool_ = False,
+    ) -> Iterator[BucketDict]:
+        """
+        Iterate over the whole aggregation composed buckets, yields buckets.
+
+        :param size: number of buckets per page
+        :param prefetch: if positive, pages are fetched on a background thread, at most `prefetch` pages ahead of
+        consumed buckets, so that network time and buckets processing overlap
+        :param partitions: if provided, the values of the first composite source are split into (at most) as many
+        disjoint ranges, each one scanned by its own composite cursor; supported on `terms` sources on numeric or
+        date fields, and on `histogram`/`date_histogram` sources (with fixed length intervals)
+        :param workers: number of partitions scanned at the same time, defaults to `partitions`
+        :param ordered: for partitioned scans, whether buckets are yielded in composite order, otherwise they are
+        yielded as they arrive
+        """
+        for page in self._scan_composite_pages(
+            size=size,
+            prefetch=prefetch,
+            partitions=partitions,
+            workers=workers,
+            ordered=ordered,
+        ):
+            for bucket in page:
+                yield bucket
+
+    def _scan_composite_pages(
+        self,
+        size: int,
+        prefetch: int = 0,
+        partitions: Optional[int] = None,
+        workers: Optional[int] = None,
+        ordered: bool_ = False,
+    ) -> Iterator[List[BucketDict]]:
+        """Pages of buckets of `scan_composite_agg`."""
+        if partitions is not None and partitions > 1:
+            return merged(
+                [
+                    self._filtered_pages(s._composite_agg_pages(size=size), keep)
+                    for s, keep in self._composite_partitions(partitions)
+                ],
+                workers=workers,
+                ordered=ordered,
+                buffer=max(prefetch, 1),
+            )
+        pages = self._composite_agg_pages(size=size)
+        if prefetch > 0:
+            return prefetched(pages, depth=prefetch)
+        return pages
+
+    def _composite_agg_pages(self, size: int) -> Iterator[List[BucketDict]]:
+        """Iterate over the whole aggregation composed buckets, yields pages of buckets."""
         s: Search = self._clone().size(0)
-        s._aggs = s._aggs.as_composite(size=size)
         a_name, _ = s._aggs.get_composition_supporting_agg()
-        r: SearchResponse = s.execute()
-        buckets: List[BucketDict] = r.aggregations.data[a_name][  # type: ignore
-            "buckets"
-        ]
-        after_key: AfterKey = r.aggregations.data[a_name]["after_key"]  # type: ignore
-
-        init: bool = True
-        while init or len(buckets) == size:
-            init = False
+        after_key: Optional[AfterKey] = None
+        while True:
             s._aggs = s._aggs.as_composite(size=size, after=after_key)
-            r = s.execute()
-            agg_clause_response = r.aggregations.data[a_name]
-            buckets = agg_clause_response["buckets"]  # type: ignore
-            for bucket in buckets:
-                yield bucket
-            if "after_key" in agg_clause_response:
-                after_key = agg_clause_response["after_key"]  # type: ignore
+            r: SearchResponse = s.execute()
+            # absent if filtered by "filter_path" (no buckets)
+            agg_clause_response = r.aggregations.data.get(a_name, {})
+            buckets: List[BucketDict] = agg_clause_response.get("buckets", [])  # type: ignore
+            yield buckets
+            if len(buckets) < size or "after_key" not in agg_clause_response:
+                return
+            after_key = agg_clause_response["after_key"]  # type: ignore
+
+    @staticmethod
+    def _filtered_pages(
+        pages: Iterator[List[BucketDict]], keep: Callable[[BucketDict], bool_]
+    ) -> Iterator[List[BucketDict]]:
+        for page in pages:
+            yield [bucket for bucket in page if keep(bucket)]
+
+    def _composite_partitions(
+        self, partitions: int
+    ) -> List[Tuple["Search", Callable[[BucketDict], bool_]]]:
+        """
+        Split the values of composite aggregation first source into disjoint ranges. Return, for each range in
+        composite order, the search restricted to documents having a value in this range, and a predicate keeping
+        buckets whose key is in this range (documents with multiple values can match several ranges).
+        """
+        composite: Composite
+        _, composite = self._aggs.as_composite(size=1).get_composition_supporting_agg()  # type: ignore
+        source_name, source = next(iter(composite.sources[0].items()))
+        source_type, source_body = next(iter(source.items()))  # type: ignore
+        field = source_body.get("field")
+        if field is None or "script" in source_body or "format" in source_body:
+            raise ValueError(
+                "Partitioned scan requires <%s> composite source to be based on a field, without script nor format."
+                % source_name
+            )
+        interval, offset = _composite_source_interval(source_type, source_body)
+        nesteds: List[str] = []
+        if self._mappings is not None and field in self._mappings.fields_table:
+            field_type = self._mappings.fields_table[field].type
+            if source_type == "terms" and field_type not in _RANGE_PARTITIONED_TYPES:
+                raise ValueError(
+                    "Partitioned scan requires <%s> composite source field <%s> to be numeric or date, got <%s>."
+                    % (source_name, field, field_type)
+                )
+            # from deepest to highest
+            nesteds = self._mappings.list_nesteds_at_field(field)
+
+        stats: Dict[str, Any] = {
+            "min": {"min": {"field": field}},
+            "max": {"max": {"field": field}},
+        }
+        for nested in nesteds:
+            stats = {"nested": {"nested": {"path": nested}, "aggs": stats}}
+        b: Search = self._clone().size(0)
+        b._aggs = b._aggs.clone(with_nodes=False)
+        try:
+            r = b.aggs(stats).execute()
+        except TransportError as e:
+            if e.status_code != 400:
+                raise
+            raise ValueError(
+                "Partitioned scan requires <%s> composite source field <%s> to be numeric or date: %s"
+                % (source_name, field, e.error)
+            ) from e
+        data: Dict[str, Any] = r.aggregations.data  # type: ignore
+        for _ in nesteds:
+            data = data["nested"]
+        min_, max_ = data["min"], data["max"]
+        if min_["value"] is None:  # type: ignore
+            return [(self, lambda bucket: True)]
+        lowest: float = min_["value"]  # type: ignore
+        highest: float = max_["value"]  # type: ignore
+        is_date = "value_as_string" in min_ or source_type == "date_histogram"
+
+        boundaries: List[float] = []
+        for i in range(1, partitions):
+            boundary = lowest + (highest - lowest) * i / partitions
+            if interval is not None:
+                # align on buckets keys, so that a bucket is never split across two ranges
+                boundary = (
+                    offset + math.floor((boundary - offset) / interval) * interval
+                )
+            if is_date:
+                boundary = int(boundary)
+            if boundary > lowest and (not boundaries or boundary > boundaries[-1]):
+                boundaries.append(boundary)
+
+        bounds = list(zip([None] + boundaries, boundaries + [None]))  # type: ignore
+        ranges: List[Tuple[Search, Callable[[BucketDict], bool_]]] = []
+        for lower, upper in bounds:
+            range_body: Dict[str, Any] = {}
+            if lower is not None:
+                range_body["gte"] = lower
+            if upper is not None:
+                range_body["lt"] = upper
+            if is_date:
+                range_body["format"] = "epoch_millis"
+            s = (
+                self.filter(_nested_clause({"range": {field: range_body}}, nesteds))
+                if len(bounds) > 1
+                else self
+            )
+            ranges.append((s, _key_in_range(source_name, lower, upper)))
+
+        descending = source_body.get("order") == "desc"
+        if descending:
+            ranges.reverse()
+        if source_body.get("missing_bucket"):
+            # documents without value are not matched by ranges filters
+            missing = (
+                self.exclude(_nested_clause({"exists": {"field": field}}, nesteds)),
+                _key_in_range(source_name, None, None, missing=True),
+            )
+            missing_order = source_body.get("missing_order", "default")
+            if missing_order == "default":
+                missing_order = "last" if descending else "first"
+            if missing_order == "first":
+                ranges.insert(0, missing)
             else:
-                break
+                ranges.append(missing)
+        return ranges
 
     def scan_composite_agg_at_once(self, size: int) -> Aggregations:
         """Iterate over the whole aggregation composed buckets (converting Aggs into composite agg if possible), and
@@ -831,7 +1149,137 @@ class Search(DSLMixin, Request):
         # artificially merge all buckets as if they were returned in a single query
         return Aggregations(_search=s, data={agg_name: {"buckets": all_buckets}})
 
-    def scan(self) -> Iterator[Hit]:
+    def scan_composite_dataframes(
+        self,
+        size: int,
+        normalize_children: bool_ = True,
+        with_single_bucket_groups: bool_ = False,
+        prefetch: int = 0,
+        partitions: Optional[int] = None,
+        workers: Optional[int] = None,
+        ordered: bool_ = False,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over the whole aggregation composed buckets (see :func:`~pandagg.search.Search.scan_composite_agg`),
+        and yield a dataframe per page of (at most) `size` buckets, as returned by
+        :func:`~pandagg.response.Aggregations.to_dataframe`, as pages arrive. Rows of a dataframe follow composite
+        order. Requires pandas dependency.
+
+        :param size: number of buckets per page
+        :param normalize_children: if True, normalize columns buckets
+        :param with_single_bucket_groups: if True, single bucket aggregations (filter, nested etc) are included as
+        grouping levels
+        """
+        to_dataframe = self._composite_page_parser(
+            size,
+            normalize_children=normalize_children,
+            with_single_bucket_groups=with_single_bucket_groups,
+        )
+        for page in self._scan_composite_pages(
+            size=size,
+            prefetch=prefetch,
+            partitions=partitions,
+            workers=workers,
+            ordered=ordered,
+        ):
+            if page:
+                yield to_dataframe(page)
+
+    def _composite_page_parser(
+        self, size: int, normalize_children: bool_, with_single_bucket_groups: bool_
+    ) -> Callable[[List[BucketDict]], pd.DataFrame]:
+        """Return function converting a page of composite aggregation buckets into a dataframe."""
+        s: Search = self._clone().size(0)
+        s._aggs = s._aggs.as_composite(size=size)
+        agg_name: AggName
+        agg_name, _ = s._aggs.get_composition_supporting_agg()  # type: ignore
+
+        def to_dataframe(page: List[BucketDict]) -> pd.DataFrame:
+            # all pages are parsed with the same search, so that parsing plans are compiled only once
+            return Aggregations(
+                _search=s, data={agg_name: {"buckets": page}}
+            ).to_dataframe(
+                grouped_by=agg_name,
+                normalize_children=normalize_children,
+                with_single_bucket_groups=with_single_bucket_groups,
+                sort=False,
+            )
+
+        return to_dataframe
+
+    def scan_terms_partitions(
+        self, agg_name: AggName, num_partitions: int, concurrency: Optional[int] = None
+    ) -> Aggregations:
+        """
+        Execute the search once per partition of the `agg_name` terms aggregation (using `include` partitions
+        https://www.elastic.co/guide/en/elasticsearch/reference/current/search-aggregations-bucket-terms-aggregation.html#_filtering_values_with_partitions
+        ), and merge all responses in a single Aggregations instance, as if all terms were returned by a single query.
+
+        Useful for high cardinality terms aggregations that cannot be converted into composite aggregations (for
+        instance when ordered by a sub-aggregation). Note that `size` of the terms aggregation applies per partition,
+        and that buckets are concatenated partition after partition: their order only holds within each partition,
+        not across partitions (for instance when ordered by a sub-aggregation metric).
+
+        :param agg_name: name of the terms aggregation to partition
+        :param num_partitions: number of partitions
+        :param concurrency: number of partitions queried at the same time, defaults to `num_partitions`
+        """
+        nid, searches = self._terms_partitions_searches(agg_name, num_partitions)
+        with ThreadPoolExecutor(max_workers=concurrency or num_partitions) as pool:
+            responses = list(
+                pool.map(lambda s_: s_.execute().aggregations.data, searches)
+            )
+        return self._merged_terms_partitions(nid, responses)
+
+    def _terms_partitions_searches(
+        self, agg_name: AggName, num_partitions: int
+    ) -> Tuple[NodeId, List["Search"]]:
+        """Return identifier of `agg_name` terms aggregation, and a search per partition of its terms."""
+        if num_partitions < 1:
+            raise ValueError(
+                "'num_partitions' must be a positive integer, got %s" % num_partitions
+            )
+        nid = self._aggs.id_from_key(agg_name)
+        _, terms = self._aggs.get(nid)
+        if not isinstance(terms, Terms):
+            raise ValueError("<%s> agg clause is not a terms aggregation." % agg_name)
+        if "include" in terms.body:
+            raise ValueError(
+                "<%s> terms aggregation already has an 'include' clause, it cannot be partitioned."
+                % agg_name
+            )
+
+        searches: List[Search] = []
+        for partition in range(num_partitions):
+            s = self._clone().size(0)
+            s._aggs = s._aggs.clone(with_nodes=True, deep=True)
+            _, partition_terms = s._aggs.get(nid)
+            partition_terms.body["include"] = {
+                "partition": partition,
+                "num_partitions": num_partitions,
+            }
+            searches.append(s)
+        return nid, searches
+
+    def _merged_terms_partitions(
+        self, nid: NodeId, responses: List[Dict[str, Any]]
+    ) -> Aggregations:
+        """Merge aggregations responses of terms partitions searches."""
+        path: List[AggName] = [
+            name for name, _ in self._aggs.ancestors(nid, from_root=True, include_current=True)[1:]  # type: ignore
+        ]
+        # artificially merge all partitions as if they were returned in a single query
+        return Aggregations(
+            _search=self._clone().size(0),
+            data=_merge_partitioned_responses(responses, path),  # type: ignore
+        )
+
+    def scan(
+        self,
+        slices: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: ExecutorType = "thread",
+    ) -> Iterator[Hit]:
         """
         Turn the search into a scan search and return a generator that will
         iterate over all the documents matching the query.
@@ -840,11 +1288,200 @@ class Search(DSLMixin, Request):
         pass to the underlying ``scan`` helper from ``elasticsearch-py`` -
         https://elasticsearch-py.readthedocs.io/en/master/helpers.html#elasticsearch.helpers.scan
 
+        If `slices` is provided, the scroll is split into as many sliced scrolls
+        (https://www.elastic.co/guide/en/elasticsearch/reference/current/paginate-search-results.html#slice-scroll)
+        drained concurrently, and hits are yielded as they arrive (no ordering guarantee across slices)::
+
+            for hit in Search(using=client, index="movies").scan(slices=8, workers=4):
+                ...
+
+        :param slices: number of sliced scrolls
+        :param workers: number of slices drained at the same time, defaults to number of slices
+        :param executor: "thread" (default) or "process", the latter instantiates a client per process based on
+        client hosts and connection parameters, which must be picklable
         """
-        es = self._get_connection()
-        for hit in scan(es, query=self.to_dict(), index=self._index):
+        for hit in self._scan_hits(slices=slices, workers=workers, executor=executor):
             yield Hit(hit, _document_class=self._document_class)
 
+    def _scan_hits(
+        self,
+        slices: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: ExecutorType = "thread",
+    ) -> Iterator[HitDict]:
+        """Raw hits of `scan`."""
+        es = self._get_connection()
+        if slices is None or slices <= 1:
+            return scan(es, query=self.to_dict(), index=self._index)
+        return sliced_scan(
+            es,
+            query=self.to_dict(),
+            index=self._index,
+            slices=slices,
+            workers=workers,
+            executor=executor,
+        )
+
+    def scan_dataframes(
+        self,
+        chunk_size: int = 1000,
+        expand_source: bool_ = True,
+        source_only: bool_ = True,
+        slices: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: ExecutorType = "thread",
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over all the documents matching the query (see :func:`~pandagg.search.Search.scan`), and yield them
+        as dataframes of (at most) `chunk_size` documents, as returned by
+        :func:`~pandagg.response.Hits.to_dataframe`. Only one chunk of raw hits is held in memory at a time.
+        Requires pandas dependency (see :func:`~pandagg.search.Search.scan_arrow` for arrow record batches).
+
+        :param chunk_size: number of documents per dataframe
+        :param expand_source: if True, `_source` sub-fields are expanded as columns
+        :param source_only: if True, doesn't include hit metadata (except id which is used as dataframe index)
+        """
+        if chunk_size < 1:
+            raise ValueError(
+                "'chunk_size' must be a positive integer, got %s" % chunk_size
+            )
+        for hits in self._scan_chunks(
+            chunk_size, slices=slices, workers=workers, executor=executor
+        ):
+            yield Hits(data={"hits": hits}, _document_class=None).to_dataframe(
+                expand_source=expand_source, source_only=source_only
+            )
+
+    def _scan_chunks(
+        self,
+        chunk_size: int,
+        slices: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: ExecutorType = "thread",
+    ) -> Iterator[List[HitDict]]:
+        """Raw hits of `scan`, grouped in lists of (at most) `chunk_size` hits."""
+        hits: List[HitDict] = []
+        for hit in self._scan_hits(slices=slices, workers=workers, executor=executor):
+            hits.append(hit)
+            if len(hits) == chunk_size:
+                yield hits
+                hits = []
+        if hits:
+            yield hits
+
+    def scan_arrow(
+        self,
+        batch_size: int = 1000,
+        source_only: bool_ = True,
+        schema: Optional[pa.Schema] = None,
+        slices: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: ExecutorType = "thread",
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Iterate over all the documents matching the query (see :func:`~pandagg.search.Search.scan`), and yield them
+        as arrow record batches of `batch_size` documents. Requires pyarrow dependency.
+
+        Batches schema is derived from search mappings if provided (see
+        :func:`~pandagg.tree.mappings.Mappings.to_arrow_schema`), or else inferred from first batch. Fields not
+        declared as `multiple` in mappings become lists from the first batch in which they hold arrays on (declare
+        multi-valued fields with `multiple=True` so that all batches share the same schema). Batches can be written as
+        they come, for instance in a parquet file::
+
+            batches = Search(using=client, index="movies", mappings=mappings).scan_arrow(batch_size=10000)
+            first = next(batches)
+            with pyarrow.parquet.ParquetWriter("movies.parquet", first.schema) as writer:
+                writer.write_batch(first)
+                for batch in batches:
+                    writer.write_batch(batch)
+
+        :param batch_size: number of documents per batch
+        :param source_only: if False, `_index` and `_score` columns are included
+        :param schema: schema of `_source` fields, overriding the one derived from mappings
+        """
+        if batch_size < 1:
+            raise ValueError(
+                "'batch_size' must be a positive integer, got %s" % batch_size
+            )
+        import_pyarrow()
+        if schema is None and self._mappings is not None:
+            schema = self._mappings.to_arrow_schema()
+        for hits in self._scan_chunks(
+            batch_size, slices=slices, workers=workers, executor=executor
+        ):
+            batch = hits_record_batch(hits, schema=schema, source_only=source_only)
+            # following batches are converted to schema inferred from first one, or to mappings schema extended
+            # with fields converted to lists
+            schema = source_schema(batch, source_only=source_only)
+            yield batch
+
+    def _pit_body(self, page_size: int) -> SearchDict:
+        """
+        Return search body used to paginate over a point in time (without `pit`, nor `search_after`): user sort is
+        completed by `_shard_doc` tiebreaker so that pagination is consistent, and aggregations are dropped since
+        only hits are read.
+        """
+        body: SearchDict = self.to_dict()
+        # index is defined by point in time, pagination is defined by search_after
+        body.pop("from", None)  # type: ignore
+        body.pop("aggs", None)  # type: ignore
+        body["size"] = page_size
+        sort: List[Union[str, Dict[str, Any]]] = list(body.get("sort", []))
+        if not any(
+            k == "_shard_doc" or (isinstance(k, dict) and "_shard_doc" in k)
+            for k in sort
+        ):
+            sort.append({"_shard_doc": "asc"})
+        body["sort"] = sort
+        return body
+
+    def iterate_pit(
+        self,
+        page_size: int = 1000,
+        keep_alive: str = "1m",
+        search_after: Optional[List[Any]] = None,
+    ) -> Iterator[Hit]:
+        """
+        Iterate over all the documents matching the query, paginating with `search_after` over a point in time
+        https://www.elastic.co/guide/en/elasticsearch/reference/current/paginate-search-results.html#search-after
+
+        Hits are yielded following search sort (with `_shard_doc` as tiebreaker). The point in time is always closed
+        at the end of iteration, including on early exit or on error.
+
+        To resume an interrupted iteration, provide the sort values of the last processed hit (``hit._sort``) as
+        `search_after`. Note that resuming on a new point in time is only exact if search sort is unique per
+        document (since `_shard_doc` values are specific to a point in time).
+
+        :param page_size: number of hits fetched per request
+        :param keep_alive: time to live of point in time between two requests
+        :param search_after: sort values after which iteration starts
+        """
+        es = self._get_connection()
+        body = self._pit_body(page_size=page_size)
+        pit_id: str = es.open_point_in_time(
+            index=self._index or "_all", keep_alive=keep_alive
+        )["id"]
+        try:
+            while True:
+                page_body: SearchDict = dict(  # type: ignore
+                    body, pit={"id": pit_id, "keep_alive": keep_alive}
+                )
+                if search_after is not None:
+                    page_body["search_after"] = search_after  # type: ignore
+                raw_data = es.search(body=page_body)
+                # point in time id can change between requests
+                pit_id = raw_data.get("pit_id", pit_id)
+                hits: List[HitDict] = raw_data["hits"]["hits"]
+                for hit in hits:
+                    yield Hit(hit, _document_class=self._document_class)
+                if len(hits) < page_size:
+                    return
+                search_after = hits[-1]["sort"]
+                # hits total is only computed for first page
+                body["track_total_hits"] = False
+        finally:
+            es.close_point_in_time(body={"id": pit_id})
+
     def delete(self) -> DeleteByQueryResponse:
         """
         delete() executes the query by delegating to delete_by_query()
@@ -857,7 +1494,7 @@ class Search(DSLMixin, Request):
         return (
             isinstance(other, Search)
             and other._index == self._index
-            and other.to_dict() == self.to_dict()
+            and other._body() == self._body()
         )
 
     def _auto_execution_df_result(self) -> pd.DataFrame:
@@ -895,9 +1532,11 @@ class MultiSearch(Request):
         self,
         using: Optional[Elasticsearch],
         index: Optional[Union[str, Tuple[str], List[str]]] = None,
+        single_flight: Optional[SingleFlight] = None,
     ) -> None:
         super(MultiSearch, self).__init__(using=using, index=index)
         self._searches: List[Search] = []
+        self._single_flight: Optional[SingleFlight] = single_flight
 
     def __getitem__(self, key: int) -> Search:
         return self._searches[key]
@@ -906,34 +1545,38 @@ class MultiSearch(Request):
         return iter(self._searches)
 
     def _clone(self) -> "MultiSearch":
-        ms = MultiSearch(using=self._using, index=self._index)
+        ms = self.__class__(
+            using=self._using, index=self._index, single_flight=self._single_flight
+        )
         ms._params = self._params.copy()
         ms._searches = self._searches[:]
         return ms
 
-    def add(self: "MultiSearch", search: Search) -> "MultiSearch":
+    def add(self: "MultiSearch", *searches: Search) -> "MultiSearch":
         """
-        Adds a new :class:`~elasticsearch_dsl.Search` object to the request::
+        Adds new :class:`~elasticsearch_dsl.Search` objects to the request::
 
             ms = MultiSearch(index='my-index')
             ms = ms.add(Search(doc_type=Category).filter('term', category='python'))
-            ms = ms.add(Search(doc_type=Blog))
+            ms = ms.add(Search(doc_type=Blog), Search(doc_type=Comment))
         """
         ms = self._clone()
-        ms._searches.append(search)
+        ms._searches.extend(searches)
         return ms
 
+    @staticmethod
+    def _search_lines(s: Search) -> List[Union[Dict, SearchDict]]:
+        meta = {}
+        if s._index:
+            meta["index"] = s._index
+        meta.update(s._params)
+        return [meta, s.to_dict()]
+
     def to_dict(self) -> List[Union[Dict, SearchDict]]:
         out: List[Union[Dict, SearchDict]] = []
         s: Search
         for s in self._searches:
-            meta = {}
-            if s._index:
-                meta["index"] = s._index
-            meta.update(s._params)
-
-            out.append(meta)
-            out.append(s.to_dict())
+            out.extend(self._search_lines(s))
 
         return out
 
@@ -942,7 +1585,102 @@ class MultiSearch(Request):
         Execute the multi search request and return a list of search results.
         """
         es = self._get_connection()
-        return es.msearch(index=self._index, body=self.to_dict(), **self._params)  # type: ignore
+        body = self.to_dict()
+        if self._single_flight is None:
+            return es.msearch(index=self._index, body=body, **self._params)  # type: ignore
+        key = fingerprint("msearch", self._index, [body, self._params], client=es)
+        return self._single_flight.do(
+            "%s:%s" % (id(es), key),
+            lambda: es.msearch(index=self._index, body=body, **self._params),
+        )
+
+    def execute_batched(
+        self,
+        batch_size: int = 100,
+        batch_bytes: int = 10 * 1024 * 1024,
+        concurrency: int = 1,
+    ) -> List[SearchResponse]:
+        """
+        Execute searches in as many multi search requests as needed for each request to hold at most `batch_size`
+        searches and `batch_bytes` bytes (a single search exceeding `batch_bytes` is sent alone), and return a
+        :class:`~pandagg.response.SearchResponse` per search, in the same order as searches.
+
+        Failures are reported per search, without failing other ones: the response of a failed search has an
+        `error` (and `status`), be it returned by Elasticsearch for this search only, or caused by the failure of
+        the whole multi search request it was part of.
+
+        Number of searches executed concurrently by Elasticsearch for each request can be set through
+        ``params(max_concurrent_searches=...)``.
+
+        :param batch_size: maximum number of searches per multi search request
+        :param batch_bytes: maximum size of the (serialized) body of a multi search request
+        :param concurrency: number of multi search requests sent at the same time
+        """
+        es = self._get_connection()
+
+        def execute_batch(batch: MultiSearchBatch) -> List[SearchResponse]:
+            searches, body = batch
+            try:
+                raw_data = es.msearch(index=self._index, body=body, **self._params)
+            except TransportError as e:
+                return self._batch_responses(searches, error=e)
+            return self._batch_responses(searches, raw_data=raw_data)
+
+        batches = self._batches(batch_size=batch_size, batch_bytes=batch_bytes)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return [
+                r for responses in pool.map(execute_batch, batches) for r in responses
+            ]
+
+    def _batches(self, batch_size: int, batch_bytes: int) -> List[MultiSearchBatch]:
+        """Split searches into batches of at most `batch_size` searches and `batch_bytes` bytes."""
+        if batch_size < 1:
+            raise ValueError(
+                "'batch_size' must be a positive integer, got %s" % batch_size
+            )
+        batches: List[MultiSearchBatch] = []
+        batch_searches: List[Search] = []
+        batch_lines: List[Union[Dict, SearchDict]] = []
+        size = 0
+        for s in self._searches:
+            lines = self._search_lines(s)
+            # ndjson lines, each one followed by a line return
+            search_size = sum(len(json.dumps(line)) + 1 for line in lines)
+            if batch_searches and (
+                len(batch_searches) >= batch_size or size + search_size > batch_bytes
+            ):
+                batches.append((batch_searches, batch_lines))
+                batch_searches, batch_lines, size = [], [], 0
+            batch_searches.append(s)
+            batch_lines.extend(lines)
+            size += search_size
+        if batch_searches:
+            batches.append((batch_searches, batch_lines))
+        return batches
+
+    @staticmethod
+    def _batch_responses(
+        searches: List[Search],
+        raw_data: Optional[Dict[str, Any]] = None,
+        error: Optional[TransportError] = None,
+    ) -> List[SearchResponse]:
+        """Tie each response of a multi search request to its search, or report request error on all of them."""
+        responses: List[SearchResponseDict]
+        if error is not None:
+            # connection errors have a "N/A" status
+            status = error.status_code if isinstance(error.status_code, int) else None
+            responses = [
+                {  # type: ignore
+                    "error": {"type": error.__class__.__name__, "reason": str(error)},
+                    "status": status,
+                }
+                for _ in searches
+            ]
+        else:
+            responses = raw_data["responses"]  # type: ignore
+        return [
+            SearchResponse(data=data, _search=s) for s, data in zip(searches, responses)
+        ]
 
     def __eq__(self, other: Any) -> bool:
         return (
@@ -953,3 +1691,146 @@ class MultiSearch(Request):
 
     def __repr__(self) -> str:
         return json.dumps(self.to_dict(), indent=2)
+
+
+# lengths of intervals of "date_histogram" sources, in milliseconds
+_FIXED_INTERVAL_UNITS: Dict[str, int] = {
+    "ms": 1,
+    "s": 1000,
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+}
+_CALENDAR_INTERVALS: Dict[str, int] = {
+    "minute": _FIXED_INTERVAL_UNITS["m"],
+    "1m": _FIXED_INTERVAL_UNITS["m"],
+    "hour": _FIXED_INTERVAL_UNITS["h"],
+    "1h": _FIXED_INTERVAL_UNITS["h"],
+    "day": _FIXED_INTERVAL_UNITS["d"],
+    "1d": _FIXED_INTERVAL_UNITS["d"],
+}
+
+
+# field types whose values can be split into ranges, for partitioned scan of composite "terms" sources
+_RANGE_PARTITIONED_TYPES = (
+    "long",
+    "integer",
+    "short",
+    "byte",
+    "double",
+    "float",
+    "half_float",
+    "scaled_float",
+    "unsigned_long",
+    "date",
+    "date_nanos",
+)
+
+
+def _nested_clause(clause: Dict[str, Any], nesteds: List[str]) -> Dict[str, Any]:
+    """Wrap query clause in nested clauses, nested paths being provided from deepest to highest."""
+    for nested in nesteds:
+        clause = {"nested": {"path": nested, "query": clause}}
+    return clause
+
+
+def _composite_source_interval(
+    source_type: str, source_body: Dict[str, Any]
+) -> Tuple[Optional[float], float]:
+    """
+    Return (interval, offset) of buckets keys of a composite source, interval being None for `terms` sources. Raise
+    an error for sources whose buckets keys cannot be split into ranges.
+    """
+    if source_type == "terms":
+        return None, 0
+    if source_type == "histogram":
+        return float(source_body["interval"]), float(source_body.get("offset", 0))
+    if source_type == "date_histogram":
+        if "offset" not in source_body and source_body.get("time_zone") in (
+            None,
+            "UTC",
+            "Z",
+            "+00:00",
+        ):
+            interval = (
+                source_body.get("fixed_interval")
+                or source_body.get("calendar_interval")
+                or source_body.get("interval")
+            )
+            if interval in _CALENDAR_INTERVALS:
+                return _CALENDAR_INTERVALS[interval], 0
+            match = re.match(r"^(\d+)(ms|s|m|h|d)$", str(interval))
+            if match:
+                return int(match.group(1)) * _FIXED_INTERVAL_UNITS[match.group(2)], 0
+    raise ValueError(
+        "Partitioned scan is not supported on <%s> composite source: %s"
+        % (source_type, source_body)
+    )
+
+
+def _key_in_range(
+    source_name: AggName,
+    lower: Optional[float],
+    upper: Optional[float],
+    missing: bool_ = False,
+) -> Callable[[BucketDict], bool_]:
+    def keep(bucket: BucketDict) -> bool_:
+        key = bucket["key"][source_name]  # type: ignore
+        if key is None:
+            return missing
+        return (
+            not missing
+            and (lower is None or key >= lower)
+            and (upper is None or key < upper)
+        )
+
+    return keep
+
+
+def _hashable_key(key: Any) -> Any:
+    if isinstance(key, dict):
+        return tuple(sorted(key.items()))
+    if isinstance(key, list):
+        return tuple(key)
+    return key
+
+
+def _merge_partitioned_responses(
+    responses: List[Dict[str, Any]], path: List[AggName]
+) -> Dict[str, Any]:
+    """
+    Merge responses (aggregations, or buckets) of searches partitioned on the terms aggregation located at `path`.
+    Buckets of this terms aggregation are concatenated, whereas buckets of its ancestors (identical across
+    partitions) are merged by key.
+    """
+    name, below = path[0], path[1:]
+    merged: Dict[str, Any] = dict(responses[0])
+    clauses: List[Dict[str, Any]] = [r[name] for r in responses]
+    clause: Dict[str, Any] = dict(clauses[0])
+    if not below:
+        clause["buckets"] = [b for c in clauses for b in c["buckets"]]
+        for attr in ("sum_other_doc_count", "doc_count_error_upper_bound"):
+            if attr in clause:
+                clause[attr] = sum(c.get(attr, 0) for c in clauses)
+    elif "buckets" not in clause:
+        # single bucket aggregation (filter, nested, ...)
+        clause = _merge_partitioned_responses(clauses, below)
+    elif isinstance(clause["buckets"], dict):
+        # keyed buckets
+        keys = list(dict.fromkeys(k for c in clauses for k in c["buckets"]))
+        clause["buckets"] = {
+            k: _merge_partitioned_responses(
+                [c["buckets"][k] for c in clauses if k in c["buckets"]], below
+            )
+            for k in keys
+        }
+    else:
+        grouped: Dict[Any, List[Dict[str, Any]]] = {}
+        for c in clauses:
+            for bucket in c["buckets"]:
+                grouped.setdefault(_hashable_key(bucket["key"]), []).append(bucket)
+        clause["buckets"] = [
+            _merge_partitioned_responses(buckets, below) for buckets in grouped.values()
+        ]
+    merged[name] = clause
+    return merged
@@ -0,0 +1,63 @@
+"""
+Transport serializer based on `orjson <https://github.com/ijl/orjson>`_, to plug in elasticsearch client so that search
+and bulk request bodies are serialized, and responses deserialized, faster than with standard library ``json``:
+
+>>> from elasticsearch import Elasticsearch
+>>> from pandagg.serializer import OrjsonSerializer
+>>> client = Elasticsearch(hosts=["localhost:9200"], serializer=OrjsonSerializer())
+
+Requires orjson dependency (``pip install pandagg[orjson]``).
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer
+
+__all__ = ["OrjsonSerializer"]
+
+
+def _import_orjson() -> Any:
+    try:
+        import orjson
+    except ImportError:
+        raise ImportError(
+            'Using orjson serializer requires to install orjson. Please install "orjson" or '
+            "use default serializer."
+        )
+    return orjson
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    Drop-in replacement of elasticsearch-py default ``JSONSerializer``, registered for "application/json" mimetype.
+
+    NumPy scalars and arrays (including ``datetime64``), datetimes, dates and UUIDs are serialized natively; other
+    types (``Decimal``, pandas ``Timestamp`` etc) fall back to ``JSONSerializer.default``. Unlike standard library
+    ``json``, NaN and infinite floats are serialized as null (they are not valid JSON).
+    """
+
+    def __init__(self) -> None:
+        self._orjson = _import_orjson()
+        self._options: int = (
+            self._orjson.OPT_SERIALIZE_NUMPY | self._orjson.OPT_NON_STR_KEYS
+        )
+
+    def loads(self, s: Any) -> Any:
+        try:
+            return self._orjson.loads(s)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data: Any) -> Any:
+        # don't serialize strings
+        if isinstance(data, str):
+            return data
+        try:
+            # decoded because bulk helpers measure chunks size on strings
+            return self._orjson.dumps(
+                data, default=self.default, option=self._options
+            ).decode("utf-8")
+        except (ValueError, TypeError) as e:
+            raise SerializationError(data, e)
@@ -1,3 +1,13 @@
+import copy
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from lighttree.node import NodeId
+
+# marks a tree whose serialization is not cached
+_NOT_SERIALIZED = object()
+
+
 class TreeReprMixin:
     # mixin rather than inheritance so that mypy generics can be specified in Tree subclasses
     def __str__(self) -> str:
@@ -8,3 +18,121 @@ class TreeReprMixin:
 
     def __repr__(self) -> str:
         return self.__str__()
+
+
+def _copy_structure(source: Any, target: Any, deep: bool) -> None:
+    """
+    Copy nodes and hierarchy of `source` tree into `target` tree (whose existing nodes are discarded).
+
+    Internal maps are copied directly rather than through node insertions: source nodes were already validated at
+    insertion (mappings, nested clauses etc), and are shared between both trees unless `deep` is True (trees are
+    never mutated in place, all building methods returning modified copies).
+    """
+    target.root = source.root
+    target._serialized = _NOT_SERIALIZED
+    if deep:
+        target._nodes_map = {
+            nid: copy.deepcopy(node) for nid, node in source._nodes_map.items()
+        }
+    else:
+        target._nodes_map = source._nodes_map.copy()
+    target._nodes_parent = source._nodes_parent.copy()
+    target._nodes_children_map = defaultdict(
+        dict, {nid: c.copy() for nid, c in source._nodes_children_map.items()}
+    )
+    target._nodes_children_list = defaultdict(
+        list, {nid: c[:] for nid, c in source._nodes_children_list.items()}
+    )
+    if isinstance(source, KeyIndexMixin):
+        target._key_index = {k: ids[:] for k, ids in source._key_index.items()}
+
+
+def copy_serialized(obj: Any) -> Any:
+    """Copy serialized (JSON like) object: dicts and lists are copied, other values being immutable."""
+    if isinstance(obj, dict):
+        return {k: copy_serialized(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [copy_serialized(v) for v in obj]
+    return obj
+
+
+class SerializationCacheMixin:
+    """
+    Cache whole tree serialization (`to_dict` without arguments), invalidated on any node insertion, removal or
+    replacement. Nodes themselves are never modified once inserted in a tree, since they can be shared with other
+    trees: changing a node is done by replacing it with a modified copy (see `_replace_node`). The cached
+    serialization is never exposed: `to_dict` returns copies of it, so that callers can modify them.
+    """
+
+    # mixin rather than inheritance so that mypy generics can be specified in Tree subclasses
+    _serialized: Any = _NOT_SERIALIZED
+
+    def _cached_to_dict(self) -> Any:
+        if self._serialized is _NOT_SERIALIZED:
+            self._serialized = self.to_dict(from_=self.root)  # type: ignore
+        return self._serialized
+
+    def _insert_node_below(self, *args: Any, **kwargs: Any) -> Any:
+        self._serialized = _NOT_SERIALIZED
+        return super()._insert_node_below(*args, **kwargs)  # type: ignore
+
+    def _insert_node_above(self, *args: Any, **kwargs: Any) -> Any:
+        self._serialized = _NOT_SERIALIZED
+        return super()._insert_node_above(*args, **kwargs)  # type: ignore
+
+    def _drop_node(self, *args: Any, **kwargs: Any) -> Any:
+        self._serialized = _NOT_SERIALIZED
+        return super()._drop_node(*args, **kwargs)  # type: ignore
+
+    def _replace_node(self, nid: NodeId, node: Any) -> None:
+        """Replace node of identifier `nid` by `node` (having the same identifier), keeping its position."""
+        self._serialized = _NOT_SERIALIZED
+        self._nodes_map[nid] = node  # type: ignore
+
+
+class KeyIndexMixin:
+    """
+    Maintain an index of nodes identifiers per key (for nodes below keyed parents), through all node insertions
+    and removals, so that nodes can be found by key without walking the tree.
+
+    Also reads children directly from parent/children maps: `lighttree.Tree.children` computes each child key from its
+    parent, which is quadratic in the number of children below list parents (for instance large `bool` clauses).
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        # key -> identifiers of nodes having this key, in insertion order
+        self._key_index: Dict[str, List[NodeId]] = {}
+        super().__init__(*args, **kwargs)  # type: ignore
+
+    def _insert_node_below(
+        self, node: Any, parent_id: Any, key: Any, *args: Any, **kwargs: Any
+    ) -> Any:
+        r = super()._insert_node_below(node, parent_id, key, *args, **kwargs)  # type: ignore
+        if isinstance(key, str):
+            self._key_index.setdefault(key, []).append(node.identifier)
+        return r
+
+    def _drop_node(self, nid: NodeId, *args: Any, **kwargs: Any) -> Any:
+        key, node = super()._drop_node(nid, *args, **kwargs)  # type: ignore
+        if isinstance(key, str):
+            ids = self._key_index[key]
+            ids.remove(nid)
+            if not ids:
+                del self._key_index[key]
+        return key, node
+
+    def _ids_from_key(self, key: str) -> List[NodeId]:
+        return self._key_index.get(key, [])
+
+    def children(self, nid: NodeId) -> List[Tuple[Any, Any]]:
+        self._ensure_present(nid)  # type: ignore
+        nodes_map = self._nodes_map  # type: ignore
+        if nodes_map[nid].keyed:
+            return [
+                (k, nodes_map[cid])
+                for cid, k in self._nodes_children_map[nid].items()  # type: ignore
+            ]
+        return [
+            (i, nodes_map[cid])
+            for i, cid in enumerate(self._nodes_children_list[nid])  # type: ignore
+        ]
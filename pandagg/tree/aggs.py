@@ -4,7 +4,13 @@ from typing import Optional, Union, Any, Dict, Tuple
 from lighttree import Key, Tree
 from lighttree.node import NodeId
 from pandagg.node.aggs import Composite
-from pandagg.tree._tree import TreeReprMixin
+from pandagg.tree._tree import (
+    TreeReprMixin,
+    SerializationCacheMixin,
+    KeyIndexMixin,
+    _copy_structure,
+    copy_serialized,
+)
 from pandagg.tree.mappings import _mappings, Mappings, MappingsDict
 
 from pandagg.node.aggs.abstract import (
@@ -24,7 +30,7 @@ AggsDictOrNode = Dict[AggName, Union[AggClauseDict, AggClause]]
 AggsOrDict = Union[AggsDictOrNode, "Aggs"]
 
 
-class Aggs(TreeReprMixin, Tree[AggClause]):
+class Aggs(TreeReprMixin, SerializationCacheMixin, KeyIndexMixin, Tree[AggClause]):
     """
     Combination of aggregation clauses. This class provides handful methods to build an aggregation (see
     :func:`~pandagg.tree.aggs.Aggs.aggs` and :func:`~pandagg.tree.aggs.Aggs.groupby`), and is used as well
@@ -227,8 +233,10 @@ class Aggs(TreeReprMixin, Tree[AggClause]):
         :param from_: identifier of aggregation clause, if provided, limits serialization to this clause and its
         children (used for recursion, shouldn't be useful)
         :param depth: integer, if provided, limit the serialization to a given depth
-        :return: dict
+        :return: dict, copy of cached serialization when serializing the whole tree
         """
+        if from_ is None and depth is None:
+            return copy_serialized(self._cached_to_dict())
         from_ = self.root if from_ is None else from_
         _, node = self.get(from_)
         children_queries: NamedAggsDict = {}
@@ -314,7 +322,7 @@ class Aggs(TreeReprMixin, Tree[AggClause]):
         )
 
     def __nonzero__(self) -> bool:
-        return bool(self.to_dict())
+        return bool(self._cached_to_dict())
 
     __bool__ = __nonzero__
 
@@ -370,11 +378,24 @@ class Aggs(TreeReprMixin, Tree[AggClause]):
                 name=child_name, node=child_node, insert_below_id=node.identifier
             )
 
+    def clone(
+        self,
+        with_nodes: bool = True,
+        deep: bool = False,
+        new_root: Optional[NodeId] = None,
+    ) -> "Aggs":
+        if not with_nodes or new_root is not None:
+            return super(Aggs, self).clone(
+                with_nodes=with_nodes, deep=deep, new_root=new_root
+            )
+        a = self._clone_init(deep=deep, with_nodes=with_nodes)
+        _copy_structure(self, a, deep=deep)
+        return a
+
     def _clone_init(self, deep: bool, with_nodes: bool) -> "Aggs":
+        # mappings are never modified, hence shared rather than copied
         return Aggs(
-            mappings=self.mappings.clone(deep=deep)
-            if self.mappings is not None
-            else None,
+            mappings=self.mappings,
             nested_autocorrect=self.nested_autocorrect,
             _groupby_ptr=self._groupby_ptr if with_nodes else None,
         )
@@ -560,6 +581,12 @@ class Aggs(TreeReprMixin, Tree[AggClause]):
         possible that multiple clauses share the same name (not recommended, but allowed), some pandagg features are
         ambiguous and not recommended in such context.
         """
+        ids = self._ids_from_key(key)
+        if not ids:
+            raise KeyError('No node found with key "%s"' % key)
+        if len(ids) == 1:
+            return ids[0]
+        # several clauses share this name: first one in tree order
         for k, n in self.list():
             if k == key:
                 return n.identifier
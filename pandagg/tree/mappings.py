@@ -1,7 +1,21 @@
 from __future__ import annotations
 
+import dataclasses
+from types import MappingProxyType
 from typing_extensions import TypedDict
-from typing import Optional, Union, Any, List, Dict, TYPE_CHECKING
+from typing import (
+    Optional,
+    Union,
+    Any,
+    List,
+    Dict,
+    Mapping,
+    Tuple,
+    Callable,
+    Iterable,
+    NamedTuple,
+    TYPE_CHECKING,
+)
 
 from lighttree.node import NodeId
 from lighttree import Tree
@@ -15,9 +29,11 @@ from pandagg.exceptions import (
     InvalidOperationMappingFieldError,
 )
 from pandagg.tree._tree import TreeReprMixin
+from pandagg._arrow import arrow_schema
 from pandagg.types import DocSource, MappingsDict, FieldName, FieldClauseDict
 
 if TYPE_CHECKING:
+    import pyarrow as pa
     from pandagg.document import DocumentSource
 
 FieldPropertiesDictOrNode = Dict[FieldName, Union[FieldClauseDict, Field]]
@@ -40,7 +56,53 @@ def _mappings(
     raise TypeError("Unsupported %s type for Mappings" % type(m))
 
 
+@dataclasses.dataclass(frozen=True)
+class FieldEntry:
+    """
+    Precomputed information about a mappings field.
+
+    :param nid: field node identifier
+    :param type: field type, for instance "keyword"
+    :param nesteds: paths of nested fields applying at this field, from deepest to highest (including field itself
+    if it is nested)
+    :param subfield: whether field is a multi-field, declared in `fields` parameter of its parent field
+    """
+
+    nid: NodeId
+    type: str
+    nesteds: Tuple[str, ...]
+    subfield: bool
+
+
+class FieldValidation(NamedTuple):
+    """
+    Step of a compiled document validation plan, checking a field value (named tuple so that it is unpacked at once
+    when validating documents).
+
+    :param name: field name in its parent document
+    :param path: field dotted path, used in error messages
+    :param check_value: value check, None if field accepts any value
+    :param children: validation plan of children fields, for object and nested fields
+    """
+
+    name: str
+    path: str
+    required: bool
+    multiple: Optional[bool]
+    type: str
+    check_value: Optional[Callable[[Any], bool]]
+    children: Optional[Tuple["FieldValidation", ...]]
+
+
+ValidationPlan = Tuple[FieldValidation, ...]
+
+
 class Mappings(TreeReprMixin, Tree[Field]):
+    # lazily computed field path -> FieldEntry table, reset on mappings modification
+    _fields: Optional[Mapping[str, FieldEntry]] = None
+    # lazily compiled documents validation plan, reset on mappings modification
+    _validation_plan: Optional[ValidationPlan] = None
+
     def __init__(
         self,
         properties: Optional[FieldPropertiesDictOrNode] = None,
@@ -57,6 +119,49 @@ class Mappings(TreeReprMixin, Tree[Field]):
                 pid=root_node.identifier, properties=properties, is_subfield=False
             )
 
+    def _insert_node_below(self, *args: Any, **kwargs: Any) -> None:
+        self._fields = None
+        self._validation_plan = None
+        super(Mappings, self)._insert_node_below(*args, **kwargs)
+
+    def _drop_node(self, *args: Any, **kwargs: Any) -> Any:
+        self._fields = None
+        self._validation_plan = None
+        return super(Mappings, self)._drop_node(*args, **kwargs)
+
+    @property
+    def fields_table(self) -> Mapping[str, FieldEntry]:
+        """
+        Read-only table of all fields (including subfields) by dotted path, computed once in a single walk of
+        the mappings, so that field lookups don't require to walk the tree.
+        """
+        if self._fields is None:
+            fields: Dict[str, FieldEntry] = {}
+            self._fill_fields_table(fields, self.root, "", ())
+            self._fields = MappingProxyType(fields)
+        return self._fields
+
+    def _fill_fields_table(
+        self,
+        fields: Dict[str, FieldEntry],
+        pid: NodeId,
+        path: str,
+        nesteds: Tuple[str, ...],
+    ) -> None:
+        field_name: str
+        for field_name, field in self.children(pid):  # type: ignore
+            field_path = "%s.%s" % (path, field_name) if path else field_name
+            field_nesteds = (
+                (field_path,) + nesteds if isinstance(field, Nested) else nesteds
+            )
+            fields[field_path] = FieldEntry(
+                nid=field.identifier,
+                type=field.KEY,
+                nesteds=field_nesteds,
+                subfield=field._subfield,
+            )
+            self._fill_fields_table(fields, field.identifier, field_path, field_nesteds)
+
     def to_dict(
         self, from_: Optional[NodeId] = None, depth: Optional[int] = None
     ) -> MappingsDict:
@@ -88,6 +193,19 @@ class Mappings(TreeReprMixin, Tree[Field]):
                 serialized_node["fields"] = children_queries
         return serialized_node
 
+    def to_arrow_schema(self) -> pa.Schema:
+        """
+        Return arrow schema of documents complying with these mappings (requires pyarrow dependency):
+
+        - keyword fields are dictionary encoded strings
+        - numeric and boolean fields are their arrow equivalent
+        - date fields are UTC timestamps (their mappings `format` being kept in field metadata)
+        - object fields are structs, nested fields lists of structs
+        - fields declared as `multiple` are lists
+        - other fields are strings
+        """
+        return arrow_schema(self)
+
     def validate_agg_clause(self, agg_clause: AggClause, exc: bool = True) -> bool:
         """
         Ensure that if aggregation clause relates to a field (`field` or `path`) this field exists in mappings, and that
@@ -102,12 +220,8 @@ class Mappings(TreeReprMixin, Tree[Field]):
             if agg_path is None:
                 # reverse nested
                 return True
-            try:
-                # nested
-                self.get_node_id_by_path(agg_path.split("."))
-                return True
-            except Exception:
-                return False
+            # nested
+            return agg_path in self.fields_table
 
         if not hasattr(agg_clause, "field"):
             return True
@@ -115,16 +229,13 @@ class Mappings(TreeReprMixin, Tree[Field]):
         agg_field: str = agg_clause.field  # type: ignore
 
         # TODO take into account flattened data type
-        try:
-            nid = self.get_node_id_by_path(agg_field.split("."))
-        except Exception:
+        entry = self.fields_table.get(agg_field)
+        if entry is None:
             raise AbsentMappingFieldError(
                 u"Agg of type <%s> on non-existing field <%s>."
                 % (agg_clause.KEY, agg_field)
             )
-        _, field_node = self.get(nid)
-
-        field_type = field_node.KEY
+        field_type = entry.type
         if not agg_clause.valid_on_field_type(field_type):
             if not exc:
                 return False
@@ -152,14 +263,12 @@ class Mappings(TreeReprMixin, Tree[Field]):
         >>> mappings.mapping_type_of_field('comments.comment_text')
         'text'
         """
-        try:
-            nid = self.get_node_id_by_path(field_path.split("."))
-        except ValueError:
+        entry = self.fields_table.get(field_path)
+        if entry is None:
             raise AbsentMappingFieldError(
                 u"<%s field is not present in mappings>" % field_path
             )
-        _, node = self.get(nid)
-        return node.KEY
+        return entry.type
 
     def nested_at_field(self, field_path: str) -> Optional[str]:
         """
@@ -179,7 +288,7 @@ class Mappings(TreeReprMixin, Tree[Field]):
         >>> mappings.nested_at_field('comments.comment_text')
         'comments'
         """
-        nesteds = self.list_nesteds_at_field(field_path)
+        nesteds = self._field_entry(field_path).nesteds
         if nesteds:
             return nesteds[0]
         return None
@@ -202,14 +311,14 @@ class Mappings(TreeReprMixin, Tree[Field]):
         >>> mappings.list_nesteds_at_field('comments.comment_text')
         ['comments']
         """
-        path_nid = self.get_node_id_by_path(field_path.split("."))
         # from deepest to highest
-        return [
-            # all path items are strings
-            ".".join(self.get_path(nid))  # type: ignore
-            for nid in self.ancestors_ids(path_nid, include_current=True)
-            if self.get(nid)[1].KEY == "nested"
-        ]
+        return list(self._field_entry(field_path).nesteds)
+
+    def _field_entry(self, field_path: str) -> FieldEntry:
+        try:
+            return self.fields_table[field_path]
+        except KeyError:
+            raise ValueError("No field at path %s" % field_path)
 
     def _insert(
         self, pid: NodeId, properties: FieldPropertiesDictOrNode, is_subfield: bool
@@ -249,55 +358,112 @@ class Mappings(TreeReprMixin, Tree[Field]):
                     )
                 self._insert(field.identifier, field.fields, True)
 
+    @property
+    def validation_plan(self) -> ValidationPlan:
+        """
+        Documents validation plan, compiled once in a single walk of the mappings: documents are then validated
+        without mappings tree lookups.
+        """
+        if self._validation_plan is None:
+            self._validation_plan = self._compile_validation_plan(self.root, "")
+        return self._validation_plan
+
+    def _compile_validation_plan(self, pid: NodeId, path: str) -> ValidationPlan:
+        plan: List[FieldValidation] = []
+        field_name: str
+        for field_name, field in self.children(pid):  # type: ignore
+            full_path = ".".join([path, field_name]) if path else field_name
+            check_value: Optional[Callable[[Any], bool]] = field.is_valid_value
+            if type(field).is_valid_value is RegularField.is_valid_value:
+                # accepts any value
+                check_value = None
+            plan.append(
+                FieldValidation(
+                    name=field_name,
+                    path=full_path,
+                    required=bool(field._required),
+                    multiple=field._multiple,
+                    type=field.KEY,
+                    check_value=check_value,
+                    children=self._compile_validation_plan(field.identifier, full_path)
+                    if isinstance(field, (Object, Nested))
+                    else None,
+                )
+            )
+        return tuple(plan)
+
     def validate_document(self, d: Union[DocSource, DocumentSource]) -> None:
+        """
+        Validate document against mappings, raise ValueError on first encountered error.
+        """
         # if Document
         if not isinstance(d, dict) and hasattr(d, "_to_dict_"):
             d = d._to_dict_()
-        self._validate_document(d, pid=self.root)
-
-    def _validate_document(self, d: Any, pid: NodeId, path: str = "") -> None:
-        if d is None:
-            d = {}
-        if not isinstance(d, dict):
-            raise ValueError(
-                "Invalid document type, expected dict, got <%s> at '%s'"
-                % (type(d), path)
-            )
-        field_name: str
-        for field_name, field in self.children(pid):  # type: ignore
-            full_path = ".".join([path, field_name]) if path else field_name
-            field_value = d.get(field_name)
-            if field._required and not field_value:
-                raise ValueError("Field <%s> is required" % full_path)
+        _validate_document(self.validation_plan, d, "")
 
-            if field._multiple is True:
-                if field_value is not None:
-                    if not isinstance(field_value, list):
-                        raise ValueError("Field <%s> should be a array" % full_path)
-                    field_value_list = field_value
-                else:
-                    field_value_list = []
-                if field._required and not any(field_value_list):
-                    # deal with case: [None]
-                    raise ValueError("Field <%s> is required" % full_path)
-            elif field._multiple is False:
-                if isinstance(field_value, list):
-                    raise ValueError("Field <%s> should not be an array" % full_path)
-                field_value_list = [field_value] if field_value else []
+    def validate_many(
+        self, docs: Iterable[Union[DocSource, DocumentSource]]
+    ) -> Dict[int, str]:
+        """
+        Validate documents against mappings, and return error messages of invalid documents by their position in
+        `docs` (empty dict if all documents are valid).
+        """
+        plan = self.validation_plan
+        errors: Dict[int, str] = {}
+        for i, d in enumerate(docs):
+            if not isinstance(d, dict) and hasattr(d, "_to_dict_"):
+                d = d._to_dict_()
+            try:
+                _validate_document(plan, d, "")
+            except ValueError as e:
+                errors[i] = e.args[0]
+        return errors
+
+
+def _validate_document(plan: ValidationPlan, d: Any, path: str) -> None:
+    if d is None:
+        d = {}
+    if not isinstance(d, dict):
+        raise ValueError(
+            "Invalid document type, expected dict, got <%s> at '%s'" % (type(d), path)
+        )
+    for name, full_path, required, multiple, type_, check_value, children in plan:
+        field_value = d.get(name)
+        if required and not field_value:
+            raise ValueError("Field <%s> is required" % full_path)
+        if field_value is None and children is None:
+            # nothing else to check
+            continue
+
+        if multiple is True:
+            if field_value is not None:
+                if not isinstance(field_value, list):
+                    raise ValueError("Field <%s> should be a array" % full_path)
+                field_value_list = field_value
             else:
-                # field._multiple is None -> no restriction
-                if isinstance(field_value, list):
-                    field_value_list = field_value
-                else:
-                    field_value_list = [field_value]
-
-            for value in field_value_list:
-                # nullable check has been done beforehands
-                if value:
-                    if not field.is_valid_value(value):
-                        raise ValueError(
-                            "Field <%s> value <%s> is not compatible with field of type %s"
-                            % (full_path, value, field.KEY)
-                        )
-                if isinstance(field, (Object, Nested)):
-                    self._validate_document(value, field.identifier, path=full_path)
+                field_value_list = []
+            if required and not any(field_value_list):
+                # deal with case: [None]
+                raise ValueError("Field <%s> is required" % full_path)
+        elif multiple is False:
+            if isinstance(field_value, list):
+                raise ValueError("Field <%s> should not be an array" % full_path)
+            field_value_list = [field_value] if field_value else []
+        else:
+            # multiple is None -> no restriction
+            if isinstance(field_value, list):
+                field_value_list = field_value
+            else:
+                field_value_list = [field_value]
+
+        if check_value is None and children is None:
+            continue
+        for value in field_value_list:
+            # nullable check has been done beforehands
+            if value and check_value is not None and not check_value(value):
+                raise ValueError(
+                    "Field <%s> value <%s> is not compatible with field of type %s"
+                    % (full_path, value, type_)
+                )
+            if children is not None:
+                _validate_document(children, value, full_path)
@@ -1,3 +1,4 @@
+import copy
 import json
 from typing import Optional, Union, Any, List, Dict
 from typing_extensions import Literal
@@ -17,6 +18,12 @@ from pandagg.node.query.abstract import (
 from pandagg.node.query.compound import CompoundClause, Bool
 from pandagg.node.query.joining import Nested
 
+from pandagg.tree._tree import (
+    SerializationCacheMixin,
+    KeyIndexMixin,
+    _copy_structure,
+    copy_serialized,
+)
 from pandagg.tree.mappings import _mappings, MappingsDict, Mappings
 from pandagg.types import QueryName, ClauseBody
 
@@ -55,7 +62,7 @@ sub_insertion = Substitution(
 TypeOrQuery = Union[QueryType, QueryClauseDict, QueryClause, "Query"]
 
 
-class Query(Tree[QueryClause]):
+class Query(SerializationCacheMixin, KeyIndexMixin, Tree[QueryClause]):
     def __init__(
         self,
         q: Optional[TypeOrQuery] = None,
@@ -404,9 +411,13 @@ class Query(Tree[QueryClause]):
         return None
 
     def to_dict(self, from_: Optional[NodeId] = None) -> Optional[QueryClauseDict]:
+        """
+        Serialize Query as dict. Serialization of whole query is cached (a copy of it being returned).
+        """
         if self.root is None:
             return None
-        from_ = self.root if from_ is None else from_
+        if from_ is None:
+            return copy_serialized(self._cached_to_dict())
         key, node = self.get(from_)
         if isinstance(node, LeafQueryClause):
             return node.to_dict()
@@ -459,17 +470,27 @@ class Query(Tree[QueryClause]):
         return q
 
     def __nonzero__(self) -> bool_:
-        return bool(self.to_dict())
+        return bool(self._cached_to_dict())
 
     __bool__ = __nonzero__
 
+    def clone(
+        self,
+        with_nodes: bool_ = True,
+        deep: bool_ = False,
+        new_root: Optional[NodeId] = None,
+    ) -> "Query":
+        if not with_nodes or new_root is not None:
+            return super(Query, self).clone(
+                with_nodes=with_nodes, deep=deep, new_root=new_root
+            )
+        q = self._clone_init(deep=deep, with_nodes=with_nodes)
+        _copy_structure(self, q, deep=deep)
+        return q
+
     def _clone_init(self, deep: bool_, with_nodes: bool_) -> "Query":
-        return Query(
-            mappings=None
-            if self.mappings is None
-            else self.mappings.clone(with_nodes=True, deep=deep),
-            nested_autocorrect=self.nested_autocorrect,
-        )
+        # mappings are never modified, hence shared rather than copied
+        return Query(mappings=self.mappings, nested_autocorrect=self.nested_autocorrect)
 
     def _has_bool_root(self) -> bool_:
         if not self.root:
@@ -545,11 +566,12 @@ class Query(Tree[QueryClause]):
                 pid = None if on == self.root else self.parent_id(on)
                 existing_k, _ = self.drop_subtree(on)
                 self._insert_query(node, insert_below=pid)
-                existing.body = node.body
                 return
 
-            # merge
-            existing.body.update(node.body)
+            # merge: existing node can be shared with other trees (clones), it is replaced by a merged copy
+            merged = copy.copy(existing)
+            merged.body = dict(existing.body, **node.body)
+            self._replace_node(on, merged)
             for param_key, children in node._children.items():
                 if not children:
                     continue
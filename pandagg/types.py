@@ -1,5 +1,5 @@
 from typing_extensions import TypedDict, Literal
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Union, Tuple
 
 ClauseName = str
 ClauseType = str
@@ -121,6 +121,7 @@ SearchDict = TypedDict(
         "stats": List[str],
         "terminate_after": int,
         "timeout": Any,
+        "track_total_hits": Union[bool, int],
         "version": bool,
     },
     total=False,
@@ -147,6 +148,7 @@ class HitDict(TypedDict, total=False):
     _score: float
     fields: Dict[str, List[Any]]
     highlight: Dict[str, List[str]]
+    sort: List[Any]
 
 
 Relation = Literal["eq", "gte"]
@@ -187,6 +189,10 @@ class SuggestedItemDict(TypedDict, total=False):
     options: List[Dict[str, Any]]
 
 
+# way a search response is read: hits, or aggregations as tabular, dataframe or normalized
+ResponseOutput = Literal["hits", "tabular", "dataframe", "normalized"]
+
+
 class SearchResponseDict(TypedDict, total=False):
     _scroll_id: str
     _shards: ShardsDict
@@ -234,3 +240,10 @@ class Action(TypedDict, total=False):
     doc: DocSource
     require_alias: bool
     dynamic_templates: Dict
+
+
+# (success, {op_type: bulk response item}) per action
+ActionResult = Tuple[bool, Dict[str, Any]]
+
+# action line and source line (None for deletions) of a bulk operation, already serialized
+SerializedAction = Tuple[str, Optional[str]]
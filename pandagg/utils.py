@@ -3,7 +3,9 @@ from __future__ import annotations
 
 from typing import Dict, Tuple, Any, Union, Callable, Optional, TYPE_CHECKING
 
-from pandagg.types import DocSource, Action, IndexName, OpType
+from elasticsearch import helpers
+
+from pandagg.types import DocSource, Action, IndexName, OpType, SerializedAction
 
 if TYPE_CHECKING:
     from pandagg.document import DocumentSource
@@ -134,6 +136,16 @@ def get_action_modifier(
     return _action_modifier
 
 
+def expand_action(action: Union[Action, SerializedAction]) -> Tuple[Any, Any]:
+    """
+    Return action line and source line of a bulk operation, like ``elasticsearch.helpers.expand_action``, operations
+    already serialized being passed as is.
+    """
+    if isinstance(action, tuple):
+        return action
+    return helpers.expand_action(action)
+
+
 def is_subset(subset: Any, superset: Any) -> bool:
     if isinstance(subset, dict):
         return all(
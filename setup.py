@@ -25,6 +25,9 @@ develop_requires = [
     "mock",
     "mypy",
     "pandas",
+    "pyarrow",
+    "orjson",
+    "aiohttp",
     "Sphinx",
     "twine",
 ]
@@ -44,7 +47,12 @@ setup(
     test_suite="pandagg.tests",
     zip_safe=False,
     install_requires=install_requires,
-    extras_require={"develop": develop_requires},
+    extras_require={
+        "develop": develop_requires,
+        "async": ["elasticsearch[async]>=7.8.0,<8.0.0"],
+        "arrow": ["pyarrow"],
+        "orjson": ["orjson"],
+    },
     tests_require=develop_requires,
     license="Apache-2.0",
 )
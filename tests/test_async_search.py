@@ -0,0 +1,282 @@
+import asyncio
+
+import pytest
+from mock import AsyncMock, Mock, patch
+
+from elasticsearch import ConnectionError
+
+from pandagg import AsyncSearch, AsyncMultiSearch
+from pandagg.response import SearchResponse, Hit
+from pandagg.search import Search
+
+
+def test_async_search_building_keeps_class():
+    s = (
+        AsyncSearch()
+        .filter("term", some_field=1)
+        .groupby("per_user", "terms", field="user")
+    )
+    assert isinstance(s, AsyncSearch)
+    assert s.to_dict() == {
+        "aggs": {"per_user": {"terms": {"field": "user"}}},
+        "query": {"bool": {"filter": [{"term": {"some_field": {"value": 1}}}]}},
+    }
+    # "search" dsl type still refers to synchronous search
+    assert Search.get_dsl_type("search") is Search
+
+
+def test_async_search_execute(dummy_response):
+    client = Mock()
+    client.search = AsyncMock(return_value=dummy_response)
+
+    s = AsyncSearch(using=client, index="test-index").filter("term", lang="python")
+    r = asyncio.run(s.execute())
+    assert isinstance(r, SearchResponse)
+    assert len(r.hits) == 4
+    client.search.assert_awaited_once_with(
+        index=["test-index"],
+        body={"query": {"bool": {"filter": [{"term": {"lang": {"value": "python"}}}]}}},
+    )
+
+    async def collect():
+        return [h async for h in s]
+
+    hits = asyncio.run(collect())
+    assert all(isinstance(h, Hit) for h in hits)
+    assert [h._id for h in hits] == ["elasticsearch", "42", "47", "53"]
+
+
+def test_async_search_count():
+    client = Mock()
+    client.count = AsyncMock(return_value={"count": 12})
+    s = AsyncSearch(using=client, index="test-index").size(3)
+    assert asyncio.run(s.count()) == 12
+    client.count.assert_awaited_once_with(index=["test-index"], body={})
+
+
+def test_async_search_scan_composite_agg():
+    pages = [
+        {
+            "aggregations": {
+                "per_user": {
+                    "after_key": {"per_user": "b"},
+                    "buckets": [
+                        {"key": {"per_user": "a"}, "doc_count": 1},
+                        {"key": {"per_user": "b"}, "doc_count": 2},
+                    ],
+                }
+            }
+        },
+        {
+            "aggregations": {
+                "per_user": {
+                    "after_key": {"per_user": "c"},
+                    "buckets": [{"key": {"per_user": "c"}, "doc_count": 3}],
+                }
+            }
+        },
+    ]
+    client = Mock()
+    client.search = AsyncMock(side_effect=pages)
+    s = AsyncSearch(using=client).groupby("per_user", "terms", field="user")
+
+    async def collect():
+        return [b async for b in s.scan_composite_agg(size=2)]
+
+    assert asyncio.run(collect()) == [
+        {"key": {"per_user": "a"}, "doc_count": 1},
+        {"key": {"per_user": "b"}, "doc_count": 2},
+        {"key": {"per_user": "c"}, "doc_count": 3},
+    ]
+    assert client.search.await_count == 2
+    assert client.search.await_args_list[1][1]["body"]["aggs"]["per_user"]["composite"][
+        "after"
+    ] == {"per_user": "b"}
+
+    # prefetched and partitioned scans are only supported synchronously
+    with pytest.raises(TypeError):
+        s.scan_composite_agg(size=2, partitions=2)
+    with pytest.raises(NotImplementedError):
+        s._composite_partitions(2)
+
+
+def test_async_multisearch_execute():
+    client = Mock()
+    client.msearch = AsyncMock(return_value={"responses": []})
+    ms = (
+        AsyncMultiSearch(using=client, index="test-index")
+        .add(AsyncSearch().filter("term", lang="python"))
+        .add(AsyncSearch(index="other").size(0))
+    )
+    assert isinstance(ms, AsyncMultiSearch)
+    assert asyncio.run(ms.execute()) == {"responses": []}
+    client.msearch.assert_awaited_once_with(
+        index=["test-index"],
+        body=[
+            {},
+            {"query": {"bool": {"filter": [{"term": {"lang": {"value": "python"}}}]}}},
+            {"index": ["other"], "size": 0},
+            {"size": 0},
+        ],
+    )
+
+
+def test_async_search_iterate_pit():
+    client = Mock()
+    client.open_point_in_time = AsyncMock(return_value={"id": "pit-1"})
+    client.close_point_in_time = AsyncMock()
+    client.search = AsyncMock(
+        side_effect=[
+            {"hits": {"hits": [{"_id": "1", "sort": [1]}, {"_id": "2", "sort": [2]}]}},
+            {"hits": {"hits": []}},
+        ]
+    )
+    s = AsyncSearch(using=client, index="test-index")
+
+    async def collect():
+        return [h._id async for h in s.iterate_pit(page_size=2)]
+
+    assert asyncio.run(collect()) == ["1", "2"]
+    assert client.search.await_args_list[1][1]["body"]["search_after"] == [2]
+    assert client.search.await_args_list[1][1]["body"]["track_total_hits"] is False
+    client.close_point_in_time.assert_awaited_once_with(body={"id": "pit-1"})
+
+
+def test_async_multisearch_execute_batched():
+    client = Mock()
+    client.msearch = AsyncMock(
+        side_effect=[
+            {"responses": [{"hits": {"hits": []}}, {"error": {"type": "x"}}]},
+            ConnectionError("N/A", "boom", None),
+        ]
+    )
+    searches = [AsyncSearch().size(i) for i in range(3)]
+    ms = AsyncMultiSearch(using=client).add(*searches)
+    responses = asyncio.run(ms.execute_batched(batch_size=2, concurrency=1))
+    assert [r._search for r in responses] == searches
+    assert [r.error for r in responses] == [
+        None,
+        {"type": "x"},
+        {
+            "type": "ConnectionError",
+            "reason": "ConnectionError(boom) caused by: NoneType(None)",
+        },
+    ]
+    # connection errors have no status
+    assert responses[2].status is None
+
+    # other errors are raised
+    client.msearch = AsyncMock(side_effect=ValueError("boom"))
+    with pytest.raises(ValueError):
+        asyncio.run(ms.execute_batched())
+
+
+def test_async_scan_terms_partitions():
+    def search(index, body):
+        include = body["aggs"]["per_user"]["terms"]["include"]
+        users = ["alice", "bob"] if include["partition"] == 0 else ["carol"]
+        return {
+            "aggregations": {
+                "per_user": {
+                    "buckets": [{"key": u, "doc_count": 1} for u in users],
+                }
+            }
+        }
+
+    client = Mock()
+    client.search = AsyncMock(side_effect=search)
+    s = AsyncSearch(using=client).groupby("per_user", "terms", field="user")
+    aggregations = asyncio.run(
+        s.scan_terms_partitions("per_user", num_partitions=2, concurrency=1)
+    )
+    assert client.search.await_count == 2
+    assert [b["key"] for b in aggregations.data["per_user"]["buckets"]] == [
+        "alice",
+        "bob",
+        "carol",
+    ]
+
+
+def _async_scan(hits):
+    async def scan(client, query, index):
+        for hit in hits:
+            yield hit
+
+    return scan
+
+
+def test_async_scan_dataframes():
+    hits = [
+        {"_id": str(i), "_index": "test", "_source": {"user": "u%d" % (i % 2)}}
+        for i in range(5)
+    ]
+    s = AsyncSearch(using=Mock(), index="test")
+
+    async def collect(**kwargs):
+        return [df async for df in s.scan_dataframes(**kwargs)]
+
+    with patch("elasticsearch.helpers.async_scan", _async_scan(hits)):
+        dfs = asyncio.run(collect(chunk_size=2))
+    assert [list(df.index) for df in dfs] == [["0", "1"], ["2", "3"], ["4"]]
+    assert list(dfs[0]["user"]) == ["u0", "u1"]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect(chunk_size=0))
+
+
+def test_async_scan_composite_dataframes():
+    client = Mock()
+    client.search = AsyncMock(
+        side_effect=[
+            {
+                "aggregations": {
+                    "per_user": {
+                        "after_key": {"per_user": "b"},
+                        "buckets": [
+                            {"key": {"per_user": "a"}, "doc_count": 1},
+                            {"key": {"per_user": "b"}, "doc_count": 2},
+                        ],
+                    }
+                }
+            },
+            {"aggregations": {"per_user": {"buckets": []}}},
+        ]
+    )
+    s = AsyncSearch(using=client).groupby("per_user", "terms", field="user")
+
+    async def collect():
+        return [df async for df in s.scan_composite_dataframes(size=2)]
+
+    dfs = asyncio.run(collect())
+    assert client.search.await_count == 2
+    assert len(dfs) == 1
+    assert list(dfs[0].index.get_level_values("per_user")) == ["a", "b"]
+    assert list(dfs[0]["doc_count"]) == [1, 2]
+
+
+def test_async_scan_arrow():
+    import pyarrow as pa
+
+    hits = [
+        {"_id": "1", "_source": {"user": "a"}},
+        {"_id": "2", "_source": {"user": ["b", "c"]}},
+        {"_id": "3", "_source": {"user": "d"}},
+    ]
+    s = AsyncSearch(
+        using=Mock(), mappings={"properties": {"user": {"type": "keyword"}}}
+    )
+
+    async def collect(**kwargs):
+        return [batch async for batch in s.scan_arrow(**kwargs)]
+
+    with patch("elasticsearch.helpers.async_scan", _async_scan(hits)):
+        batches = asyncio.run(collect(batch_size=2))
+    assert [b.num_rows for b in batches] == [2, 1]
+    assert batches[0].schema.field("user").type == pa.list_(
+        pa.dictionary(pa.int32(), pa.string())
+    )
+    assert batches[1].schema == batches[0].schema
+    assert batches[1].column(1).to_pylist() == [["d"]]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect(batch_size=0))
@@ -0,0 +1,203 @@
+import json
+import threading
+
+import pytest
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.exceptions import TransportError
+from mock import patch
+
+from pandagg.bulk import AdaptiveBulkController
+from tests.test_index import Post
+
+
+def test_controller_decisions():
+    controller = AdaptiveBulkController(
+        target_latency=1.0,
+        chunk_size=100,
+        min_chunk_size=10,
+        max_chunk_size=400,
+        chunk_bytes=1000,
+        min_chunk_bytes=100,
+        max_chunk_bytes=4000,
+        concurrency=1,
+        max_concurrency=3,
+    )
+    clock = [0.0]
+    with patch("pandagg.bulk.time.monotonic", side_effect=lambda: clock[0]):
+        # faster than target: batches grow, at most doubled
+        decision = controller.observe(100, 1000, latency=0.1, took=80, rejected=0)
+        assert decision.decision == "grow"
+        assert (controller.chunk_size, controller.chunk_bytes) == (200, 2000)
+        assert controller.concurrency == 1
+        # once at maximum size, concurrency grows, at most once per period per concurrent request
+        controller.observe(200, 2000, latency=0.5, took=400, rejected=0)
+        assert (controller.chunk_size, controller.chunk_bytes) == (400, 4000)
+        assert controller.concurrency == 2
+        controller.observe(400, 4000, latency=0.5, took=400, rejected=0)
+        assert controller.concurrency == 2
+        clock[0] = 2.0
+        controller.observe(400, 4000, latency=0.5, took=400, rejected=0)
+        assert controller.concurrency == 3
+
+        # within tolerance
+        assert controller.observe(400, 4000, 1.1, 1000, 0).decision == "hold"
+        assert (controller.chunk_size, controller.concurrency) == (400, 3)
+
+        # slower than target: batches shrink proportionally (at most halved), concurrency decreases if cluster
+        # itself is slower than target
+        decision = controller.observe(400, 4000, latency=1.6, took=200, rejected=0)
+        assert decision.decision == "shrink"
+        assert (controller.chunk_size, controller.chunk_bytes) == (250, 2500)
+        assert controller.concurrency == 3
+        clock[0] = 3.0
+        controller.observe(250, 2500, latency=4.0, took=3900, rejected=0)
+        assert (controller.chunk_size, controller.concurrency) == (125, 2)
+
+        # rejections: decrease at most once per period
+        decision = controller.observe(125, 1250, latency=0.2, took=100, rejected=3)
+        assert decision.decision == "backoff"
+        assert (controller.chunk_size, controller.concurrency) == (125, 2)
+        clock[0] = 4.0
+        decision = controller.observe(125, 1250, latency=0.2, took=100, rejected=3)
+        assert (decision.chunk_size, decision.chunk_bytes, decision.concurrency) == (
+            62,
+            625,
+            1,
+        )
+
+        # smaller requests don't make batches grow
+        controller.observe(5, 50, latency=0.5, took=5, rejected=0)
+        assert controller.chunk_size == 62
+        controller.observe(62, 625, latency=0.1, took=50, rejected=0)
+        assert (controller.chunk_size, controller.chunk_bytes) == (124, 1250)
+
+        # no concurrency increase shortly after rejections
+        controller.observe(124, 1250, latency=1.0, took=900, rejected=0)
+        assert controller.concurrency == 1
+        clock[0] = 5.5
+        controller.observe(124, 1250, latency=1.0, took=900, rejected=0)
+        assert controller.concurrency == 2
+
+        for i in range(5):
+            clock[0] = 10.0 + i
+            controller.observe(10, 100, latency=0.2, took=100, rejected=1)
+        # bounds
+        assert (controller.chunk_size, controller.chunk_bytes) == (10, 100)
+        assert controller.concurrency == 1
+
+    metrics = controller.metrics
+    assert metrics.requests == 18
+    assert metrics.rejected == 11
+    assert len(metrics.decisions) == 18
+    assert metrics.decisions[-1].decision == "backoff"
+    assert metrics.rejection_rate == 11 / metrics.operations
+    controller.reset_metrics()
+    assert controller.metrics.requests == 0
+    assert controller.metrics.mean_latency is None
+
+    with pytest.raises(ValueError):
+        AdaptiveBulkController(chunk_size=10, max_chunk_size=5)
+    with pytest.raises(ValueError):
+        AdaptiveBulkController(concurrency=5, max_concurrency=4)
+
+
+def _bulk(rejected_once=(), reject_request_once=False):
+    lock = threading.Lock()
+    rejected = set()
+    sizes = []
+
+    def bulk(*args, body, **kwargs):
+        lines = [json.loads(line) for line in body.splitlines()]
+        with lock:
+            sizes.append(len(lines) // 2)
+            if reject_request_once and "request" not in rejected:
+                rejected.add("request")
+                raise TransportError(429, "es_rejected_execution_exception", {})
+        items = []
+        for action in lines[::2]:
+            _id = action["index"]["_id"]
+            with lock:
+                status = 201
+                if _id in rejected_once and _id not in rejected:
+                    rejected.add(_id)
+                    status = 429
+            items.append({"index": {"_id": _id, "status": status}})
+        return {"took": 5, "errors": False, "items": items}
+
+    return bulk, sizes
+
+
+def test_adaptive_perform():
+    index = Post(client=Elasticsearch())
+    docs = [
+        {"_id": str(i), "_source": {"title": "post %d" % i}, "_op_type": "index"}
+        for i in range(300)
+    ]
+    controller = AdaptiveBulkController(
+        target_latency=10.0,
+        chunk_size=10,
+        min_chunk_size=10,
+        max_chunk_size=80,
+        max_concurrency=2,
+    )
+    bulk, sizes = _bulk(rejected_once={"100", "250"})
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        results = list(
+            index.docs.bulk(docs).streaming_perform(
+                adaptive=controller, max_retries=2, backoff=0
+            )
+        )
+    assert sorted(item["index"]["_id"] for _, item in results) == sorted(
+        str(i) for i in range(300)
+    )
+    assert all(ok for ok, _ in results)
+    # fast requests: batches grow up to their maximum, and shrink on rejections
+    assert sizes[:3] == [10, 20, 40]
+    assert max(sizes) == 80
+    # rejected operations are retried alone
+    assert sizes.count(1) == 2
+    decisions = [d.decision for d in controller.metrics.decisions]
+    assert decisions.count("backoff") == 2
+    assert controller.metrics.rejected == 2
+    assert controller.metrics.operations == 302
+    assert controller.metrics.requests == len(sizes)
+
+    # whole request rejected, then retried
+    bulk, sizes = _bulk(reject_request_once=True)
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        assert index.docs.bulk(docs[:5]).perform(
+            adaptive=AdaptiveBulkController(), max_retries=1, backoff=0
+        ) == (5, [])
+    assert sizes == [5, 5]
+
+    # rejected operations are errors once retries are exhausted
+    bulk, sizes = _bulk(rejected_once={"1"})
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        with pytest.raises(helpers.BulkIndexError):
+            index.docs.bulk(docs[:5]).perform(adaptive=AdaptiveBulkController())
+        assert index.docs.bulk(docs[:5]).perform(
+            adaptive=AdaptiveBulkController(), stats_only=True, raise_on_error=False
+        ) == (5, 0)
+
+    # rejections of last attempt are reported to controller
+    bulk, sizes = _bulk(rejected_once={"1"})
+    controller = AdaptiveBulkController()
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        assert index.docs.bulk(docs[:5]).perform(
+            adaptive=controller, stats_only=True, raise_on_error=False
+        ) == (4, 1)
+    assert controller.metrics.rejected == 1
+    assert [d.decision for d in controller.metrics.decisions] == ["backoff"]
+
+    # parameters driven by controller, or specific to streaming_bulk, are rejected
+    for kwargs in (
+        {"parallel": 4},
+        {"chunk_size": 100},
+        {"chunk_bytes": 1024},
+        {"yield_ok": False},
+        {"initial_backoff": 1},
+    ):
+        with pytest.raises(ValueError):
+            index.docs.bulk(docs[:5]).streaming_perform(
+                adaptive=AdaptiveBulkController(), **kwargs
+            )
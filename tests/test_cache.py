@@ -0,0 +1,328 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mock import AsyncMock, Mock, patch
+
+from elasticsearch import Elasticsearch
+
+from pandagg import AsyncSearch, AsyncMultiSearch
+from pandagg.cache import MemoryCache, SqliteCache, SingleFlight, fingerprint
+from pandagg.document import DocumentSource
+from pandagg.mappings import Keyword
+from pandagg.response import SearchResponse
+from pandagg.search import Search, MultiSearch
+
+
+def test_fingerprint():
+    assert fingerprint("search", ["a"], {"size": 1, "query": {}}) == fingerprint(
+        "search", ["a"], {"query": {}, "size": 1}
+    )
+    assert fingerprint("search", ["a"], {"size": 1}) != fingerprint(
+        "search", ["b"], {"size": 1}
+    )
+    assert fingerprint("search", ["a"], {"size": 1}) != fingerprint(
+        "count", ["a"], {"size": 1}
+    )
+
+    # requests sent to distinct clusters
+    assert fingerprint(
+        "search", ["a"], {}, client=Elasticsearch(["h1:9200"])
+    ) == fingerprint("search", ["a"], {}, client=Elasticsearch(["h1:9200"]))
+    assert fingerprint(
+        "search", ["a"], {}, client=Elasticsearch(["h1:9200"])
+    ) != fingerprint("search", ["a"], {}, client=Elasticsearch(["h2:9200"]))
+    assert fingerprint("search", ["a"], {}, client=Mock()) != fingerprint(
+        "search", ["a"], {}, client=Mock()
+    )
+
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # "b" is the least recently used
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_ratio == 2 / 3
+
+    cache = MemoryCache(ttl=10)
+    with patch("pandagg.cache.time.monotonic", return_value=100):
+        cache.set("a", 1)
+    with patch("pandagg.cache.time.monotonic", return_value=105):
+        assert cache.get("a") == 1
+    with patch("pandagg.cache.time.monotonic", return_value=110):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+    # values are not shared with callers
+    value = {"hits": {"hits": []}}
+    cache.set("b", value)
+    value["hits"]["hits"].append({})
+    served = cache.get("b")
+    assert served == {"hits": {"hits": []}}
+    served["hits"]["hits"].append({})
+    assert cache.get("b") == {"hits": {"hits": []}}
+
+
+def test_sqlite_cache(tmpdir):
+    path = os.path.join(str(tmpdir), "cache.db")
+    cache = SqliteCache(path, ttl=10)
+    with patch("pandagg.cache.time.time", return_value=100):
+        cache.set("a", {"hits": {"hits": []}})
+        assert cache.get("a") == {"hits": {"hits": []}}
+    cache.close()
+
+    # persisted across instances
+    cache = SqliteCache(path, ttl=10)
+    with patch("pandagg.cache.time.time", return_value=105):
+        assert cache.get("a") == {"hits": {"hits": []}}
+    with patch("pandagg.cache.time.time", return_value=111):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    cache.close()
+
+
+def test_search_execute_cached(dummy_response):
+    client = Mock()
+    client.search = Mock(return_value=dummy_response)
+    client.count = Mock(return_value={"count": 12})
+    cache = MemoryCache()
+
+    s = Search(using=client, index="test-index", cache=cache).filter(
+        "term", lang="python"
+    )
+    r = s.execute()
+    assert isinstance(r, SearchResponse)
+    # identical search, built separately, is served from cache
+    r2 = (
+        Search(using=client, index="test-index")
+        .cache(cache)
+        .filter("term", lang="python")
+        .execute()
+    )
+    assert r2.data == r.data
+    assert client.search.call_count == 1
+    assert cache.stats.hits == 1
+
+    # other index is another request
+    s.index("other-index").execute()
+    assert client.search.call_count == 2
+
+    s.execute(cache_mode="bypass")
+    assert client.search.call_count == 3
+    s.execute(cache_mode="refresh")
+    assert client.search.call_count == 4
+    assert cache.stats.hits == 1
+
+    assert s.count() == 12
+    assert s.count() == 12
+    assert client.count.call_count == 1
+
+    # no cache
+    s.cache(None).execute()
+    assert client.search.call_count == 5
+
+
+def test_async_search_execute_cached(dummy_response):
+    client = Mock()
+    client.search = AsyncMock(return_value=dummy_response)
+    cache = MemoryCache()
+    s = AsyncSearch(using=client, index="test-index", cache=cache)
+
+    async def execute_twice():
+        await s.execute()
+        return await s.execute()
+
+    r = asyncio.run(execute_twice())
+    assert isinstance(r, SearchResponse)
+    assert client.search.await_count == 1
+    assert cache.stats.hits == 1
+
+    # blocking cache is accessed outside of event loop thread
+    cache = SqliteCache(":memory:")
+    threads = set()
+    get, set_ = cache.get, cache.set
+    with patch.object(
+        cache,
+        "get",
+        side_effect=lambda *a: threads.add(threading.get_ident()) or get(*a),
+    ), patch.object(
+        cache,
+        "set",
+        side_effect=lambda *a: threads.add(threading.get_ident()) or set_(*a),
+    ):
+        s = AsyncSearch(using=client, index="test-index", cache=cache)
+        asyncio.run(execute_twice())
+    assert client.search.await_count == 2
+    assert cache.stats.hits == 1
+    assert threads and threading.get_ident() not in threads
+    cache.close()
+
+
+def _blocking(release, value):
+    def call(**kwargs):
+        release.wait(timeout=5)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return call
+
+
+def _wait_coalesced(group, count):
+    for _ in range(500):
+        if group.coalesced >= count:
+            return
+        time.sleep(0.01)
+
+
+def test_single_flight():
+    group = SingleFlight()
+    release = threading.Event()
+    fn = Mock(side_effect=_blocking(release, 42))
+
+    def call():
+        return group.do("key", fn)
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(call) for _ in range(5)]
+        _wait_coalesced(group, 4)
+        release.set()
+        assert [f.result() for f in futures] == [42] * 5
+    assert fn.call_count == 1
+
+    # errors are shared as well, and calls are not coalesced once completed
+    release = threading.Event()
+    fn = Mock(side_effect=_blocking(release, ValueError("boom")))
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(call) for _ in range(3)]
+        _wait_coalesced(group, 6)
+        release.set()
+        for f in futures:
+            with pytest.raises(ValueError):
+                f.result()
+    assert fn.call_count == 1
+    assert group.do("key", lambda: 1) == 1
+
+
+def test_single_flight_async_leader_cancelled():
+    group = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run():
+        leader = asyncio.ensure_future(group.do_async("key", fn))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(group.do_async("key", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # a waiter performs the call instead, other waiters aren't cancelled
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(run()) == [42, 42]
+    assert len(calls) == 2
+
+
+def test_search_execute_single_flight(dummy_response):
+    release = threading.Event()
+    client = Mock()
+    client.search = Mock(side_effect=_blocking(release, dummy_response))
+    client.msearch = Mock(side_effect=_blocking(release, {"responses": []}))
+    group = SingleFlight()
+    s = Search(using=client, index="test-index", single_flight=group).filter(
+        "term", lang="python"
+    )
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(s.execute) for _ in range(3)]
+        # a different search is not coalesced
+        other = pool.submit(s.size(3).execute)
+        _wait_coalesced(group, 2)
+        release.set()
+        responses = [f.result() for f in futures]
+        other.result()
+    assert client.search.call_count == 2
+    # all callers share the same raw response
+    assert all(r.data is responses[0].data for r in responses)
+    assert all(isinstance(r, SearchResponse) for r in responses)
+
+    # each search parses shared response according to its own document class
+    class Lang(DocumentSource):
+        lang = Keyword()
+
+    class Twitter(DocumentSource):
+        twitter = Keyword()
+
+    release.clear()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [
+            pool.submit(
+                Search(
+                    using=client,
+                    index="test-index",
+                    single_flight=group,
+                    document_class=document_class,
+                )
+                .filter("term", lang="python")
+                .source(["*"])
+                .execute
+            )
+            for document_class in (Lang, Twitter)
+        ]
+        _wait_coalesced(group, 3)
+        release.set()
+        lang, twitter = [f.result() for f in futures]
+    assert client.search.call_count == 3
+    assert isinstance(lang.hits.hits[1]._source, Lang)
+    assert isinstance(twitter.hits.hits[1]._source, Twitter)
+    assert twitter.hits.hits[1]._source.twitter == "kimchy"
+
+    release.clear()
+    ms = MultiSearch(using=client, single_flight=group).add(s)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(ms.execute) for _ in range(2)]
+        _wait_coalesced(group, 4)
+        release.set()
+        assert [f.result() for f in futures] == [{"responses": []}] * 2
+    assert client.msearch.call_count == 1
+
+
+def test_async_search_execute_single_flight(dummy_response):
+    async def search(**kwargs):
+        await asyncio.sleep(0.01)
+        return dummy_response
+
+    client = Mock()
+    client.search = AsyncMock(side_effect=search)
+    group = SingleFlight()
+    s = AsyncSearch(using=client, single_flight=group)
+
+    async def execute_concurrently():
+        return await asyncio.gather(*(s.execute() for _ in range(5)))
+
+    responses = asyncio.run(execute_concurrently())
+    assert client.search.await_count == 1
+    assert all(r.data is responses[0].data for r in responses)
+    assert group.coalesced == 4
+
+    client.msearch = AsyncMock(return_value={"responses": []})
+    ms = AsyncMultiSearch(using=client, single_flight=group).add(s)
+    assert asyncio.run(ms.execute()) == {"responses": []}
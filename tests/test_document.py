@@ -179,6 +179,30 @@ def test_doc_deserialization():
     assert post.comments[1].author.username == ["paul", "paulo"]
 
 
+def test_document_source_includes():
+    assert Post._source_includes_ == [
+        "author.id",
+        "author.signed_up",
+        "author.username",
+        "author.email",
+        "author.location",
+        "created",
+        "body",
+        "comments.author.id",
+        "comments.author.signed_up",
+        "comments.author.username",
+        "comments.author.email",
+        "comments.author.location",
+        "comments.created",
+        "comments.content",
+    ]
+
+    # inner documents absent from (filtered) source
+    post = Post._from_dict_({"body": "knock knock"})
+    assert post.author is None
+    assert post.comments == []
+
+
 def test_nested_document_to_dict_empty_multiple():
     # with empty 'multiple' field: -> [] instead of None
     post = Post(author=User(id=1, username="paul"), body="knock knock")
@@ -207,3 +231,57 @@ def test_document_to_dict():
         "signed_up": "2021-01-01",
         "username": None,
     }
+
+
+def test_slots_document():
+    class SlottedUser(InnerDocSource, slots=True):
+        id = Long(required=True)
+        username = Text()
+
+    class SlottedPost(DocumentSource, slots=True):
+        author = Object(properties=SlottedUser)
+        body = Text()
+        tags = Keyword(multiple=True)
+
+    post = SlottedPost(author=SlottedUser(id=1), body="knock knock")
+    assert not hasattr(post, "__dict__")
+    assert post.tags == []
+    assert post.author.username is None
+    with pytest.raises(AttributeError):
+        post.fake_field = 1
+    with pytest.raises(TypeError):
+        SlottedPost(fake_field=1)
+    assert post._to_dict_() == {"author": {"id": 1}, "body": "knock knock"}
+
+    post = SlottedPost._from_dict_(
+        {"author": {"id": 1, "username": "paul"}, "tags": ["a", None, "b"]}
+    )
+    assert post.author.username == "paul"
+    assert post.body is None
+    assert post.tags == ["a", "b"]
+
+    with pytest.raises(TypeError) as e:
+        SlottedPost._from_dict_({"tags": "a"})
+    assert e.value.args == ("Expected list for field tags, got a",)
+    assert SlottedPost._from_dict_({"tags": "a"}, strict=False).tags == "a"
+
+
+def test_deserialization_unspecified_multiple():
+    class Tagged(DocumentSource):
+        tags = Keyword()
+        author = Object(properties=User)
+
+    # fields without explicit `multiple` accept both single values and lists, even in strict mode
+    doc = Tagged._from_dict_(
+        {"tags": ["x", None, "y"], "author": [{"id": 1, "username": "paul"}]}
+    )
+    assert doc.tags == ["x", "y"]
+    assert len(doc.author) == 1
+    assert doc.author[0].username == "paul"
+    doc = Tagged._from_dict_({"tags": "x", "author": {"id": 1, "username": "paul"}})
+    assert doc.tags == "x"
+    assert doc.author.username == "paul"
+    assert DocumentSource._from_dict_.__func__(Tagged, {"tags": ["x", "y"]}).tags == [
+        "x",
+        "y",
+    ]
@@ -1,10 +1,17 @@
 # adapted from elasticsearch-dsl-py
+import json
+import threading
 
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 import pytest
+from elasticsearch import Elasticsearch, helpers
+from mock import patch
 
 from pandagg import Mappings, Search
 from pandagg.document import DocumentSource
-from pandagg.mappings import Keyword, Text, Date
+from pandagg.mappings import Keyword, Text, Date, Long, Float, Object
 from pandagg.index import DeclarativeIndex, DeclarativeIndexTemplate
 
 
@@ -204,6 +211,85 @@ def test_docwriter_bulk(write_client):
     ]
 
 
+def _bulk_responses(rejected_once, failing):
+    """Fake bulk endpoint, rejecting once with 429 documents of `rejected_once` ids, and failing `failing` ones."""
+    lock = threading.Lock()
+    rejected = set()
+    calls = []
+
+    def bulk(*args, body, **kwargs):
+        lines = [json.loads(line) for line in body.splitlines()]
+        items = []
+        for action in lines[::2]:
+            _id = action["index"]["_id"]
+            status = 201
+            with lock:
+                if _id in rejected_once and _id not in rejected:
+                    rejected.add(_id)
+                    status = 429
+            if _id in failing:
+                status = 400
+            item = {"_id": _id, "_index": "test-post", "status": status}
+            if status != 201:
+                item["error"] = {"type": "some_error"}
+            items.append({"index": item})
+        with lock:
+            calls.append(len(items))
+        return {"errors": any("error" in i["index"] for i in items), "items": items}
+
+    return bulk, calls
+
+
+@pytest.mark.parametrize("parallel", [1, 3])
+def test_docwriter_streaming_perform(parallel):
+    index = Post(client=Elasticsearch())
+    bulk, calls = _bulk_responses(rejected_once={"2", "5"}, failing={"7"})
+    docs = [
+        {"_id": str(i), "_source": {"title": "post %d" % i}, "_op_type": "index"}
+        for i in range(10)
+    ]
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        results = index.docs.bulk(docs).streaming_perform(
+            parallel=parallel,
+            chunk_size=2,
+            max_retries=1,
+            backoff=0,
+            raise_on_error=False,
+        )
+        # operations are consumed
+        assert not index.docs.has_pending_operation()
+        results = list(results)
+    # one result per operation, rejected operations being retried
+    assert len(results) == 10
+    assert sorted(item["index"]["_id"] for _, item in results) == [
+        str(i) for i in range(10)
+    ]
+    assert [item["index"]["_id"] for ok, item in results if not ok] == ["7"]
+    assert len(calls) >= 5 + 1
+    assert max(calls) <= 2
+
+    # aggregated
+    bulk, calls = _bulk_responses(rejected_once={"2"}, failing={"7"})
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        success, errors = index.docs.bulk(docs).perform(
+            parallel=parallel, max_retries=1, backoff=0, raise_on_error=False
+        )
+    assert success == 9
+    assert [e["index"]["_id"] for e in errors] == ["7"]
+
+    # without retries, rejections are errors
+    bulk, calls = _bulk_responses(rejected_once={"2"}, failing=set())
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        with pytest.raises(helpers.BulkIndexError):
+            index.docs.bulk(docs).perform(parallel=parallel)
+        assert index.docs.bulk(docs).perform(
+            parallel=parallel, stats_only=True, raise_on_error=False
+        ) == (10, 0)
+
+    with pytest.raises(ValueError):
+        index.docs.streaming_perform(parallel=0)
+
+
 def test_index_template_invalid():
     with pytest.raises(ValueError) as e:
 
@@ -282,6 +368,28 @@ def test_index_docwriter_has_pending_operation():
     assert not index.docs.has_pending_operation()
 
 
+def test_index_docwriter_validate_many():
+    class PostDocument(DocumentSource):
+        title = Text(required=True)
+        tags = Keyword(multiple=True)
+
+    class DocumentPost(DeclarativeIndex):
+        name = "test-post"
+        document = PostDocument
+
+    index = DocumentPost()
+    assert (
+        index.docs.validate_many(
+            [
+                PostDocument(title="salut", tags=["a"]),
+                PostDocument(tags=["a"]),
+                {"title": "salut", "tags": "a"},
+            ]
+        )
+        == {1: "Field <title> is required", 2: "Field <tags> should be a array"}
+    )
+
+
 def test_index_mappings_consistency_with_document():
     with pytest.raises(TypeError) as e:
 
@@ -344,6 +452,184 @@ def test_index_mappings_consistency_with_document():
     index = ValidPostIndex()
     s = index.search(deserialize_source=True)
     assert s._document_class is PostDocument
+    # only document fields are fetched
+    assert s.to_dict() == {"_source": {"includes": ["title", "published_from"]}}
+    assert s.source(["title"]).to_dict() == {"_source": ["title"]}
 
     s = index.search(deserialize_source=False)
     assert s._document_class is None
+
+
+class Restaurant(DeclarativeIndex):
+    name = "restaurants"
+    mappings = {
+        "properties": {
+            "name": Text(),
+            "grade": Long(),
+            "opened": Date(),
+            "tags": Keyword(),
+            "location": Object(properties={"lat": Float(), "lon": Float()}),
+        }
+    }
+
+
+def _ndjson(operations):
+    return [
+        [json.loads(line) for line in operation if line is not None]
+        for operation in operations
+    ]
+
+
+def test_docwriter_from_dataframe():
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "name": ['multi\nline "é"', None, "c"],
+            # floats because of missing value, mapped as long
+            "grade": [1.0, np.nan, 3.0],
+            "opened": pd.to_datetime(["2021-01-01 00:00", None, "2021-03-01 10:00"]),
+            "updated": pd.to_datetime(["2021-01-01 01:00", None, None]).tz_localize(
+                "Europe/Paris"
+            ),
+            "tags": [["x", "y"], [], None],
+            "location.lat": [1.5, np.nan, np.nan],
+            "location.lon": [2.5, 3.0, np.nan],
+        }
+    )
+    index = Restaurant(client=Elasticsearch())
+
+    operations = list(index.docs.from_dataframe(df, id_column="id")._operations)
+    assert all(isinstance(line, str) for operation in operations for line in operation)
+    assert _ndjson(operations) == [
+        [
+            {"index": {"_index": "restaurants", "_id": "1"}},
+            {
+                "name": 'multi\nline "é"',
+                "grade": 1,
+                "opened": "2021-01-01T00:00:00.000",
+                # timezone aware dates are converted to UTC
+                "updated": "2021-01-01T00:00:00.000Z",
+                "tags": ["x", "y"],
+                "location": {"lat": 1.5, "lon": 2.5},
+            },
+        ],
+        [
+            {"index": {"_index": "restaurants", "_id": "2"}},
+            {"tags": [], "location": {"lon": 3.0}},
+        ],
+        [
+            {"index": {"_index": "restaurants", "_id": "3"}},
+            {"name": "c", "grade": 3, "opened": "2021-03-01T10:00:00.000"},
+        ],
+    ]
+    assert '"grade":1,' in operations[0][1]
+
+    # small batches, generated ids, epoch dates
+    operations = list(
+        index.docs.from_dataframe(
+            df[["name", "opened", "updated"]], date_format="epoch", batch_size=2
+        )._operations
+    )
+    assert _ndjson(operations) == [
+        [
+            {"index": {"_index": "restaurants"}},
+            {
+                "name": 'multi\nline "é"',
+                "opened": 1609459200000,
+                "updated": 1609459200000,
+            },
+        ],
+        [{"index": {"_index": "restaurants"}}, {}],
+        [
+            {"index": {"_index": "restaurants"}},
+            {"name": "c", "opened": 1614592800000},
+        ],
+    ]
+
+    operations = list(
+        index.docs.from_dataframe(
+            df[["id", "grade"]], id_column="id", op_type="update"
+        )._operations
+    )
+    assert _ndjson(operations)[:2] == [
+        [{"update": {"_index": "restaurants", "_id": "1"}}, {"doc": {"grade": 1}}],
+        [{"update": {"_index": "restaurants", "_id": "2"}}, {"doc": {}}],
+    ]
+    operations = list(
+        index.docs.from_dataframe(df, id_column="id", op_type="delete")._operations
+    )
+    assert operations[0] == ('{"delete":{"_index":"restaurants","_id":"1"}}', None)
+
+    # invalid parameters are reported when stacking operations
+    with pytest.raises(ValueError):
+        index.docs.from_dataframe(df, op_type="update")
+    with pytest.raises(ValueError):
+        index.docs.from_dataframe(df, id_column="unknown")
+    with pytest.raises(ValueError):
+        index.docs.from_dataframe(df, date_format="unknown")
+    with pytest.raises(ValueError):
+        index.docs.from_dataframe(pd.DataFrame({"a": [1], "a.b": [2]}))
+
+    # ids of float column (because of missing values) are written as integers, missing ids are rejected
+    df = pd.DataFrame({"id": [1.0, 2.0], "name": ["a", "b"]})
+    operations = list(index.docs.from_dataframe(df, id_column="id")._operations)
+    assert [operation[0] for operation in operations] == [
+        '{"index":{"_index":"restaurants","_id":"1"}}',
+        '{"index":{"_index":"restaurants","_id":"2"}}',
+    ]
+    df = pd.DataFrame({"id": [1.5, np.nan], "name": ["a", "b"]})
+    with pytest.raises(ValueError) as e:
+        index.docs.from_dataframe(df, id_column="id")
+    assert e.value.args == ("Missing values in id column <id>",)
+    operations = list(index.docs.from_dataframe(df[:1], id_column="id")._operations)
+    assert operations[0][0] == '{"index":{"_index":"restaurants","_id":"1.5"}}'
+
+
+def test_docwriter_from_arrow():
+    table = pa.table(
+        {
+            "id": ["a", "b"],
+            "grade": pa.array([1, None], pa.int64()),
+            "location": pa.array([{"lat": 1.0, "lon": 2.0}, None]),
+            "open": pa.array([True, None]),
+        }
+    )
+    index = Restaurant(client=Elasticsearch())
+    operations = list(
+        index.docs.from_arrow(table, id_column="id", batch_size=1)._operations
+    )
+    assert _ndjson(operations) == [
+        [
+            {"index": {"_index": "restaurants", "_id": "a"}},
+            {"grade": 1, "location": {"lat": 1.0, "lon": 2.0}, "open": True},
+        ],
+        [{"index": {"_index": "restaurants", "_id": "b"}}, {}],
+    ]
+    assert _ndjson(index.docs.from_arrow(table.to_batches()[0])._operations)[0] == [
+        {"index": {"_index": "restaurants"}},
+        {"id": "a", "grade": 1, "location": {"lat": 1.0, "lon": 2.0}, "open": True},
+    ]
+    with pytest.raises(ValueError):
+        index.docs.from_arrow(table, id_column="unknown")
+    with pytest.raises(ValueError) as e:
+        index.docs.from_arrow(table, id_column="grade")
+    assert e.value.args == ("Missing values in id column <grade>",)
+
+
+@pytest.mark.parametrize("parallel", [1, 2])
+def test_docwriter_from_dataframe_perform(parallel):
+    df = pd.DataFrame({"id": [str(i) for i in range(20)], "title": ["post"] * 20})
+    index = Post(client=Elasticsearch())
+    bulk, calls = _bulk_responses(rejected_once={"3"}, failing=set())
+    with patch.object(index._get_connection(), "bulk", side_effect=bulk):
+        assert (
+            index.docs.from_dataframe(df, id_column="id").perform(
+                parallel=parallel,
+                chunk_size=5,
+                max_retries=1,
+                backoff=0,
+                raise_on_error=False,
+            )
+            == (20, [])
+        )
+    assert sum(calls) == 21
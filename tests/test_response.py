@@ -1,7 +1,9 @@
 from pandagg.document import DocumentSource
 from pandagg.node.mappings import Keyword
+from pandagg.tree.mappings import Mappings
 from tests import PandaggTestCase
 import pandas as pd
+import pyarrow as pa
 
 from pandagg.search import Search
 from pandagg.response import SearchResponse, Hits, Hit, Aggregations
@@ -46,6 +48,8 @@ class ResponseTestCase(PandaggTestCase):
         )
         assert isinstance(h._source, SomeDoc)
         assert h._source.tag == "1"
+        # deserialized once
+        assert h._source is h._source
 
     def test_hits(self):
         hits = Hits(
@@ -151,6 +155,9 @@ class ResponseTestCase(PandaggTestCase):
         self.assertEqual(len(hits), 2)
         for hit in hits:
             self.assertIsInstance(hit, Hit)
+        # hits are built once per response
+        assert r.hits is r.hits
+        assert r.hits.hits[0] is hits[0]
 
 
 class AggregationsResponseTestCase(PandaggTestCase):
@@ -347,3 +354,532 @@ class AggregationsResponseTestCase(PandaggTestCase):
             agg_response._grouping_agg("global_metrics.field.name")[0],
             "global_metrics.field.name",
         )
+
+    def test_parsing_plans_reused(self):
+        s = Search().aggs(
+            {
+                "per_a": {
+                    "terms": {"field": "a"},
+                    "aggs": {
+                        "avg_x": {"avg": {"field": "x"}},
+                        "per_b": {
+                            "terms": {"field": "b"},
+                            "aggs": {"max_y": {"max": {"field": "y"}}},
+                        },
+                    },
+                }
+            }
+        )
+
+        def page(a_key):
+            return {
+                "per_a": {
+                    "buckets": [
+                        {
+                            "key": a_key,
+                            "doc_count": 3,
+                            "avg_x": {"value": 1.5},
+                            "per_b": {
+                                "buckets": [
+                                    {
+                                        "key": "b1",
+                                        "doc_count": 2,
+                                        "max_y": {"value": 5},
+                                        "min_y": {"value": 1},
+                                    }
+                                ]
+                            },
+                        }
+                    ]
+                }
+            }
+
+        # sibling clauses of grouping path are ignored while grouping
+        index_names, rows = Aggregations(data=page("a1"), _search=s).to_tabular(
+            grouped_by="per_b", index_orient=False
+        )
+        self.assertEqual(index_names, ["per_a", "per_b"])
+        self.assertEqual(
+            rows, [{"per_a": "a1", "per_b": "b1", "doc_count": 2, "max_y": 5}]
+        )
+        structure, plans = s._parsing_plans
+        self.assertEqual(len(plans), 2)
+
+        # compiled once per search, for all its responses
+        index_names, rows = Aggregations(data=page("a2"), _search=s).to_tabular(
+            grouped_by="per_b", index_orient=True
+        )
+        self.assertEqual(rows, {("a2", "b1"): {"doc_count": 2, "max_y": 5}})
+        self.assertIs(s._parsing_plans[1], plans)
+        self.assertEqual(len(plans), 2)
+
+        # recompiled if aggregations change
+        s._aggs = s._aggs.agg("min_y", "min", field="y", insert_below="per_b")
+        index_names, rows = Aggregations(data=page("a1"), _search=s).to_tabular(
+            grouped_by="per_b"
+        )
+        self.assertEqual(rows, {("a1", "b1"): {"doc_count": 2, "max_y": 5, "min_y": 1}})
+        self.assertIsNot(s._parsing_plans[1], plans)
+
+    def test_to_dataframe_columnar(self):
+        s = Search().aggs(
+            {
+                "per_ab": {
+                    "composite": {
+                        "sources": [
+                            {"a": {"terms": {"field": "a"}}},
+                            {"b": {"terms": {"field": "b"}}},
+                        ]
+                    },
+                    "aggs": {
+                        "avg_x": {"avg": {"field": "x"}},
+                        "per_c": {"terms": {"field": "c"}},
+                    },
+                }
+            }
+        )
+        data = {
+            "per_ab": {
+                "buckets": [
+                    {
+                        "key": {"a": "a2", "b": 1},
+                        "doc_count": 3,
+                        "avg_x": {"value": 1.5},
+                        "per_c": {"buckets": [{"key": "c1", "doc_count": 3}]},
+                    },
+                    {
+                        "key": {"a": "a1", "b": 2},
+                        "doc_count": 2,
+                        "avg_x": {"value": 2.5},
+                        "per_c": {"buckets": [{"key": "c2", "doc_count": 2}]},
+                    },
+                ]
+            }
+        }
+        df = Aggregations(data=data, _search=s).to_dataframe(
+            grouped_by="per_ab", sort=False
+        )
+        self.assertEqual(df.index.names, ["a", "b"])
+        self.assertEqual(list(df.index), [("a2", 1), ("a1", 2)])
+        self.assertEqual(
+            list(df.columns), ["doc_count", "avg_x", "per_c|c1", "per_c|c2"]
+        )
+        self.assertEqual(df["per_c|c1"].tolist()[0], 3)
+        self.assertTrue(pd.isna(df["per_c|c1"].tolist()[1]))
+
+        df = Aggregations(data=data, _search=s).to_dataframe(grouped_by="per_ab")
+        self.assertEqual(list(df.index), [("a1", 2), ("a2", 1)])
+        self.assertEqual(df["avg_x"].tolist(), [2.5, 1.5])
+
+        self.assertTrue(
+            Aggregations(data={"per_ab": {"buckets": []}}, _search=s)
+            .to_dataframe(grouped_by="per_ab")
+            .empty
+        )
+
+
+class ArrowTestCase(PandaggTestCase):
+    def test_hits_to_arrow(self):
+        mappings = Mappings(
+            properties={
+                "tag": {"type": "keyword"},
+                "count": {"type": "long"},
+                "created": {"type": "date"},
+                "comments": {
+                    "type": "nested",
+                    "properties": {
+                        "author": {"type": "keyword"},
+                        "at": {"type": "date"},
+                    },
+                },
+            }
+        )
+        hits = Hits(
+            data={
+                "hits": [
+                    {
+                        "_id": "1",
+                        "_index": "idx",
+                        "_score": 1.0,
+                        "_source": {
+                            "tag": "a",
+                            "count": 3,
+                            "created": "2021-01-01T10:00:00Z",
+                            "comments": [{"author": "x", "at": 1609459200000}],
+                            "unmapped": "ignored",
+                        },
+                    },
+                    {
+                        "_id": "2",
+                        "_index": "idx",
+                        "_score": 0.5,
+                        "_source": {
+                            "tag": 12,
+                            "created": "2021-01-02",
+                            # single object in nested field
+                            "comments": {"author": "y"},
+                        },
+                    },
+                ]
+            },
+            _document_class=None,
+            _mappings=mappings,
+        )
+        table = hits.to_arrow()
+        self.assertEqual(
+            table.schema,
+            pa.schema([("_id", pa.string())] + list(mappings.to_arrow_schema())),
+        )
+        self.assertEqual(
+            table.to_pylist(),
+            [
+                {
+                    "_id": "1",
+                    "tag": "a",
+                    "count": 3,
+                    "created": pd.Timestamp("2021-01-01T10:00:00Z").to_pydatetime(),
+                    "comments": [
+                        {
+                            "author": "x",
+                            "at": pd.Timestamp("2021-01-01T00:00:00Z").to_pydatetime(),
+                        }
+                    ],
+                },
+                {
+                    "_id": "2",
+                    "tag": "12",
+                    "count": None,
+                    "created": pd.Timestamp("2021-01-02T00:00:00Z").to_pydatetime(),
+                    "comments": [{"author": "y", "at": None}],
+                },
+            ],
+        )
+
+        table = hits.to_arrow(source_only=False)
+        self.assertEqual(table.column_names[:3], ["_id", "_index", "_score"])
+        self.assertEqual(table.column("_score").to_pylist(), [1.0, 0.5])
+
+        # without mappings, types are inferred
+        table = Hits(
+            data={"hits": hits.data["hits"][:1]}, _document_class=None
+        ).to_arrow()
+        self.assertEqual(table.schema.field("count").type, pa.int64())
+        self.assertEqual(table.column("unmapped").to_pylist(), ["ignored"])
+
+        hits.data["hits"][0]["_source"]["count"] = "not a number"
+        with self.assertRaises(ValueError):
+            hits.to_arrow()
+
+    def test_hits_to_arrow_arrays_and_dates_formats(self):
+        mappings = Mappings(
+            properties={
+                "tags": {"type": "keyword"},
+                "counts": {"type": "long"},
+                "authors": {"properties": {"name": {"type": "keyword"}}},
+                "day": {"type": "date", "format": "yyyy/MM/dd||epoch_millis"},
+                "at": {"type": "date", "format": "epoch_second"},
+                "created": {"type": "date"},
+            }
+        )
+        hits = Hits(
+            data={
+                "hits": [
+                    {
+                        "_id": "1",
+                        "_source": {
+                            "tags": ["a", "b"],
+                            "counts": [1, 2],
+                            "authors": [{"name": "x"}, {"name": "y"}],
+                            "day": "2021/01/02",
+                            "at": 1609459200,
+                            "created": "1609459200000",
+                        },
+                    },
+                    {
+                        "_id": "2",
+                        "_source": {
+                            "tags": "c",
+                            "counts": 3,
+                            "authors": {"name": "z"},
+                            "day": 1609459200000,
+                            "at": "1609459200",
+                            "created": "2021-01-01T01:00:00+01:00",
+                        },
+                    },
+                ]
+            },
+            _document_class=None,
+            _mappings=mappings,
+        )
+        table = hits.to_arrow()
+        # fields holding arrays, although not declared as multiple, are converted to lists
+        self.assertEqual(
+            table.schema.field("tags").type,
+            pa.list_(pa.dictionary(pa.int32(), pa.string())),
+        )
+        self.assertEqual(table.schema.field("counts").type, pa.list_(pa.int64()))
+        day = pd.Timestamp("2021-01-02T00:00:00Z").to_pydatetime()
+        new_year = pd.Timestamp("2021-01-01T00:00:00Z").to_pydatetime()
+        self.assertEqual(
+            table.to_pylist(),
+            [
+                {
+                    "_id": "1",
+                    "tags": ["a", "b"],
+                    "counts": [1, 2],
+                    "authors": [{"name": "x"}, {"name": "y"}],
+                    "day": day,
+                    "at": new_year,
+                    "created": new_year,
+                },
+                {
+                    "_id": "2",
+                    "tags": ["c"],
+                    "counts": [3],
+                    "authors": [{"name": "z"}],
+                    "day": new_year,
+                    "at": new_year,
+                    "created": new_year,
+                },
+            ],
+        )
+
+        hits.data["hits"][0]["_source"]["day"] = "2021-01-02"
+        with self.assertRaises(ValueError):
+            hits.to_arrow()
+
+    def test_aggregations_to_arrow(self):
+        s = Search(
+            mappings={
+                "properties": {
+                    "user": {"type": "keyword"},
+                    "date": {"type": "date"},
+                    "size": {"type": "long"},
+                }
+            }
+        ).aggs(
+            {
+                "per_user": {
+                    "terms": {"field": "user"},
+                    "aggs": {
+                        "per_day": {
+                            "date_histogram": {
+                                "field": "date",
+                                "fixed_interval": "1d",
+                            },
+                            "aggs": {"avg_size": {"avg": {"field": "size"}}},
+                        }
+                    },
+                }
+            }
+        )
+        data = {
+            "per_user": {
+                "buckets": [
+                    {
+                        "key": "u1",
+                        "doc_count": 3,
+                        "per_day": {
+                            "buckets": [
+                                {
+                                    "key": 1609459200000,
+                                    "key_as_string": "2021-01-01T00:00:00.000Z",
+                                    "doc_count": 3,
+                                    "avg_size": {"value": 1.5},
+                                }
+                            ]
+                        },
+                    }
+                ]
+            }
+        }
+        table = Aggregations(data=data, _search=s).to_arrow(grouped_by="per_day")
+        self.assertEqual(
+            table.schema,
+            pa.schema(
+                [
+                    ("per_user", pa.dictionary(pa.int32(), pa.string())),
+                    ("per_day", pa.timestamp("ms", tz="UTC")),
+                    ("doc_count", pa.int64()),
+                    ("avg_size", pa.float64()),
+                ]
+            ),
+        )
+        self.assertEqual(table.column("per_user").to_pylist(), ["u1"])
+        self.assertEqual(table.column("avg_size").to_pylist(), [1.5])
+
+        table = Aggregations(data={"per_user": {"buckets": []}}, _search=s).to_arrow(
+            grouped_by="per_day"
+        )
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.column_names[:2], ["per_user", "per_day"])
+
+
+def _filter_response(data, filter_path):
+    """Emulate elasticsearch "filter_path" inclusion: objects and arrays without any match are omitted."""
+    paths = [p.split(".") for p in filter_path.split(",")]
+
+    def filter_(value, paths):
+        if any(not p for p in paths):
+            return value
+        if isinstance(value, list):
+            items = [filter_(item, paths) for item in value]
+            items = [item for item in items if item is not None]
+            return items or None
+        if not isinstance(value, dict):
+            return None
+        result = {}
+        for k, v in value.items():
+            sub_paths = [p[1:] for p in paths if p[0] in ("*", k)]
+            if sub_paths:
+                filtered = filter_(v, sub_paths)
+                if filtered is not None or any(not p for p in sub_paths):
+                    result[k] = filtered
+        return result or None
+
+    return filter_(data, paths) or {}
+
+
+class FilterPathTestCase(PandaggTestCase):
+    def test_filter_path_parsing_unchanged(self):
+        s = (
+            Search(auto_filter_path=True)
+            .groupby("per_user", "terms", field="user")
+            .groupby("per_day", "date_histogram", field="date", fixed_interval="1d")
+            .agg("avg_size", "avg", field="size")
+            .agg("per_tag", "terms", field="tag", insert_below="per_user")
+            .agg("recent", "filter", term={"recent": True}, insert_below="per_user")
+        )
+        data = {
+            "took": 12,
+            "timed_out": False,
+            "_shards": {"total": 2, "successful": 2, "skipped": 0, "failed": 0},
+            "hits": {
+                "total": {"value": 10, "relation": "eq"},
+                "max_score": 1.0,
+                "hits": [
+                    {
+                        "_index": "idx",
+                        "_type": "_doc",
+                        "_id": "1",
+                        "_score": 1.0,
+                        "_source": {"user": "u1"},
+                    }
+                ],
+            },
+            "aggregations": {
+                "per_user": {
+                    "doc_count_error_upper_bound": 0,
+                    "sum_other_doc_count": 0,
+                    "buckets": [
+                        {
+                            "key": "u1",
+                            "doc_count": 10,
+                            "recent": {"doc_count": 2},
+                            "per_tag": {
+                                "doc_count_error_upper_bound": 0,
+                                "sum_other_doc_count": 0,
+                                "buckets": [{"key": "t1", "doc_count": 3}],
+                            },
+                            "per_day": {
+                                "buckets": [
+                                    {
+                                        "key_as_string": "2021-01-01T00:00:00.000Z",
+                                        "key": 1609459200000,
+                                        "doc_count": 4,
+                                        "avg_size": {"value": 1.5},
+                                    },
+                                    {
+                                        "key_as_string": "2021-01-02T00:00:00.000Z",
+                                        "key": 1609545600000,
+                                        "doc_count": 0,
+                                        "avg_size": {"value": None},
+                                    },
+                                ]
+                            },
+                        },
+                        {
+                            "key": "u2",
+                            "doc_count": 0,
+                            "recent": {"doc_count": 0},
+                            "per_tag": {
+                                "doc_count_error_upper_bound": 0,
+                                "sum_other_doc_count": 0,
+                                "buckets": [],
+                            },
+                            "per_day": {"buckets": []},
+                        },
+                    ],
+                }
+            },
+        }
+        filter_path = s._execute_params(s.to_dict())["filter_path"]
+        self.assertEqual(
+            filter_path.split(",")[-8:],
+            [
+                "aggregations.per_user.buckets.key",
+                "aggregations.per_user.buckets.doc_count",
+                # date histogram key is read from "key_as_string", epoch "key" is dropped
+                "aggregations.per_user.buckets.per_day.buckets.key_as_string",
+                "aggregations.per_user.buckets.per_day.buckets.doc_count",
+                "aggregations.per_user.buckets.per_day.buckets.avg_size",
+                "aggregations.per_user.buckets.per_tag.buckets.key",
+                "aggregations.per_user.buckets.per_tag.buckets.doc_count",
+                "aggregations.per_user.buckets.recent.doc_count",
+            ],
+        )
+        self.assertIn("hits.hits._source", filter_path)
+        self.assertNotIn(
+            "hits.hits", s.size(0)._execute_params(s.size(0).to_dict())["filter_path"]
+        )
+
+        filtered = _filter_response(data, filter_path)
+        self.assertNotIn("_type", filtered["hits"]["hits"][0])
+        self.assertNotIn("sum_other_doc_count", filtered["aggregations"]["per_user"])
+        # empty buckets are omitted by elasticsearch
+        self.assertNotIn("per_tag", filtered["aggregations"]["per_user"]["buckets"][1])
+
+        full_response = SearchResponse(data=data, _search=s)
+        filtered_response = SearchResponse(data=filtered, _search=s)
+        self.assertEqual(repr(filtered_response), repr(full_response))
+        self.assertEqual(
+            [(h._id, h._index, h._score, h._source) for h in filtered_response.hits],
+            [(h._id, h._index, h._score, h._source) for h in full_response.hits],
+        )
+        for grouped_by in ("per_user", "per_day"):
+            for normalize_children in (True, False):
+                kwargs = dict(
+                    grouped_by=grouped_by, normalize_children=normalize_children
+                )
+                pd.testing.assert_frame_equal(
+                    filtered_response.aggregations.to_dataframe(**kwargs),
+                    full_response.aggregations.to_dataframe(**kwargs),
+                )
+        self.assertEqual(
+            filtered_response.aggregations.to_tabular(grouped_by="per_day"),
+            full_response.aggregations.to_tabular(grouped_by="per_day"),
+        )
+        self.assertEqual(
+            filtered_response.aggregations.to_normalized(),
+            full_response.aggregations.to_normalized(),
+        )
+
+        # aggregation names that cannot be expressed in filter path keep whole aggregations response
+        s = Search(auto_filter_path=True).groupby("per.user", "terms", field="user")
+        self.assertTrue(
+            s._execute_params(s.to_dict())["filter_path"].endswith(",aggregations")
+        )
+
+    def test_total_repr_filtered(self):
+        self.assertEqual(
+            Hits(data={}, _document_class=None)._total_repr(),
+            'Unknown total (probably filtered by "filter_path")',
+        )
+        self.assertEqual(
+            Hits(data={"total": 12}, _document_class=None)._total_repr(), "12"
+        )
+        self.assertEqual(
+            Hits(data={"total": {"value": 12}}, _document_class=None)._total_repr(),
+            "12",
+        )
+        self.assertFalse(SearchResponse(data={"took": 1}, _search=Search()).success)
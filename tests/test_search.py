@@ -1,12 +1,15 @@
+import json
 from copy import deepcopy
 
-from mock import patch
+import pytest
+from mock import patch, Mock
 
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, TransportError
 
 from pandagg import Aggregations
+from pandagg.response import Hit, SearchResponse
 from pandagg.node.aggs import Max, DateHistogram, Sum
-from pandagg.search import Search
+from pandagg.search import Search, MultiSearch
 from pandagg.query import Query, Bool, Match
 from pandagg.tree.mappings import Mappings
 from pandagg.utils import ordered, equal_queries
@@ -174,6 +177,32 @@ def test_search_to_dict():
     assert {"size": 5, "from": 42} == s.to_dict()
 
 
+def test_search_to_dict_is_a_copy():
+    from pandagg.document import DocumentSource
+    from pandagg.mappings import Keyword
+
+    class Doc(DocumentSource):
+        user = Keyword()
+
+    s = (
+        Search(document_class=Doc)
+        .filter("term", user="a")
+        .agg("per_user", "terms", field="user")
+    )
+    d = s.to_dict()
+    # modifications of returned dict don't affect search, nor its clones, nor document class
+    d["query"]["bool"]["filter"].append({"term": {"user": {"value": "b"}}})
+    d["aggs"]["per_user"]["terms"]["field"] = "other"
+    d["_source"]["includes"].append("other")
+    clone = s.size(2)
+    for search in (s, clone):
+        d = search.to_dict()
+        assert d["query"] == {"bool": {"filter": [{"term": {"user": {"value": "a"}}}]}}
+        assert d["aggs"] == {"per_user": {"terms": {"field": "user"}}}
+        assert d["_source"] == {"includes": ["user"]}
+    assert Doc._source_includes_ == ["user"]
+
+
 def test_complex_example():
     s = (
         Search()
@@ -486,6 +515,31 @@ def test_scan_composite_agg(data_client, git_mappings):
     assert hasattr(bucket_iterator, "__iter__")
     buckets = list(bucket_iterator)
     assert buckets == [
+        {
+            "doc_count": 2,
+            "insertions_sum": {"value": 91.0},
+            "key": {"compatible_histogram": 1393804800000},
+        },
+        {
+            "doc_count": 1,
+            "insertions_sum": {"value": 692.0},
+            "key": {"compatible_histogram": 1393891200000},
+        },
+        {
+            "doc_count": 3,
+            "insertions_sum": {"value": 134.0},
+            "key": {"compatible_histogram": 1393977600000},
+        },
+        {
+            "doc_count": 3,
+            "insertions_sum": {"value": 179.0},
+            "key": {"compatible_histogram": 1394064000000},
+        },
+        {
+            "doc_count": 9,
+            "insertions_sum": {"value": 344.0},
+            "key": {"compatible_histogram": 1394150400000},
+        },
         {
             "doc_count": 2,
             "insertions_sum": {"value": 120.0},
@@ -567,6 +621,11 @@ def test_scan_composite_agg_at_once(data_client, git_mappings):
     assert agg_response.to_tabular(index_orient=True) == (
         ["compatible_histogram", "author"],
         {
+            (1393804800000, "Honza Král"): {"doc_count": 2, "insertions_sum": 91.0},
+            (1393891200000, "Honza Král"): {"doc_count": 1, "insertions_sum": 692.0},
+            (1393977600000, "Honza Král"): {"doc_count": 3, "insertions_sum": 134.0},
+            (1394064000000, "Honza Král"): {"doc_count": 3, "insertions_sum": 179.0},
+            (1394150400000, "Honza Král"): {"doc_count": 9, "insertions_sum": 344.0},
             (1394409600000, "Honza Král"): {"doc_count": 2, "insertions_sum": 120.0},
             (1394841600000, "Honza Král"): {"doc_count": 4, "insertions_sum": 45.0},
             (1395360000000, "Honza Král"): {"doc_count": 2, "insertions_sum": 34.0},
@@ -608,6 +667,11 @@ def test_scan_composite_agg_at_once(data_client, git_mappings):
     assert agg_response.to_tabular(index_orient=True) == (
         ["commit_date", "author_name"],
         {
+            (1393804800000, "Honza Král"): {"doc_count": 2, "insertions_sum": 91.0},
+            (1393891200000, "Honza Král"): {"doc_count": 1, "insertions_sum": 692.0},
+            (1393977600000, "Honza Král"): {"doc_count": 3, "insertions_sum": 134.0},
+            (1394064000000, "Honza Král"): {"doc_count": 3, "insertions_sum": 179.0},
+            (1394150400000, "Honza Král"): {"doc_count": 9, "insertions_sum": 344.0},
             (1394409600000, "Honza Král"): {"doc_count": 2, "insertions_sum": 120.0},
             (1394841600000, "Honza Král"): {"doc_count": 4, "insertions_sum": 45.0},
             (1395360000000, "Honza Král"): {"doc_count": 2, "insertions_sum": 34.0},
@@ -622,3 +686,747 @@ def test_scan_composite_agg_at_once(data_client, git_mappings):
             (1398988800000, "Honza Král"): {"doc_count": 1, "insertions_sum": 23.0},
         },
     )
+
+
+def _fake_sliced_scan(closed_slices, opened_slices=None):
+    def fake_scan(client, query, index):
+        slice_id = query["slice"]["id"]
+        if opened_slices is not None:
+            opened_slices.append(slice_id)
+        try:
+            for i in range(5):
+                yield {"_id": "%d-%d" % (slice_id, i), "_source": {}}
+        finally:
+            closed_slices.append(slice_id)
+
+    return fake_scan
+
+
+def test_scan_sliced():
+    closed_slices = []
+    client = Mock()
+    with patch("pandagg._parallel.scan", _fake_sliced_scan(closed_slices)):
+        hits = list(
+            Search(using=client, index="some-index")
+            .filter("term", some_field=1)
+            .scan(slices=3, workers=2)
+        )
+    assert all(isinstance(h, Hit) for h in hits)
+    assert sorted(h._id for h in hits) == sorted(
+        "%d-%d" % (s, i) for s in range(3) for i in range(5)
+    )
+    assert sorted(closed_slices) == [0, 1, 2]
+
+
+def test_scan_sliced_early_exit_and_errors():
+    closed_slices = []
+    opened_slices = []
+    client = Mock()
+    with patch(
+        "pandagg._parallel.scan", _fake_sliced_scan(closed_slices, opened_slices)
+    ):
+        hits = Search(using=client).scan(slices=4, workers=4)
+        assert isinstance(next(hits), Hit)
+        hits.close()
+    # all opened scroll contexts are cleared
+    assert opened_slices
+    assert sorted(closed_slices) == sorted(opened_slices)
+
+    def failing_scan(client, query, index):
+        if query["slice"]["id"] == 1:
+            raise ValueError("scroll failure")
+        yield {"_id": "1"}
+
+    with patch("pandagg._parallel.scan", failing_scan):
+        with pytest.raises(ValueError) as e:
+            list(Search(using=client).scan(slices=2))
+    assert e.value.args == ("scroll failure",)
+
+
+def test_iterate_pit():
+    client = Mock()
+    client.open_point_in_time.return_value = {"id": "pit-1"}
+    client.search.side_effect = [
+        {
+            "pit_id": "pit-2",
+            "hits": {
+                "hits": [
+                    {"_id": "1", "sort": ["a", 1]},
+                    {"_id": "2", "sort": ["b", 2]},
+                ]
+            },
+        },
+        {"pit_id": "pit-2", "hits": {"hits": [{"_id": "3", "sort": ["c", 3]}]}},
+    ]
+    s = (
+        Search(using=client, index="some-index")
+        .sort("name")
+        .params(from_=10)
+        .agg("per_user", "terms", field="user")
+    )
+    hits = list(s.iterate_pit(page_size=2, keep_alive="2m"))
+    assert [h._id for h in hits] == ["1", "2", "3"]
+    assert hits[-1]._sort == ["c", 3]
+
+    client.open_point_in_time.assert_called_once_with(
+        index=["some-index"], keep_alive="2m"
+    )
+    first_call, second_call = client.search.call_args_list
+    assert first_call[1] == {
+        "body": {
+            "pit": {"id": "pit-1", "keep_alive": "2m"},
+            "size": 2,
+            "sort": ["name", {"_shard_doc": "asc"}],
+        }
+    }
+    assert second_call[1]["body"]["pit"] == {"id": "pit-2", "keep_alive": "2m"}
+    assert second_call[1]["body"]["search_after"] == ["b", 2]
+    # hits total is only computed once
+    assert second_call[1]["body"]["track_total_hits"] is False
+    client.close_point_in_time.assert_called_once_with(body={"id": "pit-2"})
+
+
+def test_iterate_pit_closes_pit_on_early_exit():
+    client = Mock()
+    client.open_point_in_time.return_value = {"id": "pit-1"}
+    client.search.return_value = {"hits": {"hits": [{"_id": "1", "sort": [1]}]}}
+    hits = Search(using=client).iterate_pit(page_size=1, search_after=[0])
+    assert next(hits)._id == "1"
+    hits.close()
+    assert client.search.call_args[1]["body"]["search_after"] == [0]
+    client.open_point_in_time.assert_called_once_with(index="_all", keep_alive="1m")
+    client.close_point_in_time.assert_called_once_with(body={"id": "pit-1"})
+
+
+def _composite_pages():
+    return [
+        {
+            "aggregations": {
+                "per_user": {
+                    "after_key": {"per_user": "b"},
+                    "buckets": [
+                        {"key": {"per_user": "a"}, "doc_count": 1},
+                        {"key": {"per_user": "b"}, "doc_count": 2},
+                    ],
+                }
+            }
+        },
+        {
+            "aggregations": {
+                "per_user": {
+                    "after_key": {"per_user": "d"},
+                    "buckets": [
+                        {"key": {"per_user": "c"}, "doc_count": 3},
+                        {"key": {"per_user": "d"}, "doc_count": 4},
+                    ],
+                }
+            }
+        },
+        {
+            "aggregations": {
+                "per_user": {
+                    "after_key": {"per_user": "e"},
+                    "buckets": [{"key": {"per_user": "e"}, "doc_count": 5}],
+                }
+            }
+        },
+    ]
+
+
+def test_scan_composite_agg_prefetch():
+    client = Mock()
+    client.search = Mock(side_effect=_composite_pages())
+    s = Search(using=client).groupby("per_user", "terms", field="user")
+
+    buckets = list(s.scan_composite_agg(size=2, prefetch=1))
+    assert [b["key"]["per_user"] for b in buckets] == ["a", "b", "c", "d", "e"]
+    assert client.search.call_count == 3
+    first_composite = client.search.call_args_list[0][1]["body"]["aggs"]["per_user"]
+    assert "after" not in first_composite["composite"]
+    last_composite = client.search.call_args_list[2][1]["body"]["aggs"]["per_user"]
+    assert last_composite["composite"]["after"] == {"per_user": "d"}
+
+    # same result without prefetching
+    client.search = Mock(side_effect=_composite_pages())
+    assert list(s.scan_composite_agg(size=2)) == buckets
+
+
+def test_scan_composite_agg_prefetch_errors_and_early_exit():
+    client = Mock()
+    client.search = Mock(side_effect=_composite_pages()[:2] + [ValueError("boom")])
+    s = Search(using=client).groupby("per_user", "terms", field="user")
+    with pytest.raises(ValueError, match="boom"):
+        list(s.scan_composite_agg(size=2, prefetch=2))
+
+    client.search = Mock(side_effect=_composite_pages())
+    buckets = s.scan_composite_agg(size=2, prefetch=1)
+    assert next(buckets) == {"key": {"per_user": "a"}, "doc_count": 1}
+    buckets.close()
+    # background fetching is bounded by prefetch depth, and stops once generator is closed
+    assert client.search.call_count <= 3
+
+
+def _fake_composite_search(values):
+    """Emulate a composite aggregation on "user_id" terms source over documents having provided values."""
+
+    def search(index, body):
+        docs = values
+        for clause in body.get("query", {}).get("bool", {}).get("filter", []):
+            if "range" in clause:
+                bounds = clause["range"]["user_id"]
+                docs = [
+                    v
+                    for v in docs
+                    if v is not None
+                    and v >= bounds.get("gte", v)
+                    and ("lt" not in bounds or v < bounds["lt"])
+                ]
+            if "bool" in clause:
+                # missing documents
+                docs = [v for v in docs if v is None]
+        if "min" in body["aggs"]:
+            present = [v for v in docs if v is not None]
+            return {
+                "aggregations": {
+                    "min": {"value": min(present) if present else None},
+                    "max": {"value": max(present) if present else None},
+                }
+            }
+        composite = body["aggs"]["per_user"]["composite"]
+        keys = sorted(set(docs), key=lambda v: (v is not None, v))
+        if "after" in composite:
+            after = composite["after"]["per_user"]
+            keys = [k for k in keys if after is None or (k is not None and k > after)]
+        keys = keys[: composite["size"]]
+        response = {
+            "buckets": [
+                {"key": {"per_user": k}, "doc_count": docs.count(k)} for k in keys
+            ]
+        }
+        if keys:
+            response["after_key"] = {"per_user": keys[-1]}
+        return {"aggregations": {"per_user": response}}
+
+    return search
+
+
+def test_scan_composite_agg_partitions():
+    values = [3, 1, 7, 12, 7, 20, 5, 18, 11, 2, 20]
+    client = Mock()
+    client.search = Mock(side_effect=_fake_composite_search(values))
+    s = Search(using=client).groupby("per_user", "terms", field="user_id")
+    expected = [
+        {"key": {"per_user": v}, "doc_count": values.count(v)}
+        for v in sorted(set(values))
+    ]
+
+    assert list(s.scan_composite_agg(size=2)) == expected
+    assert list(s.scan_composite_agg(size=2, partitions=3, ordered=True)) == expected
+    buckets = list(s.scan_composite_agg(size=2, partitions=4, workers=2))
+    assert sorted(buckets, key=lambda b: b["key"]["per_user"]) == expected
+
+    # missing bucket is scanned in its own partition
+    values.append(None)
+    s = Search(using=client).groupby(
+        "per_user", "terms", field="user_id", missing_bucket=True
+    )
+    expected.insert(0, {"key": {"per_user": None}, "doc_count": 1})
+    assert list(s.scan_composite_agg(size=2, partitions=3, ordered=True)) == expected
+
+
+def test_composite_partitions():
+    client = Mock()
+    client.search = Mock(
+        return_value={
+            "aggregations": {
+                "min": {"value": 1000.0, "value_as_string": "..."},
+                "max": {"value": 4 * 86400000.0 + 1000, "value_as_string": "..."},
+            }
+        }
+    )
+    s = Search(using=client).groupby(
+        "per_day", "date_histogram", field="date", calendar_interval="1d"
+    )
+    partitions = s._composite_partitions(4)
+    # ranges are aligned on days, so that a bucket is never split
+    assert [p.to_dict()["query"] for p, _ in partitions] == [
+        {
+            "bool": {
+                "filter": [
+                    {"range": {"date": {"format": "epoch_millis", "lt": 86400000}}}
+                ]
+            }
+        },
+        {
+            "bool": {
+                "filter": [
+                    {
+                        "range": {
+                            "date": {
+                                "format": "epoch_millis",
+                                "gte": 86400000,
+                                "lt": 2 * 86400000,
+                            }
+                        }
+                    }
+                ]
+            }
+        },
+        {
+            "bool": {
+                "filter": [
+                    {
+                        "range": {
+                            "date": {
+                                "format": "epoch_millis",
+                                "gte": 2 * 86400000,
+                                "lt": 3 * 86400000,
+                            }
+                        }
+                    }
+                ]
+            }
+        },
+        {
+            "bool": {
+                "filter": [
+                    {"range": {"date": {"format": "epoch_millis", "gte": 3 * 86400000}}}
+                ]
+            }
+        },
+    ]
+    _, keep = partitions[1]
+    assert keep({"key": {"per_day": 86400000}})
+    assert not keep({"key": {"per_day": 2 * 86400000}})
+
+    with pytest.raises(ValueError):
+        Search(using=client).groupby(
+            "per_month", "date_histogram", field="date", calendar_interval="month"
+        )._composite_partitions(4)
+
+
+def test_composite_partitions_with_mappings():
+    mappings = Mappings(
+        properties={
+            "user": {"type": "keyword"},
+            "comments": {
+                "type": "nested",
+                "properties": {"votes": {"type": "integer"}},
+            },
+        }
+    )
+    client = Mock()
+    client.search = Mock(
+        return_value={
+            "aggregations": {"nested": {"min": {"value": 0.0}, "max": {"value": 10.0}}}
+        }
+    )
+
+    # keyword values cannot be split into ranges
+    with pytest.raises(ValueError):
+        Search(using=client, mappings=mappings).groupby(
+            "per_user", "terms", field="user"
+        )._composite_partitions(2)
+    client.search.assert_not_called()
+
+    # nested source field: min/max and ranges are computed in nested context
+    s = Search(using=client, mappings=mappings).aggs(
+        {
+            "per_votes": {
+                "composite": {
+                    "sources": [
+                        {
+                            "per_votes": {
+                                "terms": {
+                                    "field": "comments.votes",
+                                    "missing_bucket": True,
+                                }
+                            }
+                        }
+                    ]
+                }
+            }
+        }
+    )
+    partitions = s._composite_partitions(2)
+    assert client.search.call_args[1]["body"]["aggs"] == {
+        "nested": {
+            "nested": {"path": "comments"},
+            "aggs": {
+                "min": {"min": {"field": "comments.votes"}},
+                "max": {"max": {"field": "comments.votes"}},
+            },
+        }
+    }
+    assert [p.to_dict()["query"] for p, _ in partitions] == [
+        {
+            "bool": {
+                "filter": [
+                    {
+                        "bool": {
+                            "must_not": [
+                                {
+                                    "nested": {
+                                        "path": "comments",
+                                        "query": {
+                                            "exists": {"field": "comments.votes"}
+                                        },
+                                    }
+                                }
+                            ]
+                        }
+                    }
+                ]
+            }
+        },
+        {
+            "bool": {
+                "filter": [
+                    {
+                        "nested": {
+                            "path": "comments",
+                            "query": {"range": {"comments.votes": {"lt": 5.0}}},
+                        }
+                    }
+                ]
+            }
+        },
+        {
+            "bool": {
+                "filter": [
+                    {
+                        "nested": {
+                            "path": "comments",
+                            "query": {"range": {"comments.votes": {"gte": 5.0}}},
+                        }
+                    }
+                ]
+            }
+        },
+    ]
+
+
+def test_composite_partitions_missing_order():
+    client = Mock()
+    client.search = Mock(
+        return_value={"aggregations": {"min": {"value": 0}, "max": {"value": 10}}}
+    )
+
+    def missing_position(**body):
+        s = Search(using=client).groupby(
+            "per_user", "terms", field="user_id", missing_bucket=True, **body
+        )
+        queries = [p.to_dict().get("query") for p, _ in s._composite_partitions(2)]
+        return [i for i, q in enumerate(queries) if "must_not" in json.dumps(q)][0]
+
+    assert missing_position() == 0
+    assert missing_position(missing_order="default") == 0
+    assert missing_position(missing_order="last") == 2
+    assert missing_position(order="desc") == 2
+    assert missing_position(order="desc", missing_order="default") == 2
+    assert missing_position(order="desc", missing_order="first") == 0
+
+    # min/max aggregation rejected by cluster
+    client.search = Mock(
+        side_effect=TransportError(400, "search_phase_execution_exception")
+    )
+    with pytest.raises(ValueError):
+        Search(using=client).groupby(
+            "per_user", "terms", field="user_id"
+        )._composite_partitions(2)
+
+
+def test_scan_terms_partitions():
+    def search(index, body):
+        include = body["aggs"]["recent"]["aggs"]["per_user"]["terms"]["include"]
+        assert include["num_partitions"] == 2
+        users = ["alice", "bob"] if include["partition"] == 0 else ["carol"]
+        return {
+            "aggregations": {
+                "recent": {
+                    "doc_count": 10,
+                    "per_user": {
+                        "doc_count_error_upper_bound": 0,
+                        "sum_other_doc_count": 0,
+                        "buckets": [
+                            {"key": u, "doc_count": i + 1, "avg_size": {"value": 2.0}}
+                            for i, u in enumerate(users)
+                        ],
+                    },
+                }
+            }
+        }
+
+    client = Mock()
+    client.search = Mock(side_effect=search)
+    s = (
+        Search(using=client)
+        .groupby("recent", "filter", filter={"range": {"date": {"gte": "now-1d"}}})
+        .groupby(
+            "per_user", "terms", field="user", size=100, order={"avg_size": "desc"}
+        )
+        .agg("avg_size", "avg", field="size")
+    )
+    aggregations = s.scan_terms_partitions("per_user", num_partitions=2, concurrency=2)
+    assert isinstance(aggregations, Aggregations)
+    assert client.search.call_count == 2
+    assert aggregations.to_tabular(index_orient=True) == (
+        ["per_user"],
+        {
+            ("alice",): {"avg_size": 2.0, "doc_count": 1},
+            ("bob",): {"avg_size": 2.0, "doc_count": 2},
+            ("carol",): {"avg_size": 2.0, "doc_count": 1},
+        },
+    )
+    # initial search is left untouched
+    assert "include" not in s.to_dict()["aggs"]["recent"]["aggs"]["per_user"]["terms"]
+
+    with pytest.raises(ValueError):
+        s.scan_terms_partitions("recent", num_partitions=2)
+
+
+def test_multisearch_execute_batched():
+    def msearch(index, body):
+        if any(line.get("size") == 13 for line in body):
+            raise TransportError(500, "unavailable")
+        return {
+            "responses": [
+                {"error": {"type": "query_shard_exception"}, "status": 400}
+                if query.get("size") == 7
+                else {"hits": {"total": {"value": query["size"]}, "hits": []}}
+                for query in body[1::2]
+            ]
+        }
+
+    client = Mock()
+    client.msearch = Mock(side_effect=msearch)
+    searches = [Search().size(i) for i in range(10)]
+    ms = MultiSearch(using=client, index="some-index").add(*searches)
+
+    responses = ms.execute_batched(batch_size=3, concurrency=2)
+    assert client.msearch.call_count == 4
+    assert all(isinstance(r, SearchResponse) for r in responses)
+    assert [r._search for r in responses] == searches
+    assert [r.hits.total["value"] for r in responses if r.error is None] == [
+        0,
+        1,
+        2,
+        3,
+        4,
+        5,
+        6,
+        8,
+        9,
+    ]
+    assert responses[7].error == {"type": "query_shard_exception"}
+    assert responses[7].status == 400
+
+    # batches are also limited in bytes, the failure of a batch is reported on each of its searches
+    client.msearch.reset_mock()
+    # size is both sent as search parameter and in search body
+    search_bytes = 2 * len(json.dumps({"size": 10})) + 2
+    responses = (
+        MultiSearch(using=client)
+        .add(Search().size(10), Search().size(11), Search().size(12), Search().size(13))
+        .execute_batched(batch_bytes=2 * search_bytes)
+    )
+    assert client.msearch.call_count == 2
+    assert [r.error for r in responses] == [
+        None,
+        None,
+        {"type": "TransportError", "reason": "TransportError(500, 'unavailable')"},
+        {"type": "TransportError", "reason": "TransportError(500, 'unavailable')"},
+    ]
+    assert responses[3].status == 500
+    # each search has its own failure
+    assert responses[2].data is not responses[3].data
+
+
+def test_search_clone_shares_trees():
+    s = Search(mappings={"properties": {"user": {"type": "keyword"}}}).filter(
+        "term", user="alice"
+    )
+    s2 = s.groupby("per_user", "terms", field="user").size(2)
+    # mappings are never copied, unchanged trees are shared
+    assert s2._mappings is s._mappings
+    assert s2._aggs.mappings is s._mappings
+    assert s2._query is s._query
+    assert s2._aggs is not s._aggs
+    assert s.to_dict() == {
+        "query": {"bool": {"filter": [{"term": {"user": {"value": "alice"}}}]}}
+    }
+
+
+def test_search_clone_merge_leaves_original_unchanged():
+    s1 = Search().bool(filter={"term": {"a": 1}}, minimum_should_match=1)
+    expected = deepcopy(s1.to_dict())
+    _, bool_node = s1._query.get(s1._query.root)
+
+    for mode in ("add", "replace", "replace_all"):
+        s2 = s1.bool(filter={"term": {"c": 3}}, minimum_should_match=2, mode=mode)
+        assert s2.to_dict()["query"]["bool"]["minimum_should_match"] == 2
+        assert bool_node.body == {"minimum_should_match": 1}
+        assert s1._query.get(s1._query.root)[1] is bool_node
+        assert s1.to_dict() == expected
+        assert (
+            s1.filter("term", b=2).to_dict()["query"]["bool"]["minimum_should_match"]
+            == 1
+        )
+
+
+def test_scan_arrow():
+    import pyarrow as pa
+
+    hits = [
+        {"_id": str(i), "_source": {"user": "u%d" % (i % 2), "size": i}}
+        for i in range(5)
+    ]
+    client = Mock()
+    with patch("pandagg.search.scan", return_value=iter(hits)) as scan_mock:
+        batches = list(
+            Search(
+                using=client,
+                index="test",
+                mappings={"properties": {"user": {"type": "keyword"}}},
+            ).scan_arrow(batch_size=2)
+        )
+    scan_mock.assert_called_once_with(client, query={}, index=["test"])
+    assert [b.num_rows for b in batches] == [2, 2, 1]
+    assert all(b.schema == batches[0].schema for b in batches)
+    assert batches[0].schema == pa.schema(
+        [("_id", pa.string()), ("user", pa.dictionary(pa.int32(), pa.string()))]
+    )
+
+    # without mappings, schema is inferred from first batch
+    with patch("pandagg.search.scan", return_value=iter(hits)):
+        batches = list(Search(using=client).scan_arrow(batch_size=3))
+    assert [b.num_rows for b in batches] == [3, 2]
+    assert batches[1].schema == batches[0].schema
+    assert batches[1].column(2).to_pylist() == [3, 4]
+
+    # field holding arrays is converted to list from then on
+    hits = [
+        {"_id": "1", "_source": {"user": "a"}},
+        {"_id": "2", "_source": {"user": ["b", "c"]}},
+        {"_id": "3", "_source": {"user": "d"}},
+    ]
+    with patch("pandagg.search.scan", return_value=iter(hits)):
+        batches = list(
+            Search(
+                using=client, mappings={"properties": {"user": {"type": "keyword"}}}
+            ).scan_arrow(batch_size=1)
+        )
+    assert [b.column(1).to_pylist() for b in batches] == [["a"], [["b", "c"]], [["d"]]]
+
+    with pytest.raises(ValueError):
+        next(Search(using=client).scan_arrow(batch_size=0))
+
+
+def test_scan_dataframes():
+    hits = [
+        {
+            "_id": str(i),
+            "_index": "test",
+            "_source": {"user": "u%d" % (i % 2), "size": i},
+        }
+        for i in range(5)
+    ]
+    client = Mock()
+    with patch("pandagg.search.scan", return_value=iter(hits)):
+        dfs = list(Search(using=client, index="test").scan_dataframes(chunk_size=2))
+    assert [len(df) for df in dfs] == [2, 2, 1]
+    assert list(dfs[2].index) == ["4"]
+    assert dfs[0].to_dict(orient="index") == {
+        "0": {"user": "u0", "size": 0},
+        "1": {"user": "u1", "size": 1},
+    }
+
+    with patch("pandagg.search.scan", return_value=iter([])):
+        assert list(Search(using=client).scan_dataframes(chunk_size=2)) == []
+
+    with pytest.raises(ValueError):
+        next(Search(using=client).scan_dataframes(chunk_size=0))
+
+
+def test_scan_composite_dataframes():
+    client = Mock()
+    client.search = Mock(side_effect=_composite_pages())
+    s = Search(using=client).groupby("per_user", "terms", field="user")
+
+    dfs = list(s.scan_composite_dataframes(size=2))
+    assert client.search.call_count == 3
+    assert [list(df.index.get_level_values("per_user")) for df in dfs] == [
+        ["a", "b"],
+        ["c", "d"],
+        ["e"],
+    ]
+    assert list(dfs[1]["doc_count"]) == [3, 4]
+
+
+def test_execute_auto_filter_path(dummy_response):
+    client = Mock()
+    client.search = Mock(return_value=dummy_response)
+    s = Search(using=client, index="test").groupby("per_user", "terms", field="user")
+    s.execute()
+    assert "filter_path" not in client.search.call_args[1]
+
+    s = s.auto_filter_path()
+    # kept by clones
+    assert s.size(0)._auto_filter_path
+    s.size(0).execute()
+    filter_path = client.search.call_args[1]["filter_path"]
+    assert filter_path.split(",")[-2:] == [
+        "aggregations.per_user.buckets.key",
+        "aggregations.per_user.buckets.doc_count",
+    ]
+    assert "hits.hits._id" not in filter_path
+    assert not s.auto_filter_path(False)._auto_filter_path
+
+    # response restricted to the way it is read
+    s.auto_filter_path(output="hits").execute()
+    filter_path = client.search.call_args[1]["filter_path"]
+    assert "hits.hits._source" in filter_path
+    assert "aggregations" not in filter_path
+    s.auto_filter_path(output="dataframe").execute()
+    filter_path = client.search.call_args[1]["filter_path"]
+    assert "hits.hits" not in filter_path
+    assert "hits.total" in filter_path
+    assert "aggregations.per_user.buckets.key" in filter_path
+    # searches without aggregations, or without hits, are not affected
+    Search(using=client).auto_filter_path(output="dataframe").execute()
+    assert "hits.hits._id" in client.search.call_args[1]["filter_path"]
+    s.auto_filter_path(output="hits").size(0).execute()
+    assert (
+        "aggregations.per_user.buckets.key" in client.search.call_args[1]["filter_path"]
+    )
+    with pytest.raises(ValueError):
+        s.auto_filter_path(output="json")
+
+    # versioning fields are kept if requested
+    s.params(version=True, seq_no_primary_term=True).execute()
+    filter_path = client.search.call_args[1]["filter_path"].split(",")
+    assert {
+        "hits.hits._version",
+        "hits.hits._seq_no",
+        "hits.hits._primary_term",
+    } <= set(filter_path)
+    s.params(version=False).execute()
+    assert "hits.hits._version" not in client.search.call_args[1]["filter_path"]
+
+
+def test_scan_composite_agg_auto_filter_path():
+    pages = _composite_pages()
+    # last page has no bucket: elasticsearch omits whole aggregation response when filtered
+    pages[2] = {"took": 1}
+    client = Mock()
+    client.search = Mock(side_effect=pages)
+    s = Search(using=client, auto_filter_path=True).groupby(
+        "per_user", "terms", field="user"
+    )
+    buckets = list(s.scan_composite_agg(size=2))
+    assert [b["key"]["per_user"] for b in buckets] == ["a", "b", "c", "d"]
+    assert client.search.call_args[1]["filter_path"].split(",")[-3:] == [
+        "aggregations.per_user.after_key",
+        "aggregations.per_user.buckets.key",
+        "aggregations.per_user.buckets.doc_count",
+    ]
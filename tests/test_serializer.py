@@ -0,0 +1,71 @@
+import datetime
+import decimal
+import json
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.exceptions import SerializationError
+from mock import patch
+
+from pandagg.serializer import OrjsonSerializer
+
+
+def test_orjson_serializer_dumps():
+    serializer = OrjsonSerializer()
+    assert serializer.dumps("already serialized") == "already serialized"
+    data = {
+        "int": np.int64(3),
+        "float": np.float32(1.5),
+        "array": np.array([[1, 2], [3, 4]]),
+        "datetime64": np.datetime64("2021-01-01T10:00"),
+        "datetime": datetime.datetime(2021, 1, 1, 10, tzinfo=datetime.timezone.utc),
+        "date": datetime.date(2021, 1, 1),
+        "timestamp": pd.Timestamp("2021-01-01T10:00:00"),
+        "decimal": decimal.Decimal("1.25"),
+        "uuid": uuid.UUID("12345678123456781234567812345678"),
+        "unicode": "café",
+        1: "non string key",
+    }
+    assert json.loads(serializer.dumps(data)) == {
+        "int": 3,
+        "float": 1.5,
+        "array": [[1, 2], [3, 4]],
+        "datetime64": "2021-01-01T10:00:00",
+        "datetime": "2021-01-01T10:00:00+00:00",
+        "date": "2021-01-01",
+        "timestamp": "2021-01-01T10:00:00",
+        "decimal": 1.25,
+        "uuid": "12345678-1234-5678-1234-567812345678",
+        "unicode": "café",
+        "1": "non string key",
+    }
+    with pytest.raises(SerializationError):
+        serializer.dumps({"a": object()})
+
+
+def test_orjson_serializer_loads():
+    serializer = OrjsonSerializer()
+    assert serializer.loads('{"a": [1, 2.5, null]}') == {"a": [1, 2.5, None]}
+    assert serializer.loads(b'{"a": "caf\xc3\xa9"}') == {"a": "café"}
+    with pytest.raises(SerializationError):
+        serializer.loads("{not json")
+
+
+def test_orjson_serializer_transport():
+    serializer = OrjsonSerializer()
+    client = Elasticsearch(hosts=["..."], serializer=serializer)
+    assert client.transport.serializer is serializer
+    # responses are deserialized with it as well
+    assert client.transport.deserializer.serializers["application/json"] is serializer
+
+    # bulk bodies
+    with patch.object(
+        client.transport, "perform_request", return_value={"items": []}
+    ) as perform_request:
+        helpers.bulk(client, [{"_index": "test", "_id": "1", "value": np.float64(0.5)}])
+    assert perform_request.call_args[1]["body"] == (
+        '{"index":{"_id":"1","_index":"test"}}\n{"value":0.5}\n'
+    )
@@ -1062,3 +1062,94 @@ A                                                             <terms, field="a">
                 "composite": {"sources": [{"terms_source": {"field": "some_field"}}]},
             }
         }
+
+    def test_clone_shares_mappings_and_nodes(self):
+        initial_agg = Aggs(
+            {"week": {"date_histogram": {"field": "date", "interval": "1w"}}},
+            mappings=MAPPINGS,
+        )
+        clone = initial_agg.clone()
+        assert clone.mappings is initial_agg.mappings
+        assert clone._groupby_ptr == initial_agg._groupby_ptr
+        nid = initial_agg.id_from_key("week")
+        assert clone.get(nid)[1] is initial_agg.get(nid)[1]
+
+        # but not structure
+        new_agg = initial_agg.agg("per_type", Terms(field="classification_type"))
+        assert new_agg.mappings is initial_agg.mappings
+        assert initial_agg.to_dict() == {
+            "week": {"date_histogram": {"field": "date", "interval": "1w"}}
+        }
+        assert "per_type" in new_agg.to_dict()
+
+        deep_clone = initial_agg.clone(deep=True)
+        assert deep_clone.get(nid)[1] is not initial_agg.get(nid)[1]
+        assert deep_clone.to_dict() == initial_agg.to_dict()
+
+    def test_to_dict_cached(self):
+        a = Aggs({"per_user": {"terms": {"field": "user"}}})
+        d = a.to_dict()
+        assert a._cached_to_dict() is a._cached_to_dict()
+        # copies of cached serialization are returned
+        assert a.to_dict() is not d
+        d["per_user"]["terms"]["field"] = "modified"
+        d = a.to_dict()
+        assert d == {"per_user": {"terms": {"field": "user"}}}
+        assert a.to_dict(depth=0) == {}
+
+        a2 = a.agg("avg_age", "avg", field="age", insert_below="per_user")
+        assert a.to_dict() == d
+        assert a2.to_dict() == {
+            "per_user": {
+                "terms": {"field": "user"},
+                "aggs": {"avg_age": {"avg": {"field": "age"}}},
+            }
+        }
+
+        # in place modification invalidates serialization
+        a2.drop_subtree(a2.id_from_key("avg_age"))
+        assert a2.to_dict() == d
+        a2.insert_node(Min(field="age"), key="min_age", parent_id=a2.root)
+        assert a2.to_dict() == {
+            "per_user": {"terms": {"field": "user"}},
+            "min_age": {"min": {"field": "age"}},
+        }
+
+    def test_id_from_key_index(self):
+        a = Aggs(
+            {
+                "per_user": {
+                    "terms": {"field": "user"},
+                    "aggs": {"avg_age": {"avg": {"field": "age"}}},
+                }
+            }
+        )
+        per_user_id = a.id_from_key("per_user")
+        self.assertEqual(a.get(per_user_id)[0], "per_user")
+
+        # kept up to date through insertions, merges, and removals
+        a2 = a.agg("min_age", "min", field="age", insert_below="per_user")
+        self.assertEqual(a2.parent_id(a2.id_from_key("min_age")), per_user_id)
+        with self.assertRaises(KeyError):
+            a.id_from_key("min_age")
+
+        a2.merge(Aggs({"max_age": {"max": {"field": "age"}}}), nid=per_user_id)
+        self.assertEqual(a2.parent_id(a2.id_from_key("max_age")), per_user_id)
+
+        a2.drop_subtree(per_user_id)
+        for key in ("per_user", "avg_age", "min_age", "max_age"):
+            with self.assertRaises(KeyError):
+                a2.id_from_key(key)
+        self.assertEqual(a.id_from_key("per_user"), per_user_id)
+
+        # insertion above a clause
+        a3 = a.groupby("per_week", "date_histogram", field="date", interval="1w")
+        self.assertEqual(
+            a3.parent_id(a3.id_from_key("per_user")), a3.id_from_key("per_week")
+        )
+
+        # with similarly named clauses, first one in tree order (depth first)
+        a4 = a.agg("avg_age", "avg", field="age")
+        self.assertEqual(a4.id_from_key("avg_age"), a.id_from_key("avg_age"))
+        a4.drop_subtree(per_user_id)
+        self.assertEqual(a4.id_from_key("avg_age"), a4.children_ids(a4.root)[0])
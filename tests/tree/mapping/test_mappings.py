@@ -108,6 +108,84 @@ def test_mapping_type_of_field():
     )
 
 
+def test_fields_table():
+    mapping_tree = Mappings(
+        properties={
+            "id": {"type": "keyword"},
+            "name": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
+            "comments": {
+                "type": "nested",
+                "properties": {
+                    "author": {
+                        "type": "nested",
+                        "properties": {"name": {"type": "keyword"}},
+                    }
+                },
+            },
+        }
+    )
+    table = mapping_tree.fields_table
+    assert sorted(table.keys()) == [
+        "comments",
+        "comments.author",
+        "comments.author.name",
+        "id",
+        "name",
+        "name.raw",
+    ]
+    entry = table["comments.author.name"]
+    assert entry.type == "keyword"
+    assert entry.nesteds == ("comments.author", "comments")
+    assert entry.subfield is False
+    assert entry.nid == mapping_tree.get_node_id_by_path(["comments", "author", "name"])
+    assert table["name.raw"].subfield is True
+    assert table["id"].nesteds == ()
+    # computed once
+    assert mapping_tree.fields_table is table
+    with pytest.raises(TypeError):
+        table["other"] = entry  # type: ignore
+
+    # modification resets the table
+    mapping_tree.insert_node(
+        Keyword(),
+        key="other",
+        parent_id=mapping_tree.root,
+    )
+    assert mapping_tree.mapping_type_of_field("other") == "keyword"
+
+
+def test_to_arrow_schema():
+    import pyarrow as pa
+
+    mappings = Mappings(
+        properties={
+            "id": {"type": "keyword"},
+            "name": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
+            "count": {"type": "long"},
+            "created": {"type": "date"},
+            "tags": Keyword(multiple=True),
+            "owner": {"properties": {"age": {"type": "integer"}}},
+            "comments": {
+                "type": "nested",
+                "properties": {"score": {"type": "float"}},
+            },
+            "location": {"type": "geo_point"},
+        }
+    )
+    assert mappings.to_arrow_schema() == pa.schema(
+        [
+            ("id", pa.dictionary(pa.int32(), pa.string())),
+            ("name", pa.string()),
+            ("count", pa.int64()),
+            ("created", pa.timestamp("ms", tz="UTC")),
+            ("tags", pa.list_(pa.dictionary(pa.int32(), pa.string()))),
+            ("owner", pa.struct([("age", pa.int32())])),
+            ("comments", pa.list_(pa.struct([("score", pa.float32())]))),
+            ("location", pa.string()),
+        ]
+    )
+
+
 def test_node_path():
     mapping_tree = Mappings(**MAPPINGS)
     # get node by path syntax
@@ -201,3 +279,48 @@ def test_validate_doc():
             else:
                 # must not raise error
                 mappings.validate_document(doc)
+        # batch validation reports same errors
+        assert mappings.validate_many(
+            [doc for doc, _ in tt["documents_expected_results"]]
+        ) == {
+            i: expected_error
+            for i, (_, expected_error) in enumerate(tt["documents_expected_results"])
+            if expected_error
+        }
+
+
+def test_validate_many():
+    mappings = Mappings(
+        properties={
+            "title": Text(required=True),
+            "comments": Nested(
+                properties={"author": Object(properties={"id": Integer(required=True)})}
+            ),
+        }
+    )
+    plan = mappings.validation_plan
+    # compiled once
+    assert mappings.validation_plan is plan
+    assert [step.path for step in plan] == ["title", "comments"]
+    assert [step.path for step in plan[1].children] == ["comments.author"]
+
+    assert mappings.validate_many(
+        [
+            {"title": "a", "comments": [{"author": {"id": 1}}, {"author": {"id": 2}}]},
+            {"title": "b", "comments": [{"author": {"id": 1}}, {"author": {}}]},
+            {"comments": []},
+            {"title": "c", "comments": ["not a comment"]},
+            {"title": "d", "comments": {"author": {"id": 3}}},
+        ]
+    ) == {
+        1: "Field <comments.author.id> is required",
+        2: "Field <title> is required",
+        3: "Field <comments> value <not a comment> is not compatible with field of type nested",
+    }
+
+    # plan is compiled again on mappings modification
+    mappings._insert(mappings.root, {"category": Keyword(required=True)}, False)
+    assert mappings.validation_plan is not plan
+    assert mappings.validate_many(
+        [{"title": "a", "comments": [{"author": {"id": 1}}]}]
+    ) == {0: "Field <category> is required"}
@@ -4,6 +4,7 @@ from lighttree.tree import NotFoundNodeError
 
 from pandagg.node.query._parameter_clause import _Must
 from pandagg.query import Query, Range, Prefix, Ids, Term, Terms, Nested
+from pandagg.tree.query import ADD
 from pandagg.node.query.term_level import Term as TermNode, Exists as ExistsNode
 from pandagg.node.query.joining import Nested as NestedNode
 from pandagg.node.query.compound import Bool
@@ -966,3 +967,41 @@ bool                                                             _name=root_bool
                 },
             )
         )
+
+    def test_to_dict_cached(self):
+        q = Query().filter("term", some_field=1)
+        d = q.to_dict()
+        cached = q._cached_to_dict()
+        assert q._cached_to_dict() is cached
+        # copies of cached serialization are returned
+        d["bool"]["filter"].append({"term": {"modified": {"value": 1}}})
+        assert len(q.to_dict()["bool"]["filter"]) == 1
+
+        # modified copy has its own serialization
+        q2 = q.filter("term", other_field=2)
+        assert q._cached_to_dict() is cached
+        assert len(q2.to_dict()["bool"]["filter"]) == 2
+
+        # in place merge invalidates serialization, without modifying node shared with copies
+        _, bool_node = q.get(q.root)
+        q._insert_query_at(Bool(minimum_should_match=1), mode=ADD)
+        assert q.to_dict()["bool"]["minimum_should_match"] == 1
+        assert q.get(q.root)[1] is not bool_node
+        assert "minimum_should_match" not in q2.to_dict()["bool"]
+
+        # in place modification invalidates serialization
+        q.drop_subtree(q.children_ids(q.root)[0])
+        assert q.to_dict() is None
+
+    def test_children_keys(self):
+        q = Query().filter("term", a=1).filter("term", b=2).filter("term", c=3)
+        filter_id = q.child_id(q.root, "filter")
+        self.assertEqual(q.children(q.root), [("filter", q.get(filter_id)[1])])
+        children = q.children(filter_id)
+        self.assertEqual([k for k, _ in children], [0, 1, 2])
+        self.assertEqual(
+            [n.field for _, n in children],
+            ["a", "b", "c"],
+        )
+        q.drop_subtree(children[0][1].identifier)
+        self.assertEqual([k for k, _ in q.children(filter_id)], [0, 1])